@@ -73,7 +73,14 @@ check_training = PythonOperator(
 
 model_training = BashOperator(
     task_id='model_training',
-    bash_command=f'python /mnt/d/MLOps2/model_pipeline/model_training.py',
+    bash_command=f'python /mnt/d/MLOps2/model_pipeline/model_training.py --parallel --warm-start --search --val-size 0.1 --patience 2 --distill --quantize',
+    dag=dag,
+)
+
+# Cập nhật mô hình SGD out-of-core mỗi ngày với dữ liệu mới
+online_update = BashOperator(
+    task_id='online_update',
+    bash_command=f'python /mnt/d/MLOps2/model_pipeline/model_training.py --online',
     dag=dag,
 )
 
@@ -109,3 +116,4 @@ send_request = BashOperator(
 check_training >> model_training
 model_training >> model_deploy >> model_validate >> model_serve >> send_request
 check_training >> model_deploy  # skip training vẫn chạy các task sau
+online_update >> model_deploy
@@ -137,7 +137,7 @@ with DAG(
     # Step 4: Train the model (only runs on training days)
     train_model = BashOperator(
         task_id='train_model',
-        bash_command='python /mnt/d/MLOps2/model_pipeline/model_training.py',
+        bash_command='python /mnt/d/MLOps2/model_pipeline/model_training.py --parallel --warm-start --search --val-size 0.1 --patience 2 --distill --quantize',
     )
 
     model_deploy = BashOperator(
@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 # Load environment variables from .env
 load_dotenv()
 
+from db_engine import get_db_settings
+
 # Grafana configuration
 grafana_host    = os.getenv("GRAFANA_HOST", "http://localhost:3000")
 grafana_api_key = os.getenv("GRAFANA_API_KEY")  # Service Account token or API key
@@ -18,13 +20,14 @@ headers = {
     "Content-Type":  "application/json"
 }
 
-# PostgreSQL datasource settings
+# PostgreSQL datasource settings (same DB_* settings as the ingest engine)
 datasource_name = os.getenv("DATASOURCE_NAME", "PostgreSQL - Twitter Analysis")
-postgres_host   = os.getenv("DB_HOST", "localhost")
-postgres_port   = os.getenv("DB_PORT", "5432")
-postgres_db     = os.getenv("DB_NAME", "twitter_analysis")
-postgres_user   = os.getenv("DB_USER", "postgres")
-postgres_pass   = os.getenv("DB_PASSWORD", "")
+db_settings     = get_db_settings(host=os.getenv("DB_HOST", "localhost"))
+postgres_host   = db_settings["host"]
+postgres_port   = db_settings["port"]
+postgres_db     = db_settings["database"]
+postgres_user   = db_settings["user"]
+postgres_pass   = db_settings["password"] or ""
 
 # Dashboard cloning settings
 orig_dashboard_uid = os.getenv("ORIG_DASHBOARD_UID")  # e.g. "eeksft5ash9tsf"
@@ -54,12 +57,14 @@ def upsert_datasource():
         r2 = requests.put(put_url, json=payload, headers=headers)
         r2.raise_for_status()
         print(f"✅ Updated datasource '{datasource_name}' (id={ds['id']})")
+        return ds.get("uid")
     else:
         # Create new
         post_url = f"{grafana_host}/api/datasources"
         r3 = requests.post(post_url, json=payload, headers=headers)
         r3.raise_for_status()
         print(f"✅ Created datasource '{datasource_name}'")
+        return r3.json().get("datasource", {}).get("uid")
 
 
 def clone_dashboard():
@@ -91,9 +96,117 @@ def clone_dashboard():
     print(f"✅ Cloned dashboard '{orig_dashboard_uid}' to '{mloops_dashboard_uid}'.")
 
 
+def _rollup_panel(panel_id, title, sql, datasource_uid, grid_pos, panel_type="timeseries", fmt="time_series"):
+    """Grafana SQL panel definition querying a rollup table"""
+    return {
+        "id": panel_id,
+        "type": panel_type,
+        "title": title,
+        "gridPos": grid_pos,
+        "datasource": {"type": "postgres", "uid": datasource_uid},
+        "targets": [{
+            "refId": "A",
+            "datasource": {"type": "postgres", "uid": datasource_uid},
+            "editorMode": "code",
+            "format": fmt,
+            "rawQuery": True,
+            "rawSql": sql,
+        }],
+    }
+
+
+def build_rollup_dashboard(datasource_uid, table="tweets"):
+    """
+    Dashboard model whose panels read the pre-aggregated rollup tables
+    maintained by ingest.py (see rollups.py) instead of the raw tweets table.
+    """
+    sentiment_daily = f"{table}_sentiment_daily"
+    engagement_daily = f"{table}_engagement_daily"
+    sentiment_label = ("CASE sentiment WHEN 1 THEN 'Positive' WHEN 0 THEN 'Negative' "
+                       "WHEN 2 THEN 'Neutral' ELSE 'Unknown' END")
+    keyword_filter = "searched_keyword IN (${keyword:sqlstring})"
+    panels = [
+        _rollup_panel(
+            1, "Tweets per day by sentiment",
+            f"SELECT day::timestamp AS time, {sentiment_label} AS metric, sum(tweet_count) AS value "
+            f"FROM {sentiment_daily} WHERE $__timeFilter(day) AND {keyword_filter} "
+            "GROUP BY 1, 2 ORDER BY 1",
+            datasource_uid, {"h": 9, "w": 24, "x": 0, "y": 0},
+        ),
+        _rollup_panel(
+            2, "Sentiment share",
+            f"SELECT {sentiment_label} AS sentiment, sum(tweet_count) AS tweets "
+            f"FROM {sentiment_daily} WHERE $__timeFilter(day) AND {keyword_filter} GROUP BY 1",
+            datasource_uid, {"h": 9, "w": 8, "x": 0, "y": 9}, panel_type="piechart", fmt="table",
+        ),
+        _rollup_panel(
+            3, "Tweets by keyword",
+            f"SELECT searched_keyword AS keyword, sum(tweet_count) AS tweets "
+            f"FROM {engagement_daily} WHERE $__timeFilter(day) AND {keyword_filter} "
+            "GROUP BY 1 ORDER BY 2 DESC LIMIT 20",
+            datasource_uid, {"h": 9, "w": 16, "x": 8, "y": 9}, panel_type="barchart", fmt="table",
+        ),
+        _rollup_panel(
+            4, "Engagement per day",
+            "SELECT day::timestamp AS time, sum(likecount_sum) AS likes, sum(retweetcount_sum) AS retweets, "
+            "sum(replycount_sum) AS replies, sum(quotecount_sum) AS quotes "
+            f"FROM {engagement_daily} WHERE $__timeFilter(day) AND {keyword_filter} "
+            "GROUP BY 1 ORDER BY 1",
+            datasource_uid, {"h": 9, "w": 12, "x": 0, "y": 18},
+        ),
+        _rollup_panel(
+            5, "Views per day",
+            "SELECT day::timestamp AS time, sum(viewcount_sum) AS views "
+            f"FROM {engagement_daily} WHERE $__timeFilter(day) AND {keyword_filter} "
+            "GROUP BY 1 ORDER BY 1",
+            datasource_uid, {"h": 9, "w": 12, "x": 12, "y": 18},
+        ),
+    ]
+    return {
+        "uid": f"{mloops_dashboard_uid}-rollups",
+        "id": None,
+        "version": 0,
+        "title": os.getenv("ROLLUP_DASHBOARD_TITLE", "Twitter Sentiment (rollups)"),
+        "time": {"from": "now-90d", "to": "now"},
+        "templating": {"list": [{
+            "name": "keyword",
+            "type": "query",
+            "datasource": {"type": "postgres", "uid": datasource_uid},
+            "query": f"SELECT DISTINCT searched_keyword FROM {engagement_daily}",
+            "multi": True,
+            "includeAll": True,
+            "current": {"text": "All", "value": "$__all"},
+        }]},
+        "panels": panels,
+    }
+
+
+def provision_rollup_dashboard(datasource_uid):
+    """Create or overwrite the rollup-backed dashboard."""
+    model = build_rollup_dashboard(datasource_uid, table=os.getenv("DB_TABLE", "tweets"))
+    payload = {"dashboard": model, "overwrite": True, "folderId": 0}
+    post_url = f"{grafana_host}/api/dashboards/db"
+    resp = requests.post(post_url, json=payload, headers=headers)
+    resp.raise_for_status()
+    print(f"✅ Provisioned rollup dashboard '{model['uid']}'.")
+
+
 def main():
-    upsert_datasource()
-    clone_dashboard()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Provision the Grafana datasource and dashboard")
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Provision a dashboard reading the rollup tables instead of cloning the raw-table dashboard"
+    )
+    args = parser.parse_args()
+
+    datasource_uid = upsert_datasource()
+    if args.rollups:
+        provision_rollup_dashboard(datasource_uid)
+    else:
+        clone_dashboard()
 
 
 if __name__ == "__main__":
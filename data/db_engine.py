@@ -0,0 +1,121 @@
+"""
+Shared, pooled PostgreSQL engines for the pipeline modules.
+
+ingest.py, connect_grafana.py and model_training.py all read the same DB_*
+environment variables; this module turns them into one SQLAlchemy engine per
+database URL, cached for the life of the process, so every caller reuses the
+same connection pool instead of opening fresh server connections.
+
+Pool behaviour is configurable through the environment:
+    DB_POOL_SIZE         connections kept open per database (default 5)
+    DB_MAX_OVERFLOW      extra connections allowed under load (default 5)
+    DB_POOL_RECYCLE      seconds before a connection is replaced (default 1800)
+    DB_CONNECT_TIMEOUT   seconds to wait when opening a connection (default 10)
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def quote_ident(name):
+    """Quote a SQL identifier the same way to_sql does when it creates a table"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def get_db_settings(**overrides):
+    """
+    Database connection settings from the environment
+
+    Args:
+        overrides: Values taking precedence over the environment
+            (user, password, host, port, database)
+    """
+    settings = {
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST", "host.docker.internal"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "database": os.getenv("DB_NAME", "twitter_analysis"),
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+def database_url(db_name=None, **overrides):
+    """SQLAlchemy URL for `db_name` (defaults to DB_NAME)"""
+    settings = get_db_settings(**overrides)
+    return URL.create(
+        "postgresql+psycopg2",
+        username=settings["user"],
+        password=settings["password"],
+        host=settings["host"],
+        port=int(settings["port"]),
+        database=db_name or settings["database"],
+    )
+
+
+def pool_capacity():
+    """Most connections one engine opens at once (DB_POOL_SIZE + DB_MAX_OVERFLOW)"""
+    return int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "5"))
+
+
+def get_engine(db_name=None, **overrides):
+    """
+    Return the shared engine for `db_name`, creating it on first use
+
+    Args:
+        db_name: Database name (defaults to DB_NAME)
+        overrides: Connection settings taking precedence over the environment
+    """
+    url = database_url(db_name, **overrides)
+    key = url.render_as_string(hide_password=False)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                url,
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+                pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+                pool_pre_ping=True,
+                connect_args={"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10"))},
+            )
+            _engines[key] = engine
+        return engine
+
+
+@contextmanager
+def raw_connection(db_name=None, autocommit=False, **overrides):
+    """
+    Borrow a psycopg2 connection from the shared pool
+
+    The connection goes back to the pool (not closed) when the block exits.
+
+    Args:
+        db_name: Database name (defaults to DB_NAME)
+        autocommit: Run statements outside a transaction (e.g. CREATE DATABASE)
+        overrides: Connection settings taking precedence over the environment
+    """
+    conn = get_engine(db_name, **overrides).raw_connection()
+    try:
+        if autocommit:
+            conn.driver_connection.autocommit = True
+        yield conn
+    finally:
+        if autocommit:
+            conn.driver_connection.autocommit = False
+        conn.close()
+
+
+def dispose_engines():
+    """Close every pooled connection (e.g. before forking worker processes)"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
@@ -0,0 +1,237 @@
+"""
+Distribution-drift checks between a new batch and a stored reference histogram.
+
+Histograms for `sentiment`, text length, `likecount` and `viewcount` are
+computed with NumPy and persisted as a compressed .npz file. A batch is
+compared to the reference with PSI plus, for the numeric features, a
+histogram-based KS statistic and, for the categorical `sentiment`, a
+chi-square test (KS assumes ordered values, which class labels are not).
+"""
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFERENCE_PATH = os.getenv(
+    "DRIFT_REFERENCE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference", "drift_reference.npz")
+)
+
+# Sentiment labels as encoded by model_training.DataProcessor.clean_and_map
+SENTIMENT_MAPPING = {'Positive': 1, 'Negative': 0, 'Neutral': 2}
+SENTIMENT_CLASSES = 3
+
+NUMERIC_FEATURES = ("text_length", "likecount", "viewcount")
+CATEGORICAL_FEATURES = ("sentiment",)
+
+# Drift is flagged when any statistic crosses its threshold
+PSI_THRESHOLD = 0.2
+KS_THRESHOLD = 0.1
+CHI2_PVALUE_THRESHOLD = 0.01
+
+
+def feature_values(df):
+    """
+    Extract the monitored feature values from a batch.
+
+    Column names are matched case-insensitively, so both the labeled
+    (`likeCount`, `Sentiment`) and predicted file layouts are supported.
+
+    Returns:
+        Dict of feature name -> 1-D NumPy array (missing values removed)
+    """
+    df = df.rename(columns=str.lower)
+    values = {}
+
+    if "sentiment" in df.columns:
+        labels = df["sentiment"].dropna().astype(str).str.strip()
+        mapped = labels.str.capitalize().map(SENTIMENT_MAPPING)
+        mapped = mapped.fillna(pd.to_numeric(labels, errors="coerce"))
+        mapped = mapped.dropna().to_numpy(dtype=np.int64)
+        values["sentiment"] = mapped[(mapped >= 0) & (mapped < SENTIMENT_CLASSES)]
+
+    if "cleaned_text" in df.columns:
+        values["text_length"] = df["cleaned_text"].dropna().astype(str).str.len().to_numpy(dtype=np.float64)
+
+    for column in ("likecount", "viewcount"):
+        if column in df.columns:
+            numbers = pd.to_numeric(df[column], errors="coerce").dropna()
+            values[column] = numbers.to_numpy(dtype=np.float64)
+
+    return values
+
+
+def _bin_counts(values, edges):
+    """Count values into the open-ended bins delimited by the inner `edges`."""
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def build_reference(df, bins=20):
+    """
+    Build reference histograms from a batch considered representative.
+
+    Numeric features use quantile bin edges (deduplicated, so heavily tied
+    counts such as zero likes collapse into one bin); the outer bins are
+    open-ended so later batches never fall outside the histogram.
+
+    Returns:
+        Dict of feature name -> {"edges": array, "counts": array}
+    """
+    reference = {}
+    for feature, values in feature_values(df).items():
+        if feature in CATEGORICAL_FEATURES:
+            edges = np.arange(1, SENTIMENT_CLASSES, dtype=np.float64)
+        elif len(values):
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        else:
+            edges = np.empty(0, dtype=np.float64)
+        reference[feature] = {"edges": edges, "counts": _bin_counts(values, edges)}
+    return reference
+
+
+def save_reference(reference, path=DEFAULT_REFERENCE_PATH):
+    """Persist reference histograms as a compressed .npz file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {}
+    for feature, histogram in reference.items():
+        arrays[f"{feature}__edges"] = histogram["edges"]
+        arrays[f"{feature}__counts"] = histogram["counts"].astype(np.int64)
+    np.savez_compressed(path, **arrays)
+    logger.info(f"Saved drift reference for {sorted(reference)} to {path}")
+
+
+def load_reference(path=DEFAULT_REFERENCE_PATH):
+    """Load reference histograms saved by save_reference."""
+    with np.load(path) as data:
+        features = {name.split("__")[0] for name in data.files}
+        return {
+            feature: {"edges": data[f"{feature}__edges"], "counts": data[f"{feature}__counts"]}
+            for feature in features
+        }
+
+
+def batch_counts(reference, df):
+    """
+    Histogram a batch on the reference bin edges.
+
+    Counts from several chunks of the same file can be summed, which is how
+    chunked validation computes drift without loading the whole file.
+    """
+    values = feature_values(df)
+    return {
+        feature: _bin_counts(values.get(feature, np.empty(0)), histogram["edges"])
+        for feature, histogram in reference.items()
+    }
+
+
+def file_counts(reference, filepath, chunksize=100_000):
+    """Histogram a CSV file chunk by chunk on the reference bin edges."""
+    totals = {feature: np.zeros(len(h["edges"]) + 1, dtype=np.int64) for feature, h in reference.items()}
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        for feature, counts in batch_counts(reference, chunk).items():
+            totals[feature] += counts
+    return totals
+
+
+def population_stability_index(ref_counts, cur_counts, eps=1e-6):
+    """PSI between two histograms over the same bins."""
+    ref = np.clip(ref_counts / max(ref_counts.sum(), 1), eps, None)
+    cur = np.clip(cur_counts / max(cur_counts.sum(), 1), eps, None)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_statistic(ref_counts, cur_counts):
+    """Kolmogorov-Smirnov statistic computed on binned CDFs."""
+    ref_cdf = np.cumsum(ref_counts) / max(ref_counts.sum(), 1)
+    cur_cdf = np.cumsum(cur_counts) / max(cur_counts.sum(), 1)
+    return float(np.max(np.abs(ref_cdf - cur_cdf))) if len(ref_cdf) else 0.0
+
+
+def chi_square(ref_counts, cur_counts):
+    """
+    Chi-square test that the batch and the reference come from the same category distribution.
+
+    Both histograms are samples, so this is the two-sample test of homogeneity
+    on their 2 x k contingency table rather than a goodness of fit to the
+    reference proportions, which would flag sampling noise in the reference.
+    """
+    from scipy.special import chdtrc
+
+    table = np.vstack([ref_counts, cur_counts]).astype(np.float64)
+    table = table[:, table.sum(axis=0) > 0]
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0) / max(table.sum(), 1)
+    mask = expected > 0
+    statistic = float(np.sum((table[mask] - expected[mask]) ** 2 / expected[mask]))
+    dof = max(table.shape[1] - 1, 1)
+    return statistic, float(chdtrc(dof, statistic))
+
+
+def drift_results(reference, counts):
+    """
+    Compare batch histograms to the reference.
+
+    Returns:
+        List of check results in the validation_results format
+    """
+    results = []
+    for feature in sorted(reference):
+        ref_counts = np.asarray(reference[feature]["counts"], dtype=np.float64)
+        cur_counts = np.asarray(counts[feature], dtype=np.float64)
+        if cur_counts.sum() == 0:
+            results.append({
+                "check": f"drift_{feature}",
+                "success": False,
+                "details": {"error": f"No {feature} values in batch"}
+            })
+            continue
+
+        details = {
+            "psi": population_stability_index(ref_counts, cur_counts),
+            "reference_size": int(ref_counts.sum()),
+            "batch_size": int(cur_counts.sum()),
+        }
+        success = details["psi"] < PSI_THRESHOLD
+        if feature in CATEGORICAL_FEATURES:
+            details["chi2"], details["chi2_pvalue"] = chi_square(ref_counts, cur_counts)
+            success = success and details["chi2_pvalue"] >= CHI2_PVALUE_THRESHOLD
+        else:
+            details["ks"] = ks_statistic(ref_counts, cur_counts)
+            success = success and details["ks"] < KS_THRESHOLD
+
+        results.append({"check": f"drift_{feature}", "success": bool(success), "details": details})
+    return results
+
+
+def check_drift(df, reference_path=DEFAULT_REFERENCE_PATH):
+    """Compare a batch DataFrame to the stored reference histograms."""
+    reference = load_reference(reference_path)
+    return drift_results(reference, batch_counts(reference, df))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Build or check drift reference histograms")
+    parser.add_argument("action", choices=["build", "check"], help="Build a reference or check a batch against it")
+    parser.add_argument("file", help="Path to the CSV file")
+    parser.add_argument("--reference", default=DEFAULT_REFERENCE_PATH, help="Path to the reference .npz file")
+    parser.add_argument("--bins", type=int, default=20, help="Number of quantile bins for numeric features")
+    args = parser.parse_args()
+
+    batch = pd.read_csv(args.file)
+    if args.action == "build":
+        save_reference(build_reference(batch, bins=args.bins), args.reference)
+        print(f"✅ Saved drift reference to {args.reference}")
+    else:
+        results = check_drift(batch, args.reference)
+        for result in results:
+            status = "✅" if result["success"] else "❌"
+            print(f"{status} {result['check']}: {result['details']}")
+        if not all(r["success"] for r in results):
+            sys.exit(1)
@@ -0,0 +1,16 @@
+"""
+Content hash of files, shared by the ingest ledger and the validation cache.
+
+Standard library only, so validation can hash a file without importing the
+database layer.
+"""
+import hashlib
+
+
+def file_sha256(filepath, block_size=1 << 20):
+    """Hash a file's content in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
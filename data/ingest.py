@@ -2,13 +2,24 @@
 Simplified data ingestion module for loading CSV files into PostgreSQL
 """
 import pandas as pd
-import psycopg2
-from sqlalchemy import create_engine, text
+import numpy as np
+import io
 import os
 import sys
+import csv
+import struct
 import logging
+import itertools
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
 from dotenv import load_dotenv
 
+import rollups
+import schema
+from db_engine import get_db_settings, get_engine, pool_capacity, quote_ident, raw_connection
+from file_hash import file_sha256
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -16,39 +27,741 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+LABELED_DIR = os.getenv("LABELED_DIR", '/mnt/d/MLOps2/data/labeled')
+
 def connect_to_db(db_name="postgres"):
-    """Create database connection using environment variables"""
-    db_user = os.getenv("DB_USER", "mlops_user")
-    db_password = os.getenv("DB_PASSWORD")
-    db_host = os.getenv("DB_HOST", "172.21.80.1")
-    db_port = os.getenv("DB_PORT", "5432")
-    
-    conn_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    return create_engine(conn_string)
+    """Return the shared, pooled engine for `db_name`"""
+    return get_engine(db_name)
 
 def create_database_if_not_exists(db_name):
     """Create the database if it doesn't exist"""
     try:
-        # Connect to default postgres database
-        engine = connect_to_db("postgres")
-        
-        # Check if database exists
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'"))
-            exists = result.fetchone()
-            
-            if not exists:
-                logger.info(f"Creating database '{db_name}'...")
-                conn.execute(text(f"CREATE DATABASE {db_name}"))
-                logger.info(f"Database '{db_name}' created.")
-            else:
-                logger.info(f"Database '{db_name}' already exists.")
+        # CREATE DATABASE cannot run inside a transaction block
+        with raw_connection("postgres", autocommit=True) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
+                exists = cursor.fetchone()
+                
+                if not exists:
+                    logger.info(f"Creating database '{db_name}'...")
+                    cursor.execute(f"CREATE DATABASE {quote_ident(db_name)}")
+                    logger.info(f"Database '{db_name}' created.")
+                else:
+                    logger.info(f"Database '{db_name}' already exists.")
                 
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         raise
 
-def load_data_to_db(csv_file, db_name, table_name, if_exists="replace"):
+# PostgreSQL binary COPY framing
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+NULL_FIELD = struct.pack(">i", -1)
+POSTGRES_EPOCH = pd.Timestamp("2000-01-01")
+
+def _binary_fixed_width(values, mask, big_endian_dtype):
+    """Encode a fixed-width column as length-prefixed big-endian fields"""
+    width = np.dtype(big_endian_dtype).itemsize
+    record = np.empty(len(values), dtype=[("len", ">i4"), ("val", big_endian_dtype)])
+    record["len"] = width
+    record["val"] = np.where(mask, 0, values).astype(big_endian_dtype)
+    raw = record.tobytes()
+    size = 4 + width
+    return [NULL_FIELD if is_null else raw[i * size:(i + 1) * size] for i, is_null in enumerate(mask)]
+
+# Binary COPY encodings of the column types the loaders create
+BINARY_FIXED_WIDTH = {
+    "smallint": ">i2",
+    "integer": ">i4",
+    "bigint": ">i8",
+    "real": ">f4",
+    "double precision": ">f8",
+    "boolean": ">u1",
+    "timestamp with time zone": ">i8",
+    "timestamp without time zone": ">i8",
+}
+BINARY_TEXT_TYPES = ("text", "character varying")
+
+def _pg_type_for_dtype(dtype):
+    """PostgreSQL type to_sql creates for a pandas dtype"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        name = dtype.name.lower()
+        if name in ("int8", "uint8", "int16"):
+            return "smallint"
+        if name in ("uint16", "int32"):
+            return "integer"
+        return "bigint"
+    if pd.api.types.is_float_dtype(dtype):
+        return "real" if dtype.name.lower() == "float32" else "double precision"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "timestamp with time zone" if getattr(dtype, "tz", None) else "timestamp without time zone"
+    return "text"
+
+def table_column_types(cursor, table_name):
+    """Map each column of `table_name` to its PostgreSQL type name"""
+    cursor.execute(
+        "SELECT attname, format_type(atttypid, NULL) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+        (quote_ident(table_name),)
+    )
+    return dict(cursor.fetchall())
+
+def _binary_column(series, pg_type):
+    """Encode one column for binary COPY into a column of type `pg_type`"""
+    if pg_type.startswith("timestamp"):
+        with_tz = pg_type == "timestamp with time zone"
+        if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = pd.to_datetime(series, errors="coerce", utc=with_tz)
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        # Microseconds since 2000-01-01 (UTC for timestamptz, wall clock for timestamp)
+        mask = series.isna().to_numpy()
+        values = ((series - POSTGRES_EPOCH) // pd.Timedelta(microseconds=1)).fillna(0).to_numpy(dtype=np.int64)
+        return _binary_fixed_width(values, mask, ">i8")
+    
+    if pg_type in BINARY_FIXED_WIDTH:
+        if pg_type == "boolean":
+            mask = series.isna().to_numpy()
+            values = series.fillna(False).to_numpy(dtype=bool)
+        else:
+            numbers = pd.to_numeric(series, errors="coerce")
+            mask = numbers.isna().to_numpy()
+            if pg_type in ("real", "double precision"):
+                values = numbers.to_numpy(dtype=np.float64)
+            else:
+                values = numbers.fillna(0).to_numpy(dtype=np.int64)
+        return _binary_fixed_width(values, mask, BINARY_FIXED_WIDTH[pg_type])
+    
+    if pg_type not in BINARY_TEXT_TYPES:
+        raise ValueError(f"Binary COPY does not support column type '{pg_type}'; use the CSV format")
+    fields = []
+    for value, is_null in zip(series.tolist(), series.isna().to_numpy()):
+        if is_null:
+            fields.append(NULL_FIELD)
+        else:
+            encoded = str(value).encode("utf-8")
+            fields.append(struct.pack(">i", len(encoded)) + encoded)
+    return fields
+
+def dataframe_to_copy_buffer(df, binary=False, column_types=None):
+    """
+    Render a DataFrame into an in-memory buffer readable by COPY ... FROM STDIN
+    
+    Args:
+        df: DataFrame to render
+        binary: Use PostgreSQL's binary COPY format instead of CSV
+        column_types: PostgreSQL type of each target column (binary only);
+            defaults to the types to_sql would create for the DataFrame
+    """
+    if not binary:
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        return buffer
+    
+    column_types = column_types or {}
+    tuple_header = struct.pack(">h", len(df.columns))
+    columns = [
+        _binary_column(df[col], column_types.get(col) or _pg_type_for_dtype(df[col].dtype))
+        for col in df.columns
+    ]
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    for row in zip(*columns):
+        buffer.write(tuple_header)
+        buffer.write(b"".join(row))
+    buffer.write(PGCOPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+def copy_dataframe_to_db(df, table_name, engine, if_exists="append", binary=False, chunk_rows=100_000,
+                         refresh_rollups=False):
+    """
+    Bulk load a DataFrame with COPY ... FROM STDIN instead of INSERT statements
+    
+    The table is created (or replaced) with the same column types to_sql would
+    use, then rows are streamed in chunks of `chunk_rows` in one transaction.
+    
+    Args:
+        df: DataFrame to load
+        table_name: Target table name
+        engine: SQLAlchemy engine (psycopg2 driver)
+        if_exists: How to handle existing table ('replace', 'append', 'fail')
+        binary: Use binary COPY format instead of CSV
+        chunk_rows: Number of rows rendered per COPY chunk
+        refresh_rollups: Update the rollup buckets touched by the batch (managed schema only)
+    
+    Returns:
+        Number of records loaded
+    """
+    # Let pandas create the table schema, without inserting any rows
+    df.head(0).to_sql(table_name, engine, if_exists=if_exists, index=False)
+    
+    columns = ", ".join(quote_ident(col) for col in df.columns)
+    copy_format = "binary" if binary else "csv"
+    copy_sql = f"COPY {quote_ident(table_name)} ({columns}) FROM STDIN WITH (FORMAT {copy_format})"
+    
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            column_types = table_column_types(cursor, table_name) if binary else None
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                cursor.copy_expert(copy_sql, dataframe_to_copy_buffer(chunk, binary, column_types))
+            if refresh_rollups:
+                rollups.stage_affected_from_frame(cursor, df)
+                rollups.refresh(cursor, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return len(df)
+
+def refresh_rollups_for_frame(engine, table_name, df):
+    """Update the rollup buckets touched by rows already written from `df`"""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            rollups.stage_affected_from_frame(cursor, df)
+            rollups.refresh(cursor, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def ensure_primary_key(cursor, table_name, key_columns=("id",)):
+    """
+    Add a primary key on `key_columns` if the table does not have one yet
+    
+    Tables created by to_sql have no key, so rows already duplicated by earlier
+    append-mode runs are removed first (keeping the most recently written copy).
+    """
+    cursor.execute(
+        "SELECT 1 FROM pg_index WHERE indrelid = %s::regclass AND indisprimary",
+        (quote_ident(table_name),)
+    )
+    if cursor.fetchone():
+        return False
+    
+    table = quote_ident(table_name)
+    match = " AND ".join(f"a.{quote_ident(col)} = b.{quote_ident(col)}" for col in key_columns)
+    cursor.execute(f"DELETE FROM {table} a USING {table} b WHERE a.ctid < b.ctid AND {match}")
+    if cursor.rowcount:
+        logger.info(f"Removed {cursor.rowcount} duplicate rows from {table_name}")
+    keys = ", ".join(quote_ident(col) for col in key_columns)
+    cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({keys})")
+    logger.info(f"Added primary key ({keys}) to {table_name}")
+    return True
+
+def _conflict_action(table, columns, keys, touched=()):
+    """ON CONFLICT action updating only rows whose non-key values changed, resetting `touched` columns to DEFAULT"""
+    updates = [col for col in columns if col not in keys]
+    if not updates:
+        return "DO NOTHING"
+    return (
+        "DO UPDATE SET " + ", ".join([f"{col} = EXCLUDED.{col}" for col in updates]
+                                     + [f"{col} = DEFAULT" for col in touched])
+        + f" WHERE ({', '.join(f'{table}.{col}' for col in updates)})"
+        + f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{col}' for col in updates)})"
+    )
+
+def merge_staging_table(cursor, table_name, staging_name, column_names, key_columns=("id",),
+                        refresh_rollups=False):
+    """
+    Merge the rows of a staging table into `table_name` with INSERT ... ON CONFLICT
+    
+    Args:
+        cursor: psycopg2 cursor (inside the loading transaction)
+        table_name: Target table, with a primary key on `key_columns`
+        staging_name: Table holding the incoming rows
+        column_names: Columns to merge
+        key_columns: Columns identifying a row
+        refresh_rollups: Update the rollup buckets touched by the merge (managed schema only)
+    
+    Returns:
+        Tuple of (inserted rows, updated rows, unchanged rows)
+    """
+    table = quote_ident(table_name)
+    staging = quote_ident(staging_name)
+    columns = [quote_ident(col) for col in column_names]
+    keys = [quote_ident(col) for col in key_columns]
+    column_list = ", ".join(columns)
+    key_list = ", ".join(keys)
+    
+    # The last occurrence of a key in the file wins
+    key_match = " AND ".join(f"a.{key} = b.{key}" for key in keys)
+    cursor.execute(f"DELETE FROM {staging} a USING {staging} b WHERE a.ctid < b.ctid AND {key_match}")
+    cursor.execute(f"SELECT count(*) FROM {staging}")
+    staged = cursor.fetchone()[0]
+    cursor.execute(
+        f"SELECT count(*) FROM {staging} a WHERE EXISTS "
+        f"(SELECT 1 FROM {table} b WHERE {key_match})"
+    )
+    existing = cursor.fetchone()[0]
+    if refresh_rollups:
+        rollups.stage_affected_from_table(cursor, staging_name, table_name, key_columns)
+    # A changed row counts as newly ingested (managed tables only have the column)
+    touched = [quote_ident(schema.INGEST_SEQ_COLUMN)] if (
+        schema.INGEST_SEQ_COLUMN in table_column_types(cursor, table_name)) else []
+    cursor.execute(
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT {column_list} FROM {staging} ORDER BY {key_list} "
+        f"ON CONFLICT ({key_list}) {_conflict_action(table, columns, keys, touched)}"
+    )
+    written = cursor.rowcount
+    if refresh_rollups:
+        rollups.refresh(cursor, table_name)
+    
+    inserted = staged - existing
+    return inserted, written - inserted, staged - written
+
+def upsert_dataframe_to_db(df, table_name, engine, key_columns=("id",), binary=False, refresh_rollups=False):
+    """
+    Merge a DataFrame into a table keyed by `key_columns`
+    
+    Rows are COPYed into a temporary staging table, then merged with
+    INSERT ... ON CONFLICT DO UPDATE. Rows whose values did not change are
+    left untouched, so re-ingesting the same file neither duplicates rows
+    nor rewrites them.
+    
+    Args:
+        df: DataFrame to merge
+        table_name: Target table name (created if missing)
+        engine: SQLAlchemy engine (psycopg2 driver)
+        key_columns: Columns identifying a row
+        binary: Use binary COPY format for the staging load
+        refresh_rollups: Update the rollup buckets touched by the merge (managed schema only)
+    
+    Returns:
+        Tuple of (inserted rows, updated rows)
+    """
+    # Create the target table from the DataFrame schema if it does not exist yet
+    df.head(0).to_sql(table_name, engine, if_exists="append", index=False)
+    
+    table = quote_ident(table_name)
+    staging_name = f"{table_name}_staging"
+    column_list = ", ".join(quote_ident(col) for col in df.columns)
+    
+    copy_format = "binary" if binary else "csv"
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            ensure_primary_key(cursor, table_name, key_columns)
+            cursor.execute(
+                f"CREATE TEMP TABLE {quote_ident(staging_name)} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            column_types = table_column_types(cursor, table_name) if binary else None
+            cursor.copy_expert(
+                f"COPY {quote_ident(staging_name)} ({column_list}) FROM STDIN WITH (FORMAT {copy_format})",
+                dataframe_to_copy_buffer(df, binary, column_types)
+            )
+            inserted, updated, unchanged = merge_staging_table(
+                cursor, table_name, staging_name, df.columns, key_columns, refresh_rollups
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    logger.info(f"Upserted into {table_name}: {inserted} inserted, {updated} updated, "
+                f"{unchanged} unchanged")
+    return inserted, updated
+
+def _parse_int(value):
+    """Integer from a CSV field, None when empty or not a whole number (e.g. '8825.0' -> 8825)"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return int(number) if number.is_finite() and number == number.to_integral_value() else None
+
+def _parse_timestamptz(value):
+    """ISO timestamp from a CSV field (naive values are UTC), None when invalid"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.isoformat()
+
+def _parse_sentiment(value):
+    """Numeric sentiment code from a label ('Positive') or a code ('1')"""
+    value = value.strip()
+    code = schema.SENTIMENT_MAPPING.get(value.capitalize())
+    return code if code is not None else _parse_int(value)
+
+# Fields pandas.read_csv reads as missing, so the streaming path stores the same NULLs
+CSV_NULL_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+def _field_parser(ddl):
+    """Converter from a raw CSV field to the value COPY expects for a managed column"""
+    if ddl.startswith(("BIGINT", "INTEGER")):
+        return _parse_int
+    if ddl.startswith("SMALLINT"):
+        return _parse_sentiment
+    if ddl.startswith("TIMESTAMPTZ"):
+        return _parse_timestamptz
+    return lambda value: value if value not in CSV_NULL_VALUES else None
+
+class CsvCopyStream:
+    """
+    File-like object feeding a CSV file to COPY ... FROM STDIN without pandas
+    
+    Rows are read lazily with the csv module, converted to the managed column
+    layout (same rules as schema.normalize_frame) and rendered back to CSV
+    only when COPY asks for the next block, so memory use depends on the
+    block size and not on the size of the file.
+    """
+    
+    def __init__(self, csv_file, batch_rows=1000):
+        """
+        Open `csv_file` and validate its header against the managed layout
+        
+        Args:
+            csv_file: Path to the CSV file
+            batch_rows: Number of rows converted per refill of the read buffer
+        """
+        self.file = open(csv_file, newline="", encoding="utf-8-sig")
+        self.reader = csv.reader(self.file)
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self.skipped = 0
+        self._buffer = ""
+        self._writer_buffer = io.StringIO()
+        self._writer = csv.writer(self._writer_buffer, lineterminator="\n")
+        try:
+            self.columns, self._positions = self._validate_header(next(self.reader, None))
+        except Exception:
+            self.file.close()
+            raise
+        ddl = dict(schema.TWEETS_COLUMNS)
+        self._parsers = [_field_parser(ddl[name]) for name in self.columns]
+        self._key_positions = [self.columns.index(name) for name in schema.KEY_COLUMNS]
+    
+    def _validate_header(self, header):
+        """Map the file's columns (case-insensitively) to the managed column layout"""
+        if not header:
+            raise ValueError("CSV file has no header")
+        names = [name.strip().lower() for name in header]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate columns in CSV header: {duplicates}")
+        missing = [name for name in schema.KEY_COLUMNS if name not in names]
+        if missing:
+            raise ValueError(f"CSV header is missing required columns: {missing}")
+        unknown = [name for name in names if name not in schema.COLUMN_NAMES]
+        if unknown:
+            logger.warning(f"Ignoring columns not in the managed schema: {unknown}")
+        columns = [name for name in schema.COLUMN_NAMES if name in names]
+        return columns, [names.index(name) for name in columns]
+    
+    def _convert(self, row):
+        """Converted values of one CSV row, or None if it cannot be loaded"""
+        values = [
+            parse(row[pos]) if pos < len(row) else None
+            for parse, pos in zip(self._parsers, self._positions)
+        ]
+        if any(values[i] is None for i in self._key_positions):
+            return None
+        return values
+    
+    def _refill(self):
+        """Render the next batch of rows into the read buffer; False at end of file"""
+        self._writer_buffer.seek(0)
+        self._writer_buffer.truncate()
+        consumed = 0
+        for row in itertools.islice(self.reader, self.batch_rows):
+            consumed += 1
+            if not row:
+                continue  # blank line
+            values = self._convert(row)
+            if values is None:
+                self.skipped += 1
+                continue
+            self._writer.writerow(values)
+            self.rows += 1
+        self._buffer += self._writer_buffer.getvalue()
+        return consumed > 0
+    
+    def read(self, size=-1):
+        """Return up to `size` characters of COPY input ('' at end of file)"""
+        while (size < 0 or len(self._buffer) < size) and self._refill():
+            pass
+        if size < 0:
+            size = len(self._buffer)
+        block, self._buffer = self._buffer[:size], self._buffer[size:]
+        return block
+    
+    def close(self):
+        self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def _copy_csv_to_staging(cursor, stream, table_name, staging_name, chunk_bytes=1 << 20, temporary=True):
+    """
+    COPY a CsvCopyStream into a new staging table shaped like `table_name`
+    
+    Args:
+        temporary: Create a session-local temp table dropped at commit; otherwise
+            an UNLOGGED table that outlives the transaction (for another session to merge)
+    
+    Returns:
+        Number of rows copied, as reported by COPY
+    """
+    table = quote_ident(table_name)
+    staging = quote_ident(staging_name)
+    if temporary:
+        cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    else:
+        cursor.execute(f"CREATE UNLOGGED TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+    column_list = ", ".join(quote_ident(col) for col in stream.columns)
+    cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", stream, size=chunk_bytes)
+    return cursor.rowcount
+
+def _load_staged_rows(cursor, table_name, staging_name, column_names, mode="upsert", refresh_rollups=True):
+    """
+    Move staged rows into the managed table, creating the partitions they need
+    
+    Returns:
+        Tuple of (inserted rows, updated rows)
+    """
+    staging = quote_ident(staging_name)
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', date, 'UTC') FROM {staging}")
+    schema.ensure_partitions(cursor, table_name, [row[0] for row in cursor.fetchall()])
+    if mode == "upsert":
+        inserted, updated, _ = merge_staging_table(
+            cursor, table_name, staging_name, column_names, schema.KEY_COLUMNS, refresh_rollups
+        )
+        return inserted, updated
+    
+    column_list = ", ".join(quote_ident(col) for col in column_names)
+    if refresh_rollups:
+        rollups.stage_affected_from_table(cursor, staging_name)
+    cursor.execute(f"INSERT INTO {quote_ident(table_name)} ({column_list}) SELECT {column_list} FROM {staging}")
+    inserted = cursor.rowcount
+    if refresh_rollups:
+        rollups.refresh(cursor, table_name)
+    return inserted, 0
+
+def stream_csv_to_db(csv_file, table_name, engine, mode="upsert", chunk_bytes=1 << 20, refresh_rollups=True):
+    """
+    Stream a CSV file into the managed table with COPY, without loading it into pandas
+    
+    The file is COPYed into a temporary staging table in blocks of
+    `chunk_bytes`, the monthly partitions its dates need are created, and the
+    staged rows are inserted (append) or merged by key (upsert), all in one
+    transaction. The table must already be migrated (schema.migrate).
+    
+    Args:
+        csv_file: Path to the CSV file
+        table_name: Managed table name
+        engine: SQLAlchemy engine (psycopg2 driver)
+        mode: 'upsert' to merge rows by key, 'append' to insert them
+        chunk_bytes: Size of the blocks read from the file and sent to the server
+        refresh_rollups: Update the rollup buckets touched by the load
+    
+    Returns:
+        Tuple of (rows copied, inserted rows, updated rows)
+    """
+    if mode not in ("upsert", "append"):
+        raise ValueError(f"Unsupported streaming mode: {mode}")
+    
+    staging_name = f"{table_name}_staging"
+    with CsvCopyStream(csv_file) as stream:
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                copied = _copy_csv_to_staging(cursor, stream, table_name, staging_name, chunk_bytes)
+                inserted, updated = _load_staged_rows(
+                    cursor, table_name, staging_name, stream.columns, mode, refresh_rollups
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    if stream.skipped:
+        logger.warning(f"Skipped {stream.skipped} rows without a valid id/date")
+    logger.info(f"Streamed {copied} rows into {table_name}: {inserted} inserted, {updated} updated")
+    return copied, inserted, updated
+
+def record_loaded_file(db_name, table_name, csv_file, rows_loaded):
+    """Record a single-file load in the ingest ledger, so backfills skip the file"""
+    with raw_connection(db_name) as conn:
+        try:
+            with conn.cursor() as cursor:
+                schema.record_ingest(cursor, table_name, os.path.basename(csv_file), file_sha256(csv_file),
+                                     rows_loaded)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def swap_in_shadow(db_name, table_name, managed_schema=True):
+    """Finish a replace-mode load: build the shadow's indexes and rollups, then swap it in"""
+    with raw_connection(db_name) as conn:
+        if managed_schema:
+            schema.migrate(conn, schema.shadow_name(table_name))
+        schema.swap_shadow(conn, table_name)
+
+def list_labeled_files(labeled_dir=None):
+    """CSV files in the labeled directory, oldest first (the order they were produced in)"""
+    labeled_dir = labeled_dir or LABELED_DIR
+    files = [os.path.join(labeled_dir, f) for f in os.listdir(labeled_dir) if f.endswith('.csv')]
+    return sorted(files, key=lambda path: (os.path.getctime(path), os.path.basename(path)))
+
+def _stage_file(csv_file, table_name, staging_name, engine, chunk_bytes=1 << 20):
+    """Backfill worker: stream one file into its own UNLOGGED staging table and commit"""
+    with CsvCopyStream(csv_file) as stream:
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                copied = _copy_csv_to_staging(cursor, stream, table_name, staging_name, chunk_bytes,
+                                              temporary=False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    if stream.skipped:
+        logger.warning(f"Skipped {stream.skipped} rows without a valid id/date in {csv_file}")
+    return copied, stream.columns
+
+def _merge_staged_file(engine, table_name, staging_name, column_names, file_name, sha256, copied,
+                       mode="upsert", refresh_rollups=True):
+    """Merge one staged file and record it in the ingest ledger, in one transaction"""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Serialize with other backfills of the same table; the ledger check
+            # below then guarantees each file is merged once
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"ingest:{table_name}",))
+            if not schema.record_ingest(cursor, table_name, file_name, sha256, copied):
+                logger.info(f"{file_name} was ingested concurrently, skipping")
+                conn.rollback()
+                return None
+            result = _load_staged_rows(cursor, table_name, staging_name, column_names, mode, refresh_rollups)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _drop_staging_tables(engine, staging_names):
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for staging_name in staging_names:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_ident(staging_name)}")
+        conn.commit()
+    finally:
+        conn.close()
+
+def backfill_labeled_files(db_name, table_name, labeled_dir=None, workers=4, mode="upsert",
+                           refresh_rollups=True):
+    """
+    Load every labeled CSV file not yet recorded in the ingest ledger
+    
+    Files are parsed and COPYed into per-file UNLOGGED staging tables by a
+    pool of `workers` threads sharing the engine's connection pool. Staged
+    files are merged into the managed table one at a time, oldest first, so a
+    tweet present in several files ends up with the values of the newest
+    one. Each merge records its file in the ledger in the same transaction;
+    after a failure the remaining files are left pending for the next run.
+    
+    Args:
+        db_name: Database name
+        table_name: Managed table name
+        labeled_dir: Directory holding the labeled CSV files
+        workers: Number of files staged concurrently (bounded by the pool size)
+        mode: 'upsert' to merge rows by key, 'append' to insert them
+        refresh_rollups: Update the rollup buckets touched by each file
+    
+    Returns:
+        Dict of file name -> rows copied, for the files loaded by this run
+    """
+    create_database_if_not_exists(db_name)
+    engine = connect_to_db(db_name)
+    with raw_connection(db_name) as conn:
+        schema.migrate(conn, table_name)
+        with conn.cursor() as cursor:
+            done = schema.ingested_files(cursor, table_name)
+        conn.commit()
+    
+    # One connection stays free for the merges
+    workers = max(1, min(workers, pool_capacity() - 1))
+    files = list_labeled_files(labeled_dir)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(file_sha256, files))
+        pending = [
+            (path, sha256) for path, sha256 in zip(files, hashes)
+            if (os.path.basename(path), sha256) not in done
+        ]
+        logger.info(f"Backfill: {len(pending)} of {len(files)} files pending, {workers} workers")
+        
+        staging_names = [f"{table_name}_backfill_{os.getpid()}_{i}" for i in range(len(pending))]
+        futures = [
+            pool.submit(_stage_file, path, table_name, staging_name, engine)
+            for (path, _), staging_name in zip(pending, staging_names)
+        ]
+        loaded = {}
+        try:
+            for (path, sha256), staging_name, future in zip(pending, staging_names, futures):
+                file_name = os.path.basename(path)
+                copied, columns = future.result()
+                result = _merge_staged_file(engine, table_name, staging_name, columns, file_name, sha256,
+                                            copied, mode, refresh_rollups)
+                _drop_staging_tables(engine, [staging_name])
+                if result is not None:
+                    loaded[file_name] = copied
+                    logger.info(f"Backfilled {file_name}: {copied} rows, "
+                                f"{result[0]} inserted, {result[1]} updated")
+        finally:
+            for future in futures:
+                future.cancel()
+            # Wait for running stagings before dropping what is left
+            for future in futures:
+                if not future.cancelled():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+            _drop_staging_tables(engine, staging_names)
+    return loaded
+
+def load_data_to_db(csv_file, db_name, table_name, if_exists="replace", method="copy", binary=False,
+                    managed_schema=True, refresh_rollups=True):
     """
     Load data from CSV file to PostgreSQL database
     
@@ -56,7 +769,14 @@ def load_data_to_db(csv_file, db_name, table_name, if_exists="replace"):
         csv_file: Path to the CSV file
         db_name: Database name
         table_name: Table name
-        if_exists: How to handle existing table ('replace', 'append', 'fail')
+        if_exists: How to handle existing table ('replace', 'append', 'fail', or
+            'upsert' to merge rows by tweet id)
+        method: 'copy' to bulk load with COPY, 'insert' to use DataFrame.to_sql,
+            'stream' to stream the file into COPY without pandas (managed schema only)
+        binary: Use binary COPY format (method='copy' only)
+        managed_schema: Load into the partitioned, indexed table managed by
+            schema.py instead of letting pandas infer the table
+        refresh_rollups: Update the Grafana rollup tables (managed schema only)
     
     Returns:
         Number of records loaded
@@ -65,6 +785,39 @@ def load_data_to_db(csv_file, db_name, table_name, if_exists="replace"):
         # Ensure database exists
         create_database_if_not_exists(db_name)
         
+        # The managed schema loads into a migrated table in append/upsert mode,
+        # so 'fail' is checked here rather than left to to_sql
+        if if_exists == "fail":
+            with raw_connection(db_name) as conn:
+                with conn.cursor() as cursor:
+                    if schema.table_exists(cursor, table_name):
+                        raise ValueError(f"Table '{table_name}' already exists")
+        
+        # Replace mode loads a shadow table and swaps it in once it is complete;
+        # its indexes and rollups are built after the load
+        replace = if_exists == "replace"
+        target_table = table_name
+        max_version = None
+        if replace:
+            with raw_connection(db_name) as conn:
+                target_table = schema.prepare_shadow(conn, table_name)
+            max_version = schema.BASE_VERSION
+            refresh_rollups = False
+        
+        if method == "stream":
+            if not managed_schema:
+                raise ValueError("The streaming loader requires the managed schema")
+            with raw_connection(db_name) as conn:
+                schema.migrate(conn, target_table, max_version)
+            mode = "upsert" if if_exists == "upsert" else "append"
+            copied, _, _ = stream_csv_to_db(csv_file, target_table, connect_to_db(db_name), mode=mode,
+                                            refresh_rollups=refresh_rollups)
+            record_loaded_file(db_name, target_table, csv_file, copied)
+            if replace:
+                swap_in_shadow(db_name, table_name)
+            logger.info(f"Loaded {copied} records into {db_name}.{table_name}")
+            return copied
+        
         # Load CSV data
         logger.info(f"Loading data from {csv_file}")
         df = pd.read_csv(csv_file)
@@ -79,7 +832,28 @@ def load_data_to_db(csv_file, db_name, table_name, if_exists="replace"):
         
         # Connect to target database and insert data
         engine = connect_to_db(db_name)
-        df.to_sql(table_name, engine, if_exists=if_exists, index=False)
+        key_columns = ("id",)
+        if managed_schema:
+            with raw_connection(db_name) as conn:
+                df = schema.prepare_table(conn, target_table, df, max_version)
+            key_columns = schema.KEY_COLUMNS
+            if if_exists in ("replace", "fail"):
+                if_exists = "append"
+        
+        if if_exists == "upsert":
+            upsert_dataframe_to_db(df, target_table, engine, key_columns=key_columns, binary=binary,
+                                   refresh_rollups=managed_schema and refresh_rollups)
+        elif method == "copy":
+            copy_dataframe_to_db(df, target_table, engine, if_exists=if_exists, binary=binary,
+                                 refresh_rollups=managed_schema and refresh_rollups)
+        else:
+            df.to_sql(target_table, engine, if_exists=if_exists, index=False)
+            if managed_schema and refresh_rollups:
+                refresh_rollups_for_frame(engine, target_table, df)
+        if managed_schema:
+            record_loaded_file(db_name, target_table, csv_file, len(df))
+        if replace:
+            swap_in_shadow(db_name, table_name, managed_schema)
         
         logger.info(f"Loaded {len(df)} records into {db_name}.{table_name}")
         return len(df)
@@ -90,7 +864,7 @@ def load_data_to_db(csv_file, db_name, table_name, if_exists="replace"):
 
 def get_latest_labeled_file():
         """Get the latest labeled file from the labeled directory"""
-        labeled_dir = '/mnt/d/MLOps2/data/labeled'
+        labeled_dir = LABELED_DIR
         files = [f for f in os.listdir(labeled_dir) if f.endswith('.csv')]
         if not files:
             return None
@@ -98,23 +872,16 @@ def get_latest_labeled_file():
         return os.path.join(labeled_dir, latest_file)
 
 def test_connection():
-    """Test the database connection properly using psycopg2"""
-    db_user = os.getenv("DB_USER", "postgres")
-    db_password = os.getenv("DB_PASSWORD")
-    db_host = os.getenv("DB_HOST", "host.docker.internal")
-    db_port = os.getenv("DB_PORT", "5432")
+    """Test the database connection using a connection from the shared pool"""
+    settings = get_db_settings()
+    db_host = settings["host"]
+    db_port = settings["port"]
     
     try:
-        # Thử kết nối trực tiếp bằng psycopg2
-        conn = psycopg2.connect(
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port,
-            database="postgres",  # Kết nối đến postgres mặc định
-            connect_timeout=3     # Timeout sau 3 giây
-        )
-        conn.close()
+        # Kết nối đến postgres mặc định; kết nối được trả lại pool để dùng tiếp
+        with raw_connection("postgres") as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
         print(f"✅ Successfully connected to PostgreSQL at {db_host}:{db_port}")
         return True
     except Exception as e:
@@ -172,88 +939,102 @@ def main():
     )
     parser.add_argument(
         "--mode", "-m", 
-        default="append", 
-        choices=["replace", "append", "fail"],
-        help="How to handle existing tables"
+        default="upsert", 
+        choices=["upsert", "replace", "append", "fail"],
+        help="How to handle existing tables (upsert merges rows by tweet id)"
+    )
+    parser.add_argument(
+        "--schema",
+        default="managed",
+        choices=["managed", "inferred"],
+        help="Load into the partitioned/indexed table from schema.py, or let pandas infer the table"
+    )
+    parser.add_argument(
+        "--no-rollups",
+        action="store_true",
+        help="Do not update the Grafana rollup tables (managed schema only)"
+    )
+    parser.add_argument(
+        "--loader",
+        default="copy",
+        choices=["copy", "insert", "stream"],
+        help="Bulk load with COPY FROM STDIN, INSERT rows with DataFrame.to_sql, or stream "
+             "the file straight into COPY without pandas (managed schema only)"
+    )
+    parser.add_argument(
+        "--copy-format",
+        default="csv",
+        choices=["csv", "binary"],
+        help="Wire format used by the COPY loader"
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Load every file in the labeled directory not yet in the ingest ledger (managed schema only)"
+    )
+    parser.add_argument(
+        "--labeled-dir",
+        default=LABELED_DIR,
+        help="Directory scanned by --backfill"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("INGEST_WORKERS", "4")),
+        help="Number of files staged concurrently by --backfill"
     )
     
     args = parser.parse_args()
     
+    # Nạp tất cả các file chưa có trong ledger (ví dụ sau một thời gian downtime)
+    if args.backfill:
+        try:
+            if args.schema != "managed" or args.mode not in ("upsert", "append"):
+                raise ValueError("--backfill yêu cầu --schema managed và --mode upsert/append")
+            loaded = backfill_labeled_files(args.database, args.table, args.labeled_dir, workers=args.workers,
+                                            mode=args.mode, refresh_rollups=not args.no_rollups)
+        except Exception as e:
+            print(f"❌ Lỗi: {str(e)}")
+            sys.exit(1)
+        print(f"✅ Đã backfill {len(loaded)} file ({sum(loaded.values())} dòng) vào {args.database}.{args.table}")
+        return
+    
     # Check if file exists
     if not os.path.exists(args.file):
         logger.error(f"File not found: {args.file}")
         sys.exit(1)
     
-    # Use the same connection parameters that worked in test_connection()
-    db_user = os.getenv("DB_USER", "postgres")
-    db_password = os.getenv("DB_PASSWORD")
-    db_host = os.getenv("DB_HOST", "host.docker.internal")
-    db_port = os.getenv("DB_PORT", "5432")
+    # Stream thẳng file vào COPY, không đọc toàn bộ file bằng pandas
+    if args.loader == "stream":
+        try:
+            if args.schema != "managed":
+                raise ValueError("--loader stream yêu cầu --schema managed")
+            print(f"Đang stream dữ liệu vào bảng {args.table}...")
+            copied = load_data_to_db(args.file, args.database, args.table, if_exists=args.mode,
+                                     method="stream", refresh_rollups=not args.no_rollups)
+        except Exception as e:
+            print(f"❌ Lỗi: {str(e)}")
+            sys.exit(1)
+        if copied == 0:
+            print("⚠️ File CSV không có dữ liệu!")
+            sys.exit(1)
+        print(f"✅ Đã load thành công {copied} dòng vào {args.database}.{args.table}")
+        return
     
     # Load a small piece of data first to test the connection thoroughly
     try:
-        df = pd.read_csv(args.file)
-        print(f"Đã đọc {len(df)} dòng từ file CSV.")
-        
-        # Kiểm tra xem dữ liệu có được đọc đúng không
-        if len(df) == 0:
+        # Kiểm tra xem file có dữ liệu không (chỉ đọc dòng đầu)
+        if pd.read_csv(args.file, nrows=1).empty:
             print("⚠️ File CSV không có dữ liệu!")
             sys.exit(1)
-            
-        # Tạo kết nối trực tiếp để kiểm tra một cách toàn diện
-        # Sử dụng psycopg2 thay vì SQLAlchemy
-        print(f"Đang kết nối trực tiếp đến PostgreSQL để kiểm tra thêm...")
-        conn = psycopg2.connect(
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port,
-            database="postgres"
-        )
-        
-        # Thử tạo database nếu chưa tồn tại
-        conn.autocommit = True
-        cursor = conn.cursor()
-        try:
-            cursor.execute(f"CREATE DATABASE {args.database}")
-            print(f"✅ Đã tạo database '{args.database}'")
-        except psycopg2.errors.DuplicateDatabase:
-            print(f"✅ Database '{args.database}' đã tồn tại")
-        
-        conn.close()
-        
-        # Tiếp tục với kết nối đến database đích
-        conn_target = psycopg2.connect(
-            user=db_user,
-            password=db_password, 
-            host=db_host,
-            port=db_port,
-            database=args.database
-        )
-        
-        # Thử tạo bảng nếu cần thiết
-        conn_target.autocommit = True
-        cursor = conn_target.cursor()
-        if args.mode == "replace":
-            try:
-                cursor.execute(f"DROP TABLE IF EXISTS {args.table}")
-                print(f"✅ Đã xóa bảng '{args.table}' cũ")
-            except Exception as e:
-                print(f"⚠️ Không thể xóa bảng cũ: {e}")
         
-        # Đóng kết nối psycopg2
-        conn_target.close()
-        
-        # Tiếp tục với SQLAlchemy để load dữ liệu
         print(f"Đang load dữ liệu vào bảng {args.table}...")
-        
-        # Tạo kết nối SQLAlchemy trực tiếp với thông số đã hoạt động
-        conn_string = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{args.database}"
-        engine = create_engine(conn_string)
-        print('Đang kết nối đến PostgreSQL...")')
-        # Lưu dữ liệu
-        df.to_sql(args.table, engine, if_exists=args.mode, index=False)
-        print(f"✅ Đã load thành công {len(df)} dòng vào {args.database}.{args.table}")
+        loaded = load_data_to_db(args.file, args.database, args.table, if_exists=args.mode, method=args.loader,
+                                 binary=args.copy_format == "binary", managed_schema=args.schema == "managed",
+                                 refresh_rollups=not args.no_rollups)
+        if args.mode == "replace":
+            print(f"✅ Đã thay thế bảng '{args.table}' bằng bảng shadow")
+        print(f"✅ Đã load thành công {loaded} dòng vào {args.database}.{args.table}")
         
     except Exception as e:
         print(f"❌ Lỗi: {str(e)}")
@@ -0,0 +1,161 @@
+"""
+Pre-aggregated rollup tables for the Grafana dashboards.
+
+Two rollups are kept next to the managed tweets table:
+    <table>_sentiment_daily   tweet counts per day x searched_keyword x sentiment
+    <table>_engagement_daily  tweet count and engagement sums per day x searched_keyword
+
+Each ingested batch only recomputes the (day, keyword) buckets it touched,
+including the old bucket of a row whose keyword changed, so refresh cost
+depends on the batch size and not on the size of the raw table.
+"""
+import logging
+
+from db_engine import quote_ident
+
+logger = logging.getLogger(__name__)
+
+AFFECTED_TABLE = "rollup_affected_buckets"
+ENGAGEMENT_COLUMNS = ("replycount", "retweetcount", "likecount", "quotecount", "viewcount")
+
+# Rollup primary keys cannot hold NULLs; missing keywords/sentiments get these values
+NO_KEYWORD = ""
+NO_SENTIMENT = -1
+
+DAY_EXPR = "(t.date AT TIME ZONE 'UTC')::date"
+KEYWORD_EXPR = f"coalesce(t.searched_keyword, '{NO_KEYWORD}')"
+
+
+def sentiment_table(table_name):
+    return f"{table_name}_sentiment_daily"
+
+
+def engagement_table(table_name):
+    return f"{table_name}_engagement_daily"
+
+
+def create_tables(cursor, table_name):
+    """Create the rollup tables for `table_name` if they do not exist"""
+    sums = ", ".join(f"{col}_sum BIGINT NOT NULL DEFAULT 0" for col in ENGAGEMENT_COLUMNS)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote_ident(sentiment_table(table_name))} ("
+        "day DATE NOT NULL, searched_keyword TEXT NOT NULL, sentiment SMALLINT NOT NULL, "
+        "tweet_count BIGINT NOT NULL, PRIMARY KEY (day, searched_keyword, sentiment))"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote_ident(engagement_table(table_name))} ("
+        f"day DATE NOT NULL, searched_keyword TEXT NOT NULL, tweet_count BIGINT NOT NULL, {sums}, "
+        "PRIMARY KEY (day, searched_keyword))"
+    )
+
+
+def _aggregate_sql(table_name, bucket_filter=""):
+    """INSERT ... SELECT statements aggregating raw rows into both rollups"""
+    raw = quote_ident(table_name)
+    sums = ", ".join(f"coalesce(sum(t.{col}), 0)" for col in ENGAGEMENT_COLUMNS)
+    sum_columns = ", ".join(f"{col}_sum" for col in ENGAGEMENT_COLUMNS)
+    return [
+        f"INSERT INTO {quote_ident(sentiment_table(table_name))} "
+        f"(day, searched_keyword, sentiment, tweet_count) "
+        f"SELECT {DAY_EXPR}, {KEYWORD_EXPR}, coalesce(t.sentiment, {NO_SENTIMENT}), count(*) "
+        f"FROM {raw} t {bucket_filter} GROUP BY 1, 2, 3",
+        f"INSERT INTO {quote_ident(engagement_table(table_name))} "
+        f"(day, searched_keyword, tweet_count, {sum_columns}) "
+        f"SELECT {DAY_EXPR}, {KEYWORD_EXPR}, count(*), {sums} "
+        f"FROM {raw} t {bucket_filter} GROUP BY 1, 2",
+    ]
+
+
+def _lock(cursor, table_name):
+    """Serialize rollup maintenance of `table_name` until the transaction ends"""
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"rollup:{table_name}",))
+
+
+def rebuild(cursor, table_name):
+    """Recompute both rollups from the whole raw table"""
+    _lock(cursor, table_name)
+    create_tables(cursor, table_name)
+    cursor.execute(f"TRUNCATE {quote_ident(sentiment_table(table_name))}, "
+                   f"{quote_ident(engagement_table(table_name))}")
+    for statement in _aggregate_sql(table_name):
+        cursor.execute(statement)
+    logger.info(f"Rebuilt rollups for {table_name}")
+
+
+def _create_affected_table(cursor):
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {AFFECTED_TABLE} "
+        "(day DATE NOT NULL, searched_keyword TEXT NOT NULL) ON COMMIT DROP"
+    )
+
+
+def stage_affected_from_table(cursor, source_table, table_name=None, key_columns=()):
+    """
+    Record the buckets touched by rows of `source_table` (e.g. an upsert staging table)
+
+    Args:
+        cursor: psycopg2 cursor (inside the loading transaction)
+        source_table: Table holding the incoming rows
+        table_name: Raw table the rows are merged into; when given, the buckets
+            currently holding rows with the same keys are recorded as well, so a
+            row moving to another keyword is removed from its old bucket
+        key_columns: Key columns shared by `source_table` and `table_name`
+    """
+    _create_affected_table(cursor)
+    source = quote_ident(source_table)
+    cursor.execute(
+        f"INSERT INTO {AFFECTED_TABLE} SELECT DISTINCT {DAY_EXPR}, {KEYWORD_EXPR} FROM {source} t"
+    )
+    if table_name and key_columns:
+        match = " AND ".join(f"t.{quote_ident(col)} = s.{quote_ident(col)}" for col in key_columns)
+        cursor.execute(
+            f"INSERT INTO {AFFECTED_TABLE} SELECT DISTINCT {DAY_EXPR}, {KEYWORD_EXPR} "
+            f"FROM {quote_ident(table_name)} t JOIN {source} s ON {match}"
+        )
+
+
+def stage_affected_from_frame(cursor, df):
+    """Record the buckets touched by the rows of a DataFrame (e.g. an appended batch)"""
+    from psycopg2.extras import execute_values
+
+    _create_affected_table(cursor)
+    days = df["date"].dt.tz_convert("UTC").dt.date
+    keywords = df["searched_keyword"].fillna(NO_KEYWORD).astype(str)
+    buckets = set(zip(days, keywords))
+    execute_values(cursor, f"INSERT INTO {AFFECTED_TABLE} (day, searched_keyword) VALUES %s", list(buckets))
+
+
+def refresh(cursor, table_name):
+    """
+    Recompute the rollup rows of every staged bucket from the raw table
+
+    Must run in the same transaction as the load, after the rows are written.
+    """
+    _lock(cursor, table_name)
+    create_tables(cursor, table_name)
+    cursor.execute(
+        f"CREATE TEMP TABLE {AFFECTED_TABLE}_distinct ON COMMIT DROP AS "
+        f"SELECT DISTINCT day, searched_keyword FROM {AFFECTED_TABLE}"
+    )
+    cursor.execute(f"DROP TABLE {AFFECTED_TABLE}")
+    buckets = f"{AFFECTED_TABLE}_distinct"
+
+    for rollup in (sentiment_table(table_name), engagement_table(table_name)):
+        cursor.execute(
+            f"DELETE FROM {quote_ident(rollup)} r USING {buckets} a "
+            "WHERE r.day = a.day AND r.searched_keyword = a.searched_keyword"
+        )
+    # Range conditions on t.date let the planner prune partitions and use the date index
+    bucket_filter = (
+        f"JOIN {buckets} a ON t.date >= a.day::timestamp AT TIME ZONE 'UTC' "
+        f"AND t.date < (a.day + 1)::timestamp AT TIME ZONE 'UTC' "
+        f"AND {KEYWORD_EXPR} = a.searched_keyword"
+    )
+    for statement in _aggregate_sql(table_name, bucket_filter):
+        cursor.execute(statement)
+
+    cursor.execute(f"SELECT count(*) FROM {buckets}")
+    refreshed = cursor.fetchone()[0]
+    cursor.execute(f"DROP TABLE {buckets}")
+    logger.info(f"Refreshed {refreshed} rollup buckets for {table_name}")
+    return refreshed
@@ -0,0 +1,448 @@
+"""
+Managed DDL for the tweets table.
+
+The table is range-partitioned by month on `date` and indexed for the
+dashboard queries (date, sentiment, user_id, searched_keyword). Schema
+changes are applied as numbered migrations recorded in `schema_migrations`,
+so every ingest run brings an existing database up to date, including a
+legacy table that was created implicitly by DataFrame.to_sql.
+"""
+import logging
+
+import pandas as pd
+
+import rollups
+from db_engine import quote_ident
+
+logger = logging.getLogger(__name__)
+
+# Managed column layout of the tweets table (matches the predicted_twitter_*.csv files)
+TWEETS_COLUMNS = [
+    ("id", "BIGINT NOT NULL"),
+    ("date", "TIMESTAMPTZ NOT NULL"),
+    ("user_id", "BIGINT"),
+    ("user_username", "TEXT"),
+    ("user_displayname", "TEXT"),
+    ("replycount", "BIGINT"),
+    ("retweetcount", "BIGINT"),
+    ("likecount", "BIGINT"),
+    ("quotecount", "BIGINT"),
+    ("viewcount", "BIGINT"),
+    ("searched_keyword", "TEXT"),
+    ("cleaned_text", "TEXT"),
+    ("hashtag_text", "TEXT"),
+    ("year", "INTEGER"),
+    ("month_year", "TEXT"),
+    ("sentiment", "SMALLINT"),
+]
+COLUMN_NAMES = [name for name, _ in TWEETS_COLUMNS]
+
+# The partition key has to be part of the primary key
+KEY_COLUMNS = ("id", "date")
+
+INDEXED_COLUMNS = ("date", "sentiment", "user_id", "searched_keyword")
+
+# Ingestion-order watermark: every inserted or changed row takes the next value of one
+# database-wide sequence, so "rows ingested since" does not depend on tweet ids (snowflakes)
+# and survives a replace-mode reload
+INGEST_SEQ_COLUMN = "ingest_seq"
+INGEST_SEQUENCE = "ingest_seq"
+
+# Sentiment labels as encoded by model_training.DataProcessor.clean_and_map
+SENTIMENT_MAPPING = {'Positive': 1, 'Negative': 0, 'Neutral': 2}
+
+
+def normalize_frame(df):
+    """
+    Coerce a labeled/predicted DataFrame to the managed column layout
+
+    Column names are lower-cased (labeled files use `likeCount`, `Sentiment`),
+    dates are parsed as UTC, text sentiment labels are mapped to their numeric
+    codes, and rows without a valid date are dropped since `date` is the
+    partition key.
+    """
+    df = df.rename(columns=str.lower)
+    df = df.reindex(columns=COLUMN_NAMES)
+    # ISO 8601 only, so a file mixing "T" and " " separators parses every row
+    df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True, format="ISO8601")
+
+    labels = df["sentiment"].astype("string").str.strip()
+    mapped = labels.str.capitalize().map(SENTIMENT_MAPPING)
+    df["sentiment"] = mapped.fillna(pd.to_numeric(labels, errors="coerce")).astype("Int16")
+    for name, ddl in TWEETS_COLUMNS:
+        if ddl.startswith(("BIGINT", "INTEGER")):
+            df[name] = pd.to_numeric(df[name], errors="coerce").astype("Int64")
+
+    missing = df["date"].isna() | df["id"].isna()
+    if missing.any():
+        logger.warning(f"Dropping {int(missing.sum())} rows without a valid id/date")
+        df = df[~missing]
+    return df
+
+
+def table_exists(cursor, table_name):
+    cursor.execute("SELECT to_regclass(%s)", (quote_ident(table_name),))
+    return cursor.fetchone()[0] is not None
+
+
+def is_partitioned(cursor, table_name):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        (quote_ident(table_name),)
+    )
+    return cursor.fetchone() is not None
+
+
+def partition_name(table_name, month_start):
+    return f"{table_name}_p{month_start:%Y%m}"
+
+
+def ensure_partitions(cursor, table_name, dates):
+    """
+    Create the monthly partitions needed to hold `dates`
+
+    Args:
+        cursor: psycopg2 cursor
+        table_name: Partitioned parent table
+        dates: Iterable/Series of timestamps (UTC) about to be loaded
+
+    Returns:
+        Number of partitions created
+    """
+    dates = pd.to_datetime(pd.Series(dates), utc=True).dropna()
+    if dates.empty:
+        return 0
+
+    months = sorted(dates.dt.tz_convert("UTC").dt.tz_localize(None).dt.to_period("M").unique())
+    # Serialize with concurrent loaders creating the same partitions
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"schema:{table_name}",))
+    created = 0
+    for month in months:
+        start = month.start_time
+        end = (month + 1).start_time
+        name = partition_name(table_name, start)
+        if table_exists(cursor, name):
+            continue
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote_ident(name)} PARTITION OF {quote_ident(table_name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            (f"{start:%Y-%m-%d} 00:00:00+00", f"{end:%Y-%m-%d} 00:00:00+00")
+        )
+        created += 1
+    if created:
+        logger.info(f"Created {created} monthly partitions for {table_name}")
+    return created
+
+
+def _create_partitioned_table(cursor, table_name):
+    columns = ",\n    ".join(f"{quote_ident(name)} {ddl}" for name, ddl in TWEETS_COLUMNS)
+    keys = ", ".join(quote_ident(col) for col in KEY_COLUMNS)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote_ident(table_name)} (\n    {columns},\n"
+        f"    PRIMARY KEY ({keys})\n) PARTITION BY RANGE ({quote_ident('date')})"
+    )
+
+
+def _legacy_select_expr(name, ddl, legacy_types):
+    """Expression converting a legacy to_sql column to its managed type"""
+    column = next((c for c in legacy_types if c.lower() == name), None)
+    sql_type = ddl.replace(" NOT NULL", "")
+    if column is None:
+        return f"NULL::{sql_type}"
+    source = quote_ident(column)
+    if name == "sentiment" and legacy_types[column] == "text":
+        cases = " ".join(f"WHEN '{label}' THEN {code}" for label, code in SENTIMENT_MAPPING.items())
+        return f"CASE initcap(trim({source})) {cases} ELSE NULL END::SMALLINT"
+    if name == "date" and legacy_types[column] == "text":
+        return f"NULLIF(trim({source}), '')::TIMESTAMPTZ"
+    return f"{source}::{sql_type}"
+
+
+def _migrate_create_table(cursor, table_name):
+    """Create the partitioned table, moving rows over from a legacy to_sql table"""
+    if table_exists(cursor, table_name) and is_partitioned(cursor, table_name):
+        return
+
+    legacy = None
+    if table_exists(cursor, table_name):
+        legacy = f"{table_name}_legacy"
+        cursor.execute(f"ALTER TABLE {quote_ident(table_name)} RENAME TO {quote_ident(legacy)}")
+        # Free index/constraint names (e.g. tweets_pkey) for the new table
+        cursor.execute(
+            "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass",
+            (quote_ident(legacy),)
+        )
+        for (index_name,) in cursor.fetchall():
+            index_name = index_name.strip('"')
+            cursor.execute(f"ALTER INDEX {quote_ident(index_name)} RENAME TO {quote_ident(index_name + '_legacy')}")
+
+    _create_partitioned_table(cursor, table_name)
+    if legacy is None:
+        return
+
+    cursor.execute(
+        "SELECT attname, format_type(atttypid, NULL) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+        (quote_ident(legacy),)
+    )
+    legacy_types = dict(cursor.fetchall())
+    exprs = [_legacy_select_expr(name, ddl, legacy_types) for name, ddl in TWEETS_COLUMNS]
+    select_list = ", ".join(f"{expr} AS {quote_ident(name)}" for expr, name in zip(exprs, COLUMN_NAMES))
+    converted = f"SELECT {select_list} FROM {quote_ident(legacy)}"
+
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', date, 'UTC') FROM ({converted}) t WHERE date IS NOT NULL")
+    ensure_partitions(cursor, table_name, [row[0] for row in cursor.fetchall()])
+
+    keys = ", ".join(quote_ident(col) for col in KEY_COLUMNS)
+    cursor.execute(
+        f"INSERT INTO {quote_ident(table_name)} SELECT DISTINCT ON ({keys}) * FROM ({converted}) t "
+        f"WHERE id IS NOT NULL AND date IS NOT NULL ORDER BY {keys}"
+    )
+    logger.info(f"Moved {cursor.rowcount} rows from legacy table into partitioned {table_name}")
+    cursor.execute(f"DROP TABLE {quote_ident(legacy)}")
+
+
+def _migrate_create_indexes(cursor, table_name):
+    """Index the columns Grafana panels filter and group on"""
+    for column in INDEXED_COLUMNS:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_ident(f'{table_name}_{column}_idx')} "
+            f"ON {quote_ident(table_name)} ({quote_ident(column)})"
+        )
+
+
+def _migrate_create_rollups(cursor, table_name):
+    """Create and fill the sentiment/engagement rollup tables read by Grafana"""
+    rollups.rebuild(cursor, table_name)
+
+
+def _migrate_add_ingest_seq(cursor, table_name):
+    """Add the ingest_seq column (existing rows are numbered in scan order) and index it"""
+    cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {quote_ident(INGEST_SEQUENCE)}")
+    cursor.execute(
+        f"ALTER TABLE {quote_ident(table_name)} ADD COLUMN IF NOT EXISTS {quote_ident(INGEST_SEQ_COLUMN)} "
+        f"BIGINT NOT NULL DEFAULT nextval('{INGEST_SEQUENCE}')"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_ident(f'{table_name}_{INGEST_SEQ_COLUMN}_idx')} "
+        f"ON {quote_ident(table_name)} ({quote_ident(INGEST_SEQ_COLUMN)})"
+    )
+
+
+# Last migration applied before a bulk load into a fresh table (indexes and rollups are built after it)
+BASE_VERSION = 1
+
+# Ordered (version, description, function) migrations; append new ones, never edit applied ones
+MIGRATIONS = [
+    (1, "create partitioned tweets table", _migrate_create_table),
+    (2, "index date, sentiment, user_id, searched_keyword", _migrate_create_indexes),
+    (3, "create daily sentiment and engagement rollups", _migrate_create_rollups),
+    (4, "add ingest_seq ingestion-order column", _migrate_add_ingest_seq),
+]
+
+
+# Files already loaded into each managed table, keyed by content hash
+LEDGER_TABLE = "ingest_ledger"
+
+
+def ensure_ledger(cursor):
+    """Create the ingest ledger if it does not exist"""
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} ("
+        "table_name TEXT NOT NULL, file_name TEXT NOT NULL, sha256 TEXT NOT NULL, "
+        "rows_loaded BIGINT, ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "PRIMARY KEY (table_name, file_name, sha256))"
+    )
+
+
+def ingested_files(cursor, table_name):
+    """Set of (file_name, sha256) already recorded for `table_name`"""
+    ensure_ledger(cursor)
+    cursor.execute(f"SELECT file_name, sha256 FROM {LEDGER_TABLE} WHERE table_name = %s", (table_name,))
+    return set(cursor.fetchall())
+
+
+def record_ingest(cursor, table_name, file_name, sha256, rows_loaded):
+    """Record a loaded file; returns False if it was already recorded"""
+    ensure_ledger(cursor)
+    cursor.execute(
+        f"INSERT INTO {LEDGER_TABLE} (table_name, file_name, sha256, rows_loaded) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT DO NOTHING",
+        (table_name, file_name, sha256, rows_loaded)
+    )
+    return cursor.rowcount == 1
+
+
+def migrate(conn, table_name="tweets", max_version=None):
+    """
+    Apply pending migrations to `table_name` in one transaction
+
+    Args:
+        conn: psycopg2 connection (committed on success)
+        table_name: Managed table name
+        max_version: Stop after this migration (e.g. create a table without its
+            secondary indexes before a bulk load); None applies all of them
+
+    Returns:
+        List of applied migration versions
+    """
+    applied = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "table_name TEXT NOT NULL, version INTEGER NOT NULL, description TEXT, "
+                "applied_at TIMESTAMPTZ NOT NULL DEFAULT now(), PRIMARY KEY (table_name, version))"
+            )
+            # Serialize concurrent ingest runs migrating the same table
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"schema:{table_name}",))
+            cursor.execute("SELECT version FROM schema_migrations WHERE table_name = %s", (table_name,))
+            done = {row[0] for row in cursor.fetchall()}
+
+            for version, description, apply in MIGRATIONS:
+                if version in done or (max_version is not None and version > max_version):
+                    continue
+                logger.info(f"Applying migration {version} to {table_name}: {description}")
+                apply(cursor, table_name)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (table_name, version, description) VALUES (%s, %s, %s)",
+                    (table_name, version, description)
+                )
+                applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
+
+
+def drop_table(conn, table_name="tweets"):
+    """Drop a managed table and forget its migrations and ingested files, so the next migrate() recreates it"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_ident(table_name)}")
+            _forget_table(cursor, table_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def prepare_table(conn, table_name, df, max_version=None):
+    """
+    Migrate `table_name` and create the partitions a batch needs
+
+    Returns:
+        The batch normalized to the managed column layout
+    """
+    df = normalize_frame(df)
+    migrate(conn, table_name, max_version)
+    try:
+        with conn.cursor() as cursor:
+            ensure_partitions(cursor, table_name, df["date"])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return df
+
+
+def shadow_name(table_name):
+    """Table a replace-mode load writes to before it is swapped in"""
+    return f"{table_name}_shadow"
+
+
+def _owned_relations(cursor, table_name):
+    """A table, its partitions, its rollup tables and all their indexes"""
+    tables = [table_name, rollups.sentiment_table(table_name), rollups.engagement_table(table_name)]
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        (quote_ident(table_name),)
+    )
+    tables += [row[0] for row in cursor.fetchall()]
+    tables = [name for name in tables if table_exists(cursor, name)]
+    cursor.execute(
+        "SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid "
+        "WHERE x.indrelid = ANY(%s::regclass[])",
+        ([quote_ident(name) for name in tables],)
+    )
+    return tables, [row[0] for row in cursor.fetchall()]
+
+
+def _rename_relations(cursor, table_name, new_name):
+    """Rename a table and everything named after it (partitions, indexes/constraints, rollups)"""
+    tables, indexes = _owned_relations(cursor, table_name)
+    for kind, names in (("TABLE", tables), ("INDEX", indexes)):
+        for name in names:
+            if name.startswith(table_name):
+                renamed = new_name + name[len(table_name):]
+                cursor.execute(f"ALTER {kind} {quote_ident(name)} RENAME TO {quote_ident(renamed)}")
+
+
+def _drop_with_rollups(cursor, table_name):
+    for name in (table_name, rollups.sentiment_table(table_name), rollups.engagement_table(table_name)):
+        cursor.execute(f"DROP TABLE IF EXISTS {quote_ident(name)}")
+
+
+def _forget_table(cursor, table_name):
+    """Delete the migrations and ingested files recorded for `table_name`"""
+    for bookkeeping in ("schema_migrations", LEDGER_TABLE):
+        if table_exists(cursor, bookkeeping):
+            cursor.execute(f"DELETE FROM {bookkeeping} WHERE table_name = %s", (table_name,))
+
+
+def prepare_shadow(conn, table_name):
+    """
+    Start a replace-mode load by dropping any leftover shadow of `table_name`
+
+    Returns:
+        Name of the shadow table to load into
+    """
+    shadow = shadow_name(table_name)
+    try:
+        with conn.cursor() as cursor:
+            _drop_with_rollups(cursor, shadow)
+            _forget_table(cursor, shadow)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return shadow
+
+
+def swap_shadow(conn, table_name, lock_timeout="10s"):
+    """
+    Atomically replace `table_name` with its fully loaded shadow
+
+    Both tables are renamed (with their partitions, indexes and rollups) and
+    the old one dropped in one short transaction, so readers see either the
+    old or the new table, never a missing or half-loaded one. The renames
+    wait for running queries; after `lock_timeout` the swap fails instead of
+    queueing dashboard queries behind it, and the shadow is left in place.
+    """
+    shadow = shadow_name(table_name)
+    retired = f"{table_name}_retired"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"schema:{table_name}",))
+            if not table_exists(cursor, shadow):
+                raise ValueError(f"No shadow table '{shadow}' to swap in")
+            cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+            _drop_with_rollups(cursor, retired)
+            replaced = table_exists(cursor, table_name)
+            if replaced:
+                _rename_relations(cursor, table_name, retired)
+            _rename_relations(cursor, shadow, table_name)
+            _drop_with_rollups(cursor, retired)
+            # The swapped-in table carries the shadow's migrations and ingested files
+            _forget_table(cursor, table_name)
+            for bookkeeping in ("schema_migrations", LEDGER_TABLE):
+                if table_exists(cursor, bookkeeping):
+                    cursor.execute(f"UPDATE {bookkeeping} SET table_name = %s WHERE table_name = %s",
+                                   (table_name, shadow))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Swapped {shadow} in as {table_name}" + (" (old table dropped)" if replaced else ""))
@@ -1,13 +1,22 @@
 """
 Data validation module using Great Expectations.
+
+Checks run on the native pandas engine by default; Great Expectations is
+imported lazily, only when a full report is requested.
 """
 import os
 import pandas as pd
-import great_expectations as gx
-import great_expectations.expectations as gxe
 import logging
 from datetime import datetime
 
+import drift
+from validation_cache import cache_key, load_cached_summary, save_summary
+from validation_engine import ChunkedTwitterValidator, NativeTwitterValidator, summarize_results
+
+# Great Expectations modules, imported on first use (the import alone takes seconds)
+gx = None
+gxe = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +27,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _import_great_expectations():
+    """Import Great Expectations into the module namespace on first use."""
+    global gx, gxe
+    if gx is None:
+        import great_expectations
+        import great_expectations.expectations
+        gx, gxe = great_expectations, great_expectations.expectations
+
 class TwitterDataValidator:
     """Twitter data validator class."""
     
@@ -29,6 +46,7 @@ class TwitterDataValidator:
             df: DataFrame to validate (optional)
             filepath: Path to CSV file to validate (optional)
         """
+        _import_great_expectations()
         self.context = gx.get_context()
         
         if df is not None:
@@ -184,9 +202,72 @@ class TwitterDataValidator:
         })
         return result.success
     
-    def run_all_validations(self):
-        """Run all validations."""
+    def expectation_checks(self):
+        """Return (check name, expectation) pairs evaluated by a full run."""
+        actual_columns = len(self.df.columns)
+        return [
+            ("column_count", gxe.ExpectTableColumnCountToEqual(value=actual_columns)),
+            ("column_exists_sentiment", gxe.ExpectColumnToExist(column="sentiment")),
+            ("column_exists_cleaned_text", gxe.ExpectColumnToExist(column="cleaned_text")),
+            ("column_type_likecount", gxe.ExpectColumnValuesToBeOfType(column="likecount", type_="int64")),
+            ("no_nulls_cleaned_text", gxe.ExpectColumnValuesToNotBeNull(column="cleaned_text")),
+        ]
+
+    @staticmethod
+    def _expectation_key(configuration):
+        """Key used to match a suite result back to the check that produced it."""
+        return configuration.type, configuration.kwargs.get("column")
+
+    def run_suite_validations(self, checks=None):
+        """
+        Evaluate every expectation in a single ExpectationSuite run.
+
+        Args:
+            checks: List of (check name, expectation) pairs (defaults to expectation_checks())
+
+        Returns:
+            List of per-check success flags, in the order of `checks`
+        """
+        checks = checks if checks is not None else self.expectation_checks()
+        logger.info(f"Validating {len(checks)} expectations in one suite run")
+
+        suite = self.context.suites.add_or_update(gx.ExpectationSuite(name="twitter_data_suite"))
+        for _, expectation in checks:
+            suite.add_expectation(expectation)
+
+        suite_result = self.batch.validate(suite)
+        results_by_key = {
+            self._expectation_key(r.expectation_config): r for r in suite_result.results
+        }
+
+        successes = []
+        for check_name, expectation in checks:
+            result = results_by_key.get(self._expectation_key(expectation.configuration))
+            success = bool(result is not None and result.success)
+            self.validation_results.append({
+                "check": check_name,
+                "success": success,
+                "details": result if result is not None else "Expectation was not evaluated"
+            })
+            successes.append(success)
+        return successes
+
+    def run_all_validations(self, single_pass=True):
+        """
+        Run all validations.
+
+        Args:
+            single_pass: Evaluate all expectations in one suite run instead of
+                one batch.validate call (and one DataFrame scan) per check
+        """
         logger.info("Running all validations")
+        if single_pass:
+            validations = self.run_suite_validations()
+            success_count = sum(validations)
+            total_count = len(validations)
+            logger.info(f"Validation complete: {success_count}/{total_count} checks passed")
+            return success_count == total_count
+
         actual_columns = len(self.df.columns)
         validations = [
             self.validate_column_count(actual_columns),
@@ -206,57 +287,60 @@ class TwitterDataValidator:
 
     def get_validation_summary(self):
         """Get validation summary."""
-        total = len(self.validation_results)
-        passed = sum(1 for r in self.validation_results if r["success"])
-        
-        return {
-            "total_checks": total,
-            "passed_checks": passed,
-            "failed_checks": total - passed,
-            "success_rate": passed / total if total > 0 else 0,
-            "all_passed": passed == total,
-            "results": self.validation_results
-        }
-    
-        
-    # def validate_sentiment_distribution(self):
-    #     """Validate sentiment labels have reasonable distribution."""
-    #     logger.info("Validating sentiment distribution")
-        
-    #     # Check that we have at least 10% of each sentiment class
-    #     expectation = gxe.ExpectColumnDistinctValuesToContainSet(
-    #         column="Sentiment", 
-    #         value_set=["Positive", "Neutral", "Negative"]
-    #     )
-    #     result = self.batch.validate(expectation)
-    #     self.validation_results.append({
-    #         "check": "sentiment_values",
-    #         "success": result.success,
-    #         "details": result
-    #     })
-        
-        # Add this to your run_all_validations method
-        # self.validate_sentiment_distribution(),
-        
-        return result.success
+        return summarize_results(self.validation_results)
 
-def validate_dataset(filepath=None, df=None):
+def validate_dataset(filepath=None, df=None, single_pass=True, full_report=False, chunksize=None,
+                     use_cache=True, drift_reference=None):
     """
     Validate Twitter dataset.
     
     Args:
         filepath: Path to CSV file (optional)
         df: DataFrame to validate (optional)
+        single_pass: Evaluate all expectations in one suite run (Great Expectations only)
+        full_report: Run the checks through Great Expectations to get its full
+            result objects; otherwise the native pandas engine is used
+        chunksize: Stream `filepath` in chunks of this many rows instead of
+            loading the whole file (native engine only)
+        use_cache: Reuse the summary of a previous successful validation of a
+            file with the same content and suite version (native engine only)
+        drift_reference: Path to reference histograms (see drift.py); when
+            given, drift checks are added to the validation results
         
     Returns:
         Validation summary
     """
     os.makedirs("logs", exist_ok=True)
     
-    validator = TwitterDataValidator(df=df, filepath=filepath)
-    validator.run_all_validations()
+    key = None
+    if use_cache and not full_report and df is None and filepath is not None:
+        key = cache_key(filepath, extra_files=[drift_reference] if drift_reference else ())
+        cached = load_cached_summary(key)
+        if cached is not None:
+            logger.info(f"Validation cache hit for {filepath} ({key}); skipping validation")
+            return cached
+    
+    if full_report:
+        validator = TwitterDataValidator(df=df, filepath=filepath)
+        validator.run_all_validations(single_pass=single_pass)
+    elif chunksize and df is None and filepath is not None:
+        validator = ChunkedTwitterValidator(filepath, chunksize=chunksize)
+        validator.run_all_validations()
+    else:
+        validator = NativeTwitterValidator(df=df, filepath=filepath)
+        validator.run_all_validations()
+    
+    if drift_reference:
+        reference = drift.load_reference(drift_reference)
+        if hasattr(validator, "df"):
+            counts = drift.batch_counts(reference, validator.df)
+        else:
+            counts = drift.file_counts(reference, filepath, chunksize=chunksize)
+        validator.validation_results.extend(drift.drift_results(reference, counts))
     
     summary = validator.get_validation_summary()
+    if key is not None and summary['all_passed']:
+        save_summary(key, summary, filepath=filepath)
     
     # Log summary results
     logger.info(f"Validation Results: {summary['passed_checks']}/{summary['total_checks']} checks passed")
@@ -267,6 +351,32 @@ def validate_dataset(filepath=None, df=None):
     return summary
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate the latest labeled Twitter dataset")
+    parser.add_argument(
+        "--full-report",
+        action="store_true",
+        help="Run the checks through Great Expectations and keep its full result objects"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Validate the file in chunks of this many rows to bound memory use"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Revalidate even if this file content already passed validation"
+    )
+    parser.add_argument(
+        "--drift-reference",
+        default=drift.DEFAULT_REFERENCE_PATH if os.path.exists(drift.DEFAULT_REFERENCE_PATH) else None,
+        help="Reference histograms to check distribution drift against (see drift.py)"
+    )
+    args = parser.parse_args()
+
     # Find latest file in processed directory
     processed_dir = "./labeled"
     if not os.path.exists(processed_dir):
@@ -280,7 +390,10 @@ if __name__ == "__main__":
             filepath = os.path.join(processed_dir, latest_file)
             
             print(f"Validating {filepath}...")
-            summary = validate_dataset(filepath=filepath)
+            summary = validate_dataset(
+                filepath=filepath, full_report=args.full_report, chunksize=args.chunksize,
+                use_cache=not args.no_cache, drift_reference=args.drift_reference
+            )
             
             if summary['all_passed']:
                 print("✅ All validation checks passed!")
@@ -0,0 +1,62 @@
+"""
+Content-addressed cache of validation summaries.
+
+Summaries are keyed by the SHA-256 of the validated file plus the validation
+suite version, so an unchanged file is only validated once per suite version.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from file_hash import file_sha256
+from validation_engine import SUITE_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "VALIDATION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".validation_cache")
+)
+
+
+def cache_key(filepath, suite_version=SUITE_VERSION, extra_files=()):
+    """
+    Cache key for a file: content hash plus suite version.
+
+    Args:
+        extra_files: Other inputs the summary depends on (e.g. a drift
+            reference); their content hashes are folded into the key
+    """
+    key = f"{file_sha256(filepath)}_v{suite_version}"
+    if extra_files:
+        extra = hashlib.sha256("".join(file_sha256(p) for p in extra_files).encode()).hexdigest()
+        key = f"{key}_{extra[:16]}"
+    return key
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_cached_summary(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the cached validation summary for `key`, or None on a miss."""
+    path = _cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)["summary"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable validation cache entry {path}: {e}")
+        return None
+
+
+def save_summary(key, summary, filepath=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Store a validation summary under `key` (written atomically)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(key, cache_dir)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump({"file": filepath, "suite_version": SUITE_VERSION, "summary": summary}, f, default=str)
+    os.replace(tmp_path, path)
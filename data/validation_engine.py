@@ -0,0 +1,314 @@
+"""
+Lightweight validation engine running the Twitter data checks natively with pandas/NumPy.
+
+Produces the same summary structure as the Great Expectations based
+TwitterDataValidator, without paying for the GX import and context setup.
+ChunkedTwitterValidator runs the same checks over a CSV read in chunks, so
+peak memory stays bounded by the chunk size.
+"""
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a check or its result format changes, so cached summaries are invalidated
+SUITE_VERSION = "3"
+
+# Expected date range for the `date` column
+MIN_DATE = pd.Timestamp(datetime(2022, 1, 1), tz="UTC")
+
+
+def default_check_plan(columns):
+    """
+    Build the list of checks run by a full validation.
+
+    Args:
+        columns: Column names of the dataset being validated
+
+    Returns:
+        List of check dicts with a `check` name, a `kind` and its arguments
+    """
+    return [
+        {"check": "column_count", "kind": "column_count", "value": len(columns)},
+        {"check": "column_exists_sentiment", "kind": "column_exists", "column": "sentiment"},
+        {"check": "column_exists_cleaned_text", "kind": "column_exists", "column": "cleaned_text"},
+        {"check": "column_type_likecount", "kind": "column_type", "column": "likecount", "type": "int64"},
+        {"check": "no_nulls_cleaned_text", "kind": "no_nulls", "column": "cleaned_text"},
+    ]
+
+
+def summarize_results(validation_results):
+    """Build the validation summary dict from a list of check results."""
+    total = len(validation_results)
+    passed = sum(1 for r in validation_results if r["success"])
+
+    return {
+        "total_checks": total,
+        "passed_checks": passed,
+        "failed_checks": total - passed,
+        "success_rate": passed / total if total > 0 else 0,
+        "all_passed": passed == total,
+        "results": validation_results
+    }
+
+
+def date_range_result(min_date_in_data, max_date_in_data, invalid_count=0):
+    """Build the date_range check result from the observed min/max dates."""
+    max_date = pd.Timestamp.now(tz="UTC")
+    success = bool(
+        pd.notna(min_date_in_data) and pd.notna(max_date_in_data)
+        and min_date_in_data >= MIN_DATE and max_date_in_data <= max_date
+    )
+    details = f"Min date: {min_date_in_data}, Max date: {max_date_in_data}"
+    if invalid_count:
+        details += f", invalid dates: {invalid_count}"
+    return {"check": "date_range", "success": success, "details": details}
+
+
+class NativeTwitterValidator:
+    """Twitter data validator running every check as a vectorized pandas operation."""
+
+    def __init__(self, df=None, filepath=None):
+        """
+        Initialize validator with DataFrame or filepath.
+
+        Args:
+            df: DataFrame to validate (optional)
+            filepath: Path to CSV file to validate (optional)
+        """
+        if df is not None:
+            self.df = df
+        elif filepath is not None:
+            self.df = pd.read_csv(filepath)
+        else:
+            raise ValueError("Either df or filepath must be provided")
+
+        # Results container
+        self.validation_results = []
+
+    def _record(self, check, success, details):
+        success = bool(success)
+        self.validation_results.append({
+            "check": check,
+            "success": success,
+            "details": details
+        })
+        return success
+
+    def validate_column_count(self, expected_count):
+        """Validate the total number of columns."""
+        observed = len(self.df.columns)
+        return self._record("column_count", observed == expected_count,
+                            {"observed_value": observed, "expected_value": expected_count})
+
+    def validate_column_exists(self, column):
+        """Validate that a column exists."""
+        return self._record(f"column_exists_{column}", column in self.df.columns,
+                            {"column": column})
+
+    def validate_column_type(self, column, expected_type):
+        """Validate that a column has the expected data type."""
+        observed = str(self.df[column].dtype) if column in self.df.columns else None
+        return self._record(f"column_type_{column}", observed == expected_type,
+                            {"observed_value": observed, "expected_value": expected_type})
+
+    def validate_no_nulls(self, column):
+        """Validate that a column has no null values."""
+        if column not in self.df.columns:
+            return self._record(f"no_nulls_{column}", False, {"error": f"Column {column} not found"})
+        null_count = int(self.df[column].isna().sum())
+        return self._record(f"no_nulls_{column}", null_count == 0,
+                            {"unexpected_count": null_count, "element_count": len(self.df)})
+
+    def validate_unique_values(self, column):
+        """Validate that a column has unique values."""
+        if column not in self.df.columns:
+            return self._record(f"unique_values_{column}", False, {"error": f"Column {column} not found"})
+        duplicate_count = int(self.df[column].dropna().duplicated().sum())
+        return self._record(f"unique_values_{column}", duplicate_count == 0,
+                            {"unexpected_count": duplicate_count, "element_count": len(self.df)})
+
+    def validate_date_range(self):
+        """Validate date range is within the expected period."""
+        if "date" not in self.df.columns:
+            return self._record("date_range", False, "Date column not found")
+
+        dates = pd.to_datetime(self.df["date"], errors="coerce", utc=True)
+        invalid_count = int(dates.isna().sum() - self.df["date"].isna().sum())
+        result = date_range_result(dates.min(), dates.max(), invalid_count)
+        self.validation_results.append(result)
+        return result["success"]
+
+    def run_check(self, check):
+        """Run one check dict from a check plan."""
+        kind = check["kind"]
+        if kind == "column_count":
+            return self.validate_column_count(check["value"])
+        if kind == "column_exists":
+            return self.validate_column_exists(check["column"])
+        if kind == "column_type":
+            return self.validate_column_type(check["column"], check["type"])
+        if kind == "no_nulls":
+            return self.validate_no_nulls(check["column"])
+        if kind == "unique":
+            return self.validate_unique_values(check["column"])
+        if kind == "date_range":
+            return self.validate_date_range()
+        raise ValueError(f"Unknown check kind: {kind}")
+
+    def run_all_validations(self, checks=None):
+        """Run all validations."""
+        logger.info("Running all validations (native engine)")
+        checks = checks if checks is not None else default_check_plan(self.df.columns)
+        validations = [self.run_check(check) for check in checks]
+
+        success_count = sum(validations)
+        total_count = len(validations)
+
+        logger.info(f"Validation complete: {success_count}/{total_count} checks passed")
+        return success_count == total_count
+
+    def get_validation_summary(self):
+        """Get validation summary."""
+        return summarize_results(self.validation_results)
+
+
+def _combined_dtype(dtype_names):
+    """
+    Dtype name pandas would infer for a column whose chunks had `dtype_names`.
+
+    Like read_csv on the whole file: numeric chunks are promoted (int64 and
+    float64 give float64), any mix involving bool or object is object.
+    """
+    if len(dtype_names) == 1:
+        return next(iter(dtype_names))
+    dtypes = [np.dtype(name) for name in dtype_names]
+    if any(dtype.kind not in "iuf" for dtype in dtypes):
+        return "object"
+    return str(np.result_type(*dtypes))
+
+
+class ChunkedTwitterValidator:
+    """
+    Twitter data validator that streams a CSV file in chunks.
+
+    Every check is backed by an aggregator merged across chunks (null counts,
+    observed dtypes, min/max dates, hashed IDs), so the summary matches the
+    one NativeTwitterValidator builds from the whole file.
+    """
+
+    def __init__(self, filepath, chunksize=100_000):
+        """
+        Initialize validator with a CSV filepath.
+
+        Args:
+            filepath: Path to CSV file to validate
+            chunksize: Number of rows read per chunk
+        """
+        self.filepath = filepath
+        self.chunksize = chunksize
+        self.columns = list(pd.read_csv(filepath, nrows=0).columns)
+
+        # Results container
+        self.validation_results = []
+
+    def _aggregate(self, checks):
+        """Read the file once, updating the aggregators needed by `checks`."""
+        columns = {check["column"] for check in checks if "column" in check}
+        if any(check["kind"] == "date_range" for check in checks):
+            columns.add("date")
+        usecols = [c for c in self.columns if c in columns]
+
+        state = {
+            "rows": 0,
+            "nulls": dict.fromkeys(usecols, 0),
+            "dtypes": {c: set() for c in usecols},
+            "seen_hashes": {c: np.empty(0, dtype=np.uint64) for c in usecols},
+            "duplicates": dict.fromkeys(usecols, 0),
+            "min_date": pd.NaT,
+            "max_date": pd.NaT,
+            "invalid_dates": 0,
+        }
+        unique_columns = {check["column"] for check in checks if check["kind"] == "unique"}
+        track_dates = "date" in usecols
+
+        for chunk in pd.read_csv(self.filepath, usecols=usecols, chunksize=self.chunksize):
+            state["rows"] += len(chunk)
+            for column in usecols:
+                values = chunk[column]
+                state["nulls"][column] += int(values.isna().sum())
+                state["dtypes"][column].add(str(values.dtype))
+
+                if column in unique_columns:
+                    hashes = pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+                    chunk_unique, counts = np.unique(hashes, return_counts=True)
+                    seen = state["seen_hashes"][column]
+                    state["duplicates"][column] += int((counts - 1).sum())
+                    state["duplicates"][column] += int(np.isin(chunk_unique, seen, assume_unique=True).sum())
+                    state["seen_hashes"][column] = np.union1d(seen, chunk_unique)
+
+            if track_dates:
+                dates = pd.to_datetime(chunk["date"], errors="coerce", utc=True)
+                state["invalid_dates"] += int(dates.isna().sum() - chunk["date"].isna().sum())
+                if dates.notna().any():
+                    chunk_min, chunk_max = dates.min(), dates.max()
+                    if pd.isna(state["min_date"]) or chunk_min < state["min_date"]:
+                        state["min_date"] = chunk_min
+                    if pd.isna(state["max_date"]) or chunk_max > state["max_date"]:
+                        state["max_date"] = chunk_max
+        return state
+
+    def _finalize(self, check, state):
+        """Turn the merged aggregator state into the result for one check."""
+        kind = check["kind"]
+        column = check.get("column")
+        if kind == "column_count":
+            observed = len(self.columns)
+            return {"check": check["check"], "success": observed == check["value"],
+                    "details": {"observed_value": observed, "expected_value": check["value"]}}
+        if kind == "column_exists":
+            return {"check": check["check"], "success": column in self.columns,
+                    "details": {"column": column}}
+        if kind == "date_range":
+            if "date" not in self.columns:
+                return {"check": "date_range", "success": False, "details": "Date column not found"}
+            return date_range_result(state["min_date"], state["max_date"], state["invalid_dates"])
+        if column not in self.columns:
+            if kind == "column_type":
+                return {"check": check["check"], "success": False,
+                        "details": {"observed_value": None, "expected_value": check["type"]}}
+            return {"check": check["check"], "success": False,
+                    "details": {"error": f"Column {column} not found"}}
+        if kind == "column_type":
+            observed = _combined_dtype(state["dtypes"][column])
+            return {"check": check["check"], "success": observed == check["type"],
+                    "details": {"observed_value": observed, "expected_value": check["type"]}}
+        if kind == "no_nulls":
+            null_count = state["nulls"][column]
+            return {"check": check["check"], "success": null_count == 0,
+                    "details": {"unexpected_count": null_count, "element_count": state["rows"]}}
+        if kind == "unique":
+            duplicate_count = state["duplicates"][column]
+            return {"check": check["check"], "success": duplicate_count == 0,
+                    "details": {"unexpected_count": duplicate_count, "element_count": state["rows"]}}
+        raise ValueError(f"Unknown check kind: {kind}")
+
+    def run_all_validations(self, checks=None):
+        """Run all validations in a single chunked pass over the file."""
+        logger.info(f"Running all validations (chunked engine, chunksize={self.chunksize})")
+        checks = checks if checks is not None else default_check_plan(self.columns)
+        state = self._aggregate(checks)
+        self.validation_results.extend(self._finalize(check, state) for check in checks)
+
+        success_count = sum(1 for r in self.validation_results if r["success"])
+        total_count = len(self.validation_results)
+
+        logger.info(f"Validation complete: {success_count}/{total_count} checks passed")
+        return success_count == total_count
+
+    def get_validation_summary(self):
+        """Get validation summary."""
+        return summarize_results(self.validation_results)
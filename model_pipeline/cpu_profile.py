@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+CPU execution profiles for the transformer trainers.
+
+A profile bundles the settings that decide how fast training runs on a
+CPU-only host: DataLoader worker processes and prefetch depth, intra-op and
+inter-op thread counts, memory pinning and bfloat16 autocast. The autotuner
+times a few training steps under each candidate profile and caches the
+fastest one per host and model, so later runs reuse it without re-measuring.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import platform
+import time
+
+import torch
+
+DEFAULT_PROFILE_CACHE = os.getenv(
+    "CPU_PROFILE_CACHE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cpu_profiles.json"))
+)
+
+# Torch thread budget of a worker sharing the host with other trainers (see set_thread_budget)
+_thread_budget = None
+
+
+def set_thread_budget(num_threads):
+    """Cap this process at `num_threads` torch threads; profiles applied afterwards are clamped to it"""
+    global _thread_budget
+    _thread_budget = num_threads
+    torch.set_num_threads(num_threads)
+
+
+def thread_budget():
+    """Thread budget set by set_thread_budget, or None outside budgeted workers"""
+    return _thread_budget
+
+
+def bf16_supported():
+    """Whether this CPU has native bfloat16 support (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class CpuProfile:
+    FIELDS = ("num_workers", "prefetch_factor", "intra_op_threads", "inter_op_threads", "pin_memory", "bf16")
+
+    def __init__(self, num_workers=0, prefetch_factor=2, intra_op_threads=None, inter_op_threads=None,
+                 pin_memory=False, bf16=False):
+        """
+        Args:
+            num_workers: DataLoader worker processes (0 loads batches in the training process)
+            prefetch_factor: Batches loaded ahead by each worker
+            intra_op_threads: torch.set_num_threads value (None keeps the current setting)
+            inter_op_threads: torch.set_num_interop_threads value (None keeps the current setting)
+            pin_memory: Pin batch memory (only takes effect when a CUDA device is present)
+            bf16: Run forward passes under bfloat16 autocast (ignored if the CPU lacks support)
+        """
+        self.num_workers = num_workers
+        self.prefetch_factor = prefetch_factor
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.pin_memory = pin_memory
+        self.bf16 = bf16 and bf16_supported()
+
+    def __repr__(self):
+        settings = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"CpuProfile({settings})"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{name: values[name] for name in cls.FIELDS if name in values})
+
+    @classmethod
+    def from_env(cls):
+        """Profile from the TRAIN_* environment variables (defaults match a plain DataLoader)"""
+        def optional_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        return cls(
+            num_workers=int(os.getenv("TRAIN_NUM_WORKERS", "0")),
+            prefetch_factor=int(os.getenv("TRAIN_PREFETCH_FACTOR", "2")),
+            intra_op_threads=optional_int("TRAIN_INTRA_OP_THREADS"),
+            inter_op_threads=optional_int("TRAIN_INTER_OP_THREADS"),
+            pin_memory=os.getenv("TRAIN_PIN_MEMORY", "0") == "1",
+            bf16=os.getenv("TRAIN_BF16", "0") == "1",
+        )
+
+    def apply(self):
+        """Set the process-wide torch thread counts, within the worker's thread budget if it has one"""
+        budget = thread_budget()
+        if budget:
+            for name in ("intra_op_threads", "inter_op_threads"):
+                threads = getattr(self, name)
+                if threads and threads > budget:
+                    print(f"Clamping {name}={threads} to the worker budget of {budget} threads")
+                    setattr(self, name, budget)
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads and torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # Only allowed before the first inter-op parallel work in the process
+                print(f"Could not set inter-op threads to {self.inter_op_threads}; "
+                      f"keeping {torch.get_num_interop_threads()}")
+
+    def loader_kwargs(self):
+        """Keyword arguments for torch.utils.data.DataLoader"""
+        kwargs = {
+            "num_workers": self.num_workers,
+            "pin_memory": self.pin_memory and torch.cuda.is_available(),
+        }
+        if self.num_workers > 0:
+            kwargs["prefetch_factor"] = self.prefetch_factor
+            kwargs["persistent_workers"] = True
+        return kwargs
+
+    def autocast(self):
+        return torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16)
+
+    def mlflow_params(self):
+        return {f"cpu_{name}": value for name, value in self.to_dict().items()}
+
+
+def candidate_profiles(num_threads=None):
+    """Profiles tried by the autotuner, within the current torch thread budget"""
+    num_threads = num_threads or torch.get_num_threads()
+    thread_options = sorted({num_threads, max(1, num_threads // 2)}, reverse=True)
+    worker_options = (0, 2) if num_threads > 1 else (0,)
+    bf16_options = (False, True) if bf16_supported() else (False,)
+    candidates = []
+    for threads in thread_options:
+        for workers in worker_options:
+            # DataLoader workers take cores away from the compute threads
+            if workers and threads + workers > num_threads + 1:
+                continue
+            for bf16 in bf16_options:
+                candidates.append(CpuProfile(num_workers=workers, prefetch_factor=4, intra_op_threads=threads,
+                                             bf16=bf16))
+    return candidates
+
+
+class CpuAutotuner:
+    def __init__(self, cache_path=None, steps=5, warmup=1):
+        """
+        Args:
+            cache_path: JSON file holding the fastest profile per host/model key
+            steps: Timed training steps per candidate
+            warmup: Untimed steps run first (first-batch allocation and worker start-up)
+        """
+        self.cache_path = cache_path or DEFAULT_PROFILE_CACHE
+        self.steps = steps
+        self.warmup = warmup
+
+    def host_key(self, trainer):
+        """Cache key: host, CPU, torch version, thread budget and the trained model"""
+        key = json.dumps({
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "cpu_capability": torch.backends.cpu.get_cpu_capability(),
+            "torch": torch.__version__,
+            "threads": thread_budget() or torch.get_num_threads(),
+            "model": trainer.model.config.name_or_path,
+            "batch_size": trainer.batch_size,
+        }, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _read_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        with open(self.cache_path) as f:
+            return json.load(f)
+
+    def _write_cache(self, key, profile, samples_per_sec):
+        with open(f"{self.cache_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            cache = self._read_cache()
+            cache[key] = {"profile": profile.to_dict(), "samples_per_sec": samples_per_sec}
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f, indent=4)
+            os.replace(tmp_path, self.cache_path)
+
+    def measure(self, trainer, dataset, profile):
+        """Training samples per second under `profile` (no optimizer steps, so weights are unchanged)"""
+        profile.apply()
+        loader = trainer.create_loader(dataset, profile=profile)
+        batches = iter(loader)
+        trainer.model.train()
+        samples, elapsed = 0, 0.0
+        try:
+            for step in range(self.warmup + self.steps):
+                start = time.perf_counter()
+                try:
+                    input_ids, attention_mask, labels = next(batches)
+                except StopIteration:
+                    break
+                with profile.autocast():
+                    loss = trainer.model(input_ids, attention_mask=attention_mask, labels=labels).loss
+                loss.backward()
+                trainer.model.zero_grad(set_to_none=True)
+                if step >= self.warmup:
+                    elapsed += time.perf_counter() - start
+                    samples += len(labels)
+        finally:
+            del batches, loader
+        return samples / elapsed if elapsed else 0.0
+
+    def tune(self, trainer, dataset, candidates=None):
+        """
+        Return the fastest CpuProfile for `trainer` on this host, measuring on a miss
+
+        Args:
+            trainer: TransformerTrainer whose model is timed
+            dataset: Training dataset the timed batches are drawn from
+            candidates: Profiles to compare (default: candidate_profiles())
+        """
+        key = self.host_key(trainer)
+        cached = self._read_cache().get(key)
+        if cached is not None:
+            profile = CpuProfile.from_dict(cached["profile"])
+            print(f"Using cached CPU profile {profile} ({cached['samples_per_sec']:.1f} samples/s)")
+            return profile
+
+        # Measuring changes the thread count, so read the budget once up front
+        threads = thread_budget() or torch.get_num_threads()
+        best, best_rate = None, -1.0
+        for profile in candidates or candidate_profiles(threads):
+            rate = self.measure(trainer, dataset, profile)
+            print(f"Autotune {profile}: {rate:.1f} samples/s")
+            if rate > best_rate:
+                best, best_rate = profile, rate
+        # Measuring changed the thread count; leave it as the winner set it
+        torch.set_num_threads(min(best.intra_op_threads or threads, threads))
+        self._write_cache(key, best, best_rate)
+        print(f"Selected CPU profile {best}")
+        return best
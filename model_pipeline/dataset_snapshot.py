@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Versioned snapshots of the cleaned, split training dataset.
+
+The source query is fingerprinted in the database (row count, max id, max
+ingest_seq and an order-independent checksum of the training columns). When the fingerprint
+matches a snapshot on disk, the train/test split is read back from Parquet
+instead of re-querying Postgres and re-running clean_and_map and split.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+from sqlalchemy import text
+
+# Bump whenever clean_and_map/split change, so snapshots built by older code are not reused
+SNAPSHOT_VERSION = "1"
+
+DEFAULT_SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "snapshots"))
+)
+
+SPLITS = ("train", "test")
+
+
+class DatasetSnapshot:
+    def __init__(self, processor, snapshot_dir=None, test_size=0.2, random_state=42, keep=None):
+        """
+        Args:
+            processor: DataProcessor whose query and cleaning define the dataset
+            snapshot_dir: Directory holding one sub-directory per snapshot
+            test_size, random_state: Passed to DataProcessor.split
+            keep: Number of most recent snapshots kept on disk
+        """
+        self.processor = processor
+        self.snapshot_dir = snapshot_dir or DEFAULT_SNAPSHOT_DIR
+        self.test_size = test_size
+        self.random_state = random_state
+        self.keep = keep or int(os.getenv("SNAPSHOT_KEEP", "5"))
+        self.fingerprint = None
+        self.snapshot_id = None
+
+    def compute_fingerprint(self, conn=None):
+        """
+        Row count, max id, max ingest_seq and checksum of the source query, computed by Postgres
+
+        max_ingest_seq is the ingestion watermark warm starts count new rows
+        from; it is None when the query has no ingest_seq column.
+
+        Args:
+            conn: Connection to read through (e.g. the transaction exporting
+                the data); a pooled one is used otherwise
+        """
+        if conn is None:
+            with self.processor.get_engine().connect() as conn:
+                return self.compute_fingerprint(conn)
+        text_col, label_col = self.processor.COLUMNS
+        query = self.processor.sql_query.rstrip().rstrip(';')
+        checksum = (
+            f"coalesce(sum(hashtextextended(coalesce(\"{text_col}\"::text, '') || '|' || "
+            f"coalesce(\"{label_col}\"::text, ''), 0)), 0)"
+        )
+        watermark = self.processor.WATERMARK_COLUMN
+        source_columns = conn.execute(text(f"SELECT * FROM ({query}) AS source LIMIT 0")).keys()
+        max_seq = f'max("{watermark}")' if watermark in source_columns else "NULL"
+        row = conn.execute(text(f"SELECT count(*), max(id), {max_seq}, {checksum} FROM ({query}) AS source")).one()
+        self.fingerprint = {"rows": int(row[0]), "max_id": int(row[1]) if row[1] is not None else None,
+                            "max_ingest_seq": int(row[2]) if row[2] is not None else None,
+                            "checksum": str(row[3])}
+        return self.fingerprint
+
+    def compute_id(self):
+        """Snapshot ID: hash of the fingerprint, query, split parameters and snapshot version"""
+        if self.fingerprint is None:
+            self.compute_fingerprint()
+        key = json.dumps({
+            "fingerprint": self.fingerprint,
+            "query": self.processor.sql_query,
+            "test_size": self.test_size,
+            "random_state": self.random_state,
+            "version": SNAPSHOT_VERSION,
+        }, sort_keys=True)
+        self.snapshot_id = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return self.snapshot_id
+
+    def path(self):
+        return os.path.join(self.snapshot_dir, self.snapshot_id)
+
+    def load(self):
+        """Return (X_train, X_test, y_train, y_test) from disk, or None if the snapshot is missing"""
+        path = self.path()
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        text_col, _ = self.processor.COLUMNS
+        frames = {split: pd.read_parquet(os.path.join(path, f"{split}.parquet")) for split in SPLITS}
+        # Refresh the mtime so pruning keeps recently used snapshots
+        os.utime(os.path.join(path, "meta.json"))
+        return (
+            frames["train"][text_col], frames["test"][text_col],
+            frames["train"]["sentiment_num"], frames["test"]["sentiment_num"],
+        )
+
+    def save(self, X_train, X_test, y_train, y_test):
+        """Write the split atomically (built in a temp dir, then renamed into place)"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.snapshot_dir, prefix=".tmp_")
+        try:
+            for split, X, y in (("train", X_train, y_train), ("test", X_test, y_test)):
+                pd.concat([X, y], axis=1).to_parquet(os.path.join(tmp_dir, f"{split}.parquet"))
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump({
+                    "snapshot_id": self.snapshot_id,
+                    "fingerprint": self.fingerprint,
+                    "query": self.processor.sql_query,
+                    "test_size": self.test_size,
+                    "random_state": self.random_state,
+                    "version": SNAPSHOT_VERSION,
+                    "train_rows": len(X_train),
+                    "test_rows": len(X_test),
+                }, f, indent=4)
+            os.replace(tmp_dir, self.path())
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(os.path.join(self.path(), "meta.json")):
+                raise
+            # Another run wrote the same snapshot first
+        self.prune()
+
+    def prune(self):
+        """Delete all but the `keep` most recently used snapshots"""
+        entries = [
+            os.path.join(self.snapshot_dir, name) for name in os.listdir(self.snapshot_dir)
+            if os.path.exists(os.path.join(self.snapshot_dir, name, "meta.json"))
+        ]
+        entries.sort(key=lambda p: os.path.getmtime(os.path.join(p, "meta.json")), reverse=True)
+        for old in entries[self.keep:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def load_existing(self, snapshot_id):
+        """Load a snapshot by ID without querying the database (e.g. in a training worker)"""
+        self.snapshot_id = snapshot_id
+        with open(os.path.join(self.path(), "meta.json")) as f:
+            self.fingerprint = json.load(f)["fingerprint"]
+        cached = self.load()
+        if cached is None:
+            raise FileNotFoundError(f"Dataset snapshot {snapshot_id} not found in {self.snapshot_dir}")
+        return cached
+
+    def load_or_build(self):
+        """
+        Return the train/test split for the current data, building a snapshot on a miss
+
+        Returns:
+            X_train, X_test, y_train, y_test (same as DataProcessor.split)
+        """
+        self.compute_id()
+        cached = self.load()
+        if cached is not None:
+            print(f"Loaded dataset snapshot {self.snapshot_id} ({self.fingerprint['rows']} source rows)")
+            return cached
+
+        # Fingerprint and export read the same REPEATABLE READ snapshot of the database, so rows
+        # ingested in between cannot end up in the data without being in its fingerprint
+        with self.processor.get_engine().connect() as conn:
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+            with conn.begin():
+                self.compute_fingerprint(conn)
+                self.compute_id()
+                # The data changed since the first check and may match another snapshot
+                cached = self.load()
+                if cached is None:
+                    print(f"Building dataset snapshot {self.snapshot_id}")
+                    self.processor.load_data(conn)
+        if cached is not None:
+            print(f"Loaded dataset snapshot {self.snapshot_id} ({self.fingerprint['rows']} source rows)")
+            return cached
+
+        self.processor.clean_and_map()
+        X_train, X_test, y_train, y_test = self.processor.split(
+            test_size=self.test_size, random_state=self.random_state
+        )
+        self.save(X_train, X_test, y_train, y_test)
+        return X_train, X_test, y_train, y_test
+
+    def mlflow_params(self):
+        """Parameters identifying the snapshot in every training run"""
+        return {
+            "dataset_snapshot": self.snapshot_id,
+            "dataset_rows": self.fingerprint["rows"],
+            "dataset_max_id": self.fingerprint["max_id"],
+            # Snapshots built before the ingest_seq watermark have no such key
+            "dataset_max_ingest_seq": self.fingerprint.get("max_ingest_seq"),
+        }
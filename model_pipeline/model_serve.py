@@ -29,25 +29,38 @@ def get_registered_models(prefix="sentiment_"):
         return []
 
 # === Bước 2: Tìm champion và challenger ===
-def find_best_model(registered_models):
+# "f1": F1 cao nhất; "latency": p99 latency thấp nhất trong các model có F1 cách F1 tốt nhất <= CHAMPION_F1_TOLERANCE
+CHAMPION_CRITERION = os.getenv("CHAMPION_CRITERION", "f1")
+CHAMPION_F1_TOLERANCE = float(os.getenv("CHAMPION_F1_TOLERANCE", "0.01"))
+
+def rank_candidates(candidates, criterion=CHAMPION_CRITERION, f1_tolerance=CHAMPION_F1_TOLERANCE):
+    """Sort (model, run_id, f1, latency_p99_ms) candidates, best first"""
+    if criterion == "latency" and candidates:
+        best_f1 = max(c[2] for c in candidates)
+        # Models without a measured latency rank behind the measured ones
+        def key(c):
+            eligible = c[2] >= best_f1 - f1_tolerance
+            latency = c[3] if c[3] is not None else float("inf")
+            return (not eligible, latency if eligible else 0, -c[2])
+        return sorted(candidates, key=key)
+    return sorted(candidates, key=lambda c: -c[2])
+
+def find_best_model(registered_models, criterion=CHAMPION_CRITERION):
     client = MlflowClient()
-    best_f1 = -1
-    challenger_f1 = -1
-    best_model, challenger_model = (None,) * 2
-    best_run_id, challenger_run_id = (None,) * 2
-
+    candidates = []
     for model in registered_models:
         versions = client.search_model_versions(f"name='{model}'")
         for v in versions:
             run = client.get_run(v.run_id)
             f1 = run.data.metrics.get("f1_score", -1)
-            if f1 > best_f1:
-                challenger_f1, challenger_model, challenger_run_id = best_f1, best_model, best_run_id
-                best_f1, best_model, best_run_id = f1, model, v.run_id
-            elif f1 > challenger_f1:
-                challenger_f1, challenger_model, challenger_run_id = f1, model, v.run_id
+            candidates.append((model, v.run_id, f1, run.data.metrics.get("latency_p99_ms")))
+
+    ranked = rank_candidates(candidates, criterion)
+    best_model, best_run_id, best_f1, best_latency = ranked[0] if ranked else (None, None, -1, None)
+    challenger_model, challenger_run_id, challenger_f1, _ = ranked[1] if len(ranked) > 1 else (None, None, -1, None)
 
-    print(f"Champion: {best_model} (F1={best_f1:.4f})")
+    latency_info = f", p99={best_latency:.2f} ms" if best_latency is not None else ""
+    print(f"Champion ({criterion}): {best_model} (F1={best_f1:.4f}{latency_info})")
     if challenger_model:
         print(f"⚔️  Challenger: {challenger_model} (F1={challenger_f1:.4f})")
     return best_model, best_run_id, best_f1, challenger_model, challenger_run_id, challenger_f1
@@ -2,21 +2,31 @@
 # coding: utf-8
 
 import os
+import sys
+import json
 import shutil
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+import joblib
+import numpy as np
 import pandas as pd
 import torch
 import mlflow
 import mlflow.pyfunc
 import mlflow.sklearn
 import mlflow.pytorch
+from mlflow.tracking import MlflowClient
 
 from tqdm import tqdm
-from sqlalchemy import create_engine, text  
+from sqlalchemy import text
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import DataLoader, Dataset, Sampler
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from transformers import (
     BertTokenizer, BertForSequenceClassification,
@@ -27,28 +37,85 @@ from transformers import (
 import nltk
 nltk.download('vader_lexicon', quiet=True)
 from sqlalchemy.engine import Engine
+
+# Shared pooled engine module lives next to the ingest code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data")))
+from db_engine import get_engine
+from schema import INGEST_SEQ_COLUMN
+from dataset_snapshot import DatasetSnapshot
+from tokenization_cache import TokenizationCache
+from cpu_profile import CpuProfile, CpuAutotuner, set_thread_budget
+from model_wrappers import (
+    HFTransformersWrapper, QuantizedHFTransformersWrapper, SklearnTextWrapper, VaderSentimentWrapper,
+    WRAPPER_CODE_PATHS, quantize_linear_int8
+)
+
+DEFAULT_CHECKPOINT_DIR = os.getenv(
+    "CHECKPOINT_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "checkpoints"))
+)
+
+DEFAULT_ONLINE_STATE = os.getenv(
+    "ONLINE_MODEL_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "online_model", "sgd_hashing.joblib"))
+)
 # ===========================
 # Define Utility Classes
 # ===========================
 
 class DataProcessor:
-    def __init__(self, sql_query=None):
+    # Only the columns training needs are read from the database
+    COLUMNS = ('cleaned_text', 'sentiment')
+    # Ingestion-order column of the managed table: "new rows" are the ones above a recorded value
+    WATERMARK_COLUMN = INGEST_SEQ_COLUMN
+
+    def __init__(self, sql_query=None, chunksize=None):
         self.db_user = os.getenv('DB_USER', 'postgres')
         self.db_pass = os.getenv('DB_PASSWORD', '123456789')
         self.db_host = os.getenv('DB_HOST', '172.26.16.1')
         self.db_port = os.getenv('DB_PORT', '5432')
         self.db_name = os.getenv('DB_NAME', 'twitter_analysis')
         self.sql_query = sql_query or os.getenv('SQL_QUERY', 'SELECT * FROM tweets')
+        self.chunksize = chunksize or int(os.getenv('LOAD_CHUNKSIZE', '50000'))
         self.df = None
 
+    def get_engine(self):
+        return get_engine(
+            self.db_name, user=self.db_user, password=self.db_pass,
+            host=self.db_host, port=self.db_port
+        )
+
+    def projected_query(self):
+        """Wrap the source query so only COLUMNS leave the database"""
+        columns = ", ".join(f'"{col}"' for col in self.COLUMNS)
+        return f"SELECT {columns} FROM ({self.sql_query.rstrip().rstrip(';')}) AS source"
+
+    def iter_batches(self, conn=None):
+        """
+        Stream the training columns in DataFrames of `chunksize` rows
+
+        stream_results makes psycopg2 use a named server-side cursor, so rows
+        are fetched from the server batch by batch instead of all at once.
 
-    def load_data(self):
-        db_uri = f"postgresql+psycopg2://{self.db_user}:{self.db_pass}@{self.db_host}:{self.db_port}/{self.db_name}"
-        engine = create_engine(db_uri)
-        print(f"ENGINE TYPE: {type(engine)}")
-        with engine.connect() as conn:
-            result = conn.execute(text(self.sql_query))
-            self.df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        Args:
+            conn: Connection to read through (e.g. inside a transaction that
+                also fingerprinted the data); a pooled one is used otherwise
+        """
+        if conn is None:
+            with self.get_engine().connect() as conn:
+                yield from self.iter_batches(conn)
+            return
+        conn = conn.execution_options(stream_results=True, yield_per=self.chunksize)
+        for chunk in pd.read_sql(text(self.projected_query()), conn, chunksize=self.chunksize):
+            yield chunk
+
+    def load_data(self, conn=None):
+        chunks = list(self.iter_batches(conn))
+        if chunks:
+            self.df = pd.concat(chunks, ignore_index=True)
+        else:
+            self.df = pd.DataFrame(columns=list(self.COLUMNS))
+        print(f"Loaded {len(self.df)} rows ({len(chunks)} batches)")
         return self.df
 
     def clean_and_map(self, text_col='cleaned_text', label_col='sentiment'):
@@ -57,10 +124,13 @@ class DataProcessor:
 
         # 2) Chuẩn hóa và map label
         #   a) strip & capitalize để đồng nhất chuỗi
-        self.df[label_col] = self.df[label_col].str.strip().str.capitalize()
+        #   b) bảng managed lưu sentiment dạng số (SMALLINT), giữ nguyên các mã hợp lệ
+        labels = self.df[label_col].astype('string').str.strip()
+        self.df[label_col] = labels.str.capitalize()
 
         mapping = {'Positive': 1, 'Negative': 0, 'Neutral': 2}
-        self.df['sentiment_num'] = self.df[label_col].map(mapping)
+        codes = pd.to_numeric(labels, errors='coerce').where(lambda c: c.isin(list(mapping.values())))
+        self.df['sentiment_num'] = self.df[label_col].map(mapping).fillna(codes)
 
         # 3) Kiểm tra kết quả
         print("Label counts (including NaN):")
@@ -81,43 +151,250 @@ class DataProcessor:
         y = self.df[label_col]
         return train_test_split(X, y, test_size=test_size, random_state=random_state)
 
+class TokenizedDataset(Dataset):
+    """Unpadded token id sequences and their labels; padding happens per batch in the collate function"""
+    def __init__(self, input_ids, labels):
+        self.input_ids = input_ids
+        self.labels = [int(label) for label in labels]
+        self.lengths = [len(ids) for ids in input_ids]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return self.input_ids[idx], self.labels[idx]
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Batch sampler grouping sequences of similar length
+
+    When shuffling, indices are shuffled, cut into pools of `bucket_size`
+    batches and sorted by length inside each pool before being batched; the
+    batch order is then shuffled again, so batches stay random but need
+    little padding. Without shuffling, batches follow the global length order.
+    """
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_size=50, seed=None):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = bucket_size
+        self.seed = seed
+        self.epoch = 0
+        self.start_batch = 0
+
+    def set_epoch(self, epoch, start_batch=0):
+        """Reproduce the batch order of `epoch` (requires a seed), skipping its first `start_batch` batches"""
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+    def _batches(self, indices):
+        return [indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size)]
+
+    def __iter__(self):
+        start_batch, self.start_batch = self.start_batch, 0
+        if not self.shuffle:
+            order = sorted(range(len(self.lengths)), key=self.lengths.__getitem__)
+            yield from self._batches(order)[start_batch:]
+            return
+
+        generator = torch.Generator()
+        if self.seed is not None:
+            generator.manual_seed(self.seed + self.epoch)
+        else:
+            generator.seed()
+        self.epoch += 1
+
+        order = torch.randperm(len(self.lengths), generator=generator).tolist()
+        pool_size = self.batch_size * self.bucket_size
+        batches = []
+        for start in range(0, len(order), pool_size):
+            pool = sorted(order[start:start + pool_size], key=self.lengths.__getitem__)
+            batches.extend(self._batches(pool))
+        for i in torch.randperm(len(batches), generator=generator).tolist()[start_batch:]:
+            yield batches[i]
+
+
 class TransformerTrainer:
-    def __init__(self, model_name, tokenizer_cls, model_cls, num_labels=3, lr=1e-5, batch_size=16, max_length=64):
-        self.tokenizer = tokenizer_cls.from_pretrained(model_name)
-        self.model = model_cls.from_pretrained(model_name, num_labels=num_labels)
+    def __init__(self, model_name, tokenizer_cls, model_cls, num_labels=3, lr=1e-5, batch_size=16, max_length=64,
+                 bucket_size=50, use_token_cache=True, cpu_profile=None, val_size=None, patience=None,
+                 min_delta=0.0, checkpoint_dir=None, checkpoint_steps=None, seed=42, init_from=None):
+        if init_from is not None:
+            # Warm start: (model, tokenizer) already fine-tuned, e.g. the Production version from the registry
+            self.model, self.tokenizer = init_from
+            # Keep the base name so the tokenization cache is shared with cold runs
+            self.tokenizer.name_or_path = model_name
+            self.model.config.name_or_path = model_name
+        else:
+            self.tokenizer = tokenizer_cls.from_pretrained(model_name)
+            self.model = model_cls.from_pretrained(model_name, num_labels=num_labels)
         self.lr = lr
         self.batch_size = batch_size
         self.max_length = max_length
+        self.bucket_size = bucket_size
+        self.token_cache = TokenizationCache(self.tokenizer, max_length) if use_token_cache else None
+        # A CpuProfile, or "auto" to pick the fastest profile for this host before training
+        if cpu_profile is None:
+            cpu_profile = "auto" if os.getenv("CPU_PROFILE") == "auto" else CpuProfile.from_env()
+        self.cpu_profile = cpu_profile
+        # Early stopping (opt-in) on the weighted F1 of a validation split carved out of the training data
+        if val_size is None:
+            val_size = float(os.getenv("TRAIN_VAL_SIZE", "0")) or None
+        if patience is None and os.getenv("TRAIN_PATIENCE"):
+            patience = int(os.getenv("TRAIN_PATIENCE"))
+        self.val_size = val_size
+        self.patience = patience
+        self.min_delta = min_delta
+        # Model/optimizer checkpoints every epoch and every `checkpoint_steps` batches
+        self.checkpoint_dir = checkpoint_dir or DEFAULT_CHECKPOINT_DIR
+        self.checkpoint_steps = checkpoint_steps or int(os.getenv("CHECKPOINT_STEPS", "500"))
+        self.checkpoint_path = None
+        self.seed = seed
+        self.history = []
+        self.best_epoch = None
 
     def tokenize(self, texts):
-        return self.tokenizer(
-            texts.tolist(), truncation=True, padding=True,
-            max_length=self.max_length, return_tensors='pt'
-        )
+        # No padding here: each batch is padded to its own longest sequence by collate()
+        return self.tokenizer(texts.tolist(), truncation=True, max_length=self.max_length)
+
+    def collate(self, batch):
+        """Pad a batch of (input_ids, label) pairs to the batch's longest sequence"""
+        sequences, labels = zip(*batch)
+        max_len = max(len(seq) for seq in sequences)
+        input_ids = torch.full((len(sequences), max_len), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), max_len), dtype=torch.long)
+        for i, seq in enumerate(sequences):
+            input_ids[i, :len(seq)] = torch.as_tensor(seq, dtype=torch.long)
+            attention_mask[i, :len(seq)] = 1
+        return input_ids, attention_mask, torch.tensor(labels, dtype=torch.long)
+
+    def create_dataset(self, texts, labels, snapshot_id=None, split=None):
+        """Tokenized split, read from the on-disk tokenization cache when enabled"""
+        if self.token_cache is not None:
+            return self.token_cache.dataset(texts, labels, snapshot_id, split)
+        return TokenizedDataset(self.tokenize(texts)['input_ids'], labels)
+
+    def create_loader(self, dataset, shuffle=True, profile=None):
+        profile = profile or self.cpu_profile
+        sampler = LengthBucketSampler(dataset.lengths, self.batch_size, shuffle=shuffle, bucket_size=self.bucket_size,
+                                      seed=self.seed)
+        # A private generator, so creating the iterator does not draw from the global RNG (dropout)
+        generator = torch.Generator().manual_seed(self.seed)
+        return DataLoader(dataset, batch_sampler=sampler, collate_fn=self.collate, generator=generator,
+                          **profile.loader_kwargs())
+
+    def checkpoint_key(self, snapshot_id, X_train):
+        """Checkpoint directory name: model, data and the hyperparameters that shape training"""
+        data_id = snapshot_id or str(pd.util.hash_pandas_object(X_train, index=False).sum())
+        key = json.dumps({
+            "model": self.model.config.name_or_path,
+            "data": data_id,
+            "lr": self.lr,
+            "batch_size": self.batch_size,
+            "max_length": self.max_length,
+            "val_size": self.val_size,
+            "seed": self.seed,
+        }, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _save(self, obj, name):
+        # Written to a temp file and renamed, so a crash mid-save keeps the previous checkpoint
+        path = os.path.join(self.checkpoint_path, name)
+        torch.save(obj, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
 
-    def create_loader(self, tokens, labels):
-        dataset = TensorDataset(tokens['input_ids'], tokens['attention_mask'], labels)
-        return DataLoader(dataset, batch_size=self.batch_size, shuffle=True)
+    def save_checkpoint(self, optimizer, state):
+        if self.checkpoint_path is None:
+            return
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+        self._save({"model": self.model.state_dict(), "optimizer": optimizer.state_dict(), "state": state,
+                    "rng_state": torch.get_rng_state()}, "checkpoint.pt")
 
-    def train(self, train_loader, epochs=3):
+    def load_checkpoint(self, optimizer):
+        """Restore model/optimizer from the last checkpoint and return the training state to resume from"""
+        state = {"epoch": 0, "step": 0, "best_f1": None, "best_epoch": None, "bad_epochs": 0, "history": []}
+        path = os.path.join(self.checkpoint_path, "checkpoint.pt") if self.checkpoint_path else None
+        if path and os.path.exists(path):
+            checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+            self.model.load_state_dict(checkpoint["model"])
+            optimizer.load_state_dict(checkpoint["optimizer"])
+            state = checkpoint["state"]
+            if "rng_state" in checkpoint:
+                # Dropout masks continue where the interrupted run left off
+                torch.set_rng_state(checkpoint["rng_state"])
+            print(f"Resuming from checkpoint: epoch {state['epoch'] + 1}, batch {state['step']}")
+        return state
+
+    def train(self, train_loader, epochs=3, val_loader=None):
+        """
+        Train for up to `epochs` epochs, resuming from the last checkpoint if one exists
+
+        With a `val_loader`, the model is evaluated after every epoch and the
+        best epoch's weights are kept; with `patience` set, training also stops
+        once weighted F1 has not improved by more than `min_delta` for
+        `patience` epochs. Without either, all epochs run as before.
+        """
+        torch.manual_seed(self.seed)
         optimizer = torch.optim.Adam(self.model.parameters(), lr=self.lr)
-        self.model.train()
-        for epoch in range(epochs):
-            total_loss = 0
-            for batch in tqdm(train_loader, desc=f"Epoch {epoch+1}"):
+        state = self.load_checkpoint(optimizer)
+        sampler = train_loader.batch_sampler
+        for epoch in range(state["epoch"], epochs):
+            if self.patience is not None and state["bad_epochs"] >= self.patience:
+                break
+            self.model.train()
+            start_step = state["step"]
+            sampler.set_epoch(epoch, start_step)
+            total_loss, batches = 0, 0
+            progress = tqdm(train_loader, desc=f"Epoch {epoch+1}", initial=start_step)
+            for step, batch in enumerate(progress, start=start_step + 1):
                 optimizer.zero_grad()
                 input_ids, attention_mask, labels = batch
-                outputs = self.model(input_ids, attention_mask=attention_mask, labels=labels)
+                with self.cpu_profile.autocast():
+                    outputs = self.model(input_ids, attention_mask=attention_mask, labels=labels)
                 loss = outputs.loss
                 loss.backward()
                 optimizer.step()
                 total_loss += loss.item()
-            print(f"Epoch {epoch+1} Loss: {total_loss/len(train_loader):.4f}")
+                batches += 1
+                if step % self.checkpoint_steps == 0 and step < len(sampler):
+                    self.save_checkpoint(optimizer, {**state, "epoch": epoch, "step": step})
+            print(f"Epoch {epoch+1} Loss: {total_loss/max(batches, 1):.4f}")
+            state.update(epoch=epoch + 1, step=0)
+
+            if val_loader is not None:
+                preds, truths = self.evaluate(val_loader)
+                val_f1 = f1_score(truths, preds, average="weighted", zero_division=0)
+                state["history"].append({"epoch": epoch + 1, "loss": total_loss / max(batches, 1), "val_f1": val_f1})
+                if state["best_f1"] is None or val_f1 > state["best_f1"] + self.min_delta:
+                    state.update(best_f1=val_f1, best_epoch=epoch + 1, bad_epochs=0)
+                    if self.checkpoint_path is not None:
+                        os.makedirs(self.checkpoint_path, exist_ok=True)
+                        self._save(self.model.state_dict(), "best.pt")
+                    else:
+                        best_state = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
+                else:
+                    state["bad_epochs"] += 1
+                print(f"Epoch {epoch+1} Val F1: {val_f1:.4f} (best {state['best_f1']:.4f} at epoch {state['best_epoch']})")
+            self.save_checkpoint(optimizer, state)
+
+        if self.patience is not None and state["bad_epochs"] >= self.patience:
+            print(f"Early stopping: no F1 improvement for {state['bad_epochs']} epoch(s)")
+        if state["best_epoch"] is not None and state["best_epoch"] != state["epoch"]:
+            best_path = os.path.join(self.checkpoint_path, "best.pt") if self.checkpoint_path else None
+            if best_path:
+                best_state = torch.load(best_path, map_location="cpu")
+            self.model.load_state_dict(best_state)
+            print(f"Restored weights from epoch {state['best_epoch']}")
+        self.history = state["history"]
+        self.best_epoch = state["best_epoch"]
 
     def evaluate(self, test_loader):
         self.model.eval()
         preds, truths = [], []
-        with torch.no_grad():
+        with torch.inference_mode(), self.cpu_profile.autocast():
             for batch in tqdm(test_loader, desc="Evaluating"):
                 input_ids, attention_mask, labels = batch
                 outputs = self.model(input_ids, attention_mask=attention_mask)
@@ -127,28 +404,268 @@ class TransformerTrainer:
                 truths.extend(labels.cpu().numpy().tolist())
         return preds, truths
 
-    def run(self, X_train, y_train, X_test, y_test, epochs=3):
-        tokens_train = self.tokenize(X_train)
-        tokens_test = self.tokenize(X_test)
-        train_loader = self.create_loader(tokens_train, torch.tensor(y_train.tolist()))
-        test_loader = self.create_loader(tokens_test, torch.tensor(y_test.tolist()))
+    def predict_proba(self, texts, snapshot_id=None, split=None, temperature=1.0):
+        """Class probabilities for `texts` in input order (softmax of logits / temperature)"""
+        dataset = self.create_dataset(texts, [0] * len(texts), snapshot_id, split)
+        if self.cpu_profile == "auto":
+            # The autotuner times training steps; inference just uses the configured profile
+            self.cpu_profile = CpuProfile.from_env()
+        self.cpu_profile.apply()
+        loader = self.create_loader(dataset, shuffle=False)
+        # Batches come in length order; remember it to put the rows back in input order
+        order = [i for batch in loader.batch_sampler for i in batch]
+        probs = []
+        self.model.eval()
+        with torch.inference_mode(), self.cpu_profile.autocast():
+            for input_ids, attention_mask, _ in tqdm(loader, desc="Predicting"):
+                logits = self.model(input_ids, attention_mask=attention_mask).logits.float()
+                probs.append(torch.softmax(logits / temperature, dim=1))
+        probs = torch.cat(probs).numpy() if probs else np.empty((0, self.model.config.num_labels))
+        result = np.empty_like(probs)
+        result[order] = probs
+        return result
 
-        self.train(train_loader, epochs)
+    def run(self, X_train, y_train, X_test, y_test, epochs=3, snapshot_id=None):
+        self.checkpoint_path = os.path.join(self.checkpoint_dir, self.checkpoint_key(snapshot_id, X_train))
+        if self.val_size:
+            X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=self.val_size,
+                                                          random_state=self.seed)
+            # The fit/val rows depend on val_size and seed, so both are part of the cached split name
+            split_params = f"{self.val_size}_{self.seed}"
+            train_dataset = self.create_dataset(X_fit, y_fit.tolist(), snapshot_id, f"fit_{split_params}")
+            val_loader = self.create_loader(self.create_dataset(X_val, y_val.tolist(), snapshot_id,
+                                                                f"val_{split_params}"), shuffle=False)
+        else:
+            train_dataset = self.create_dataset(X_train, y_train.tolist(), snapshot_id, "train")
+            val_loader = None
+        test_dataset = self.create_dataset(X_test, y_test.tolist(), snapshot_id, "test")
+        if self.cpu_profile == "auto":
+            self.cpu_profile = CpuAutotuner().tune(self, train_dataset)
+        self.cpu_profile.apply()
+        train_loader = self.create_loader(train_dataset)
+        test_loader = self.create_loader(test_dataset, shuffle=False)
+
+        self.train(train_loader, epochs, val_loader)
         preds, truths = self.evaluate(test_loader)
+        # Finished: the checkpoints are only needed to resume an interrupted run
+        shutil.rmtree(self.checkpoint_path, ignore_errors=True)
         return preds, truths
 
+    def training_params(self):
+        """Early-stopping outcome, logged with the run"""
+        params = {"epochs_trained": len(self.history), "best_epoch": self.best_epoch}
+        if self.history:
+            params["best_val_f1"] = max(h["val_f1"] for h in self.history)
+        return params
+
 class ClassicalTrainer:
-    def __init__(self, max_features=5000):
+    # Successive-halving search space: vectorizer (tfidf__*) and classifier (lr__*) parameters
+    PARAM_GRID = {
+        "tfidf__max_features": [5000, 20000, None],
+        "tfidf__ngram_range": [(1, 1), (1, 2)],
+        "lr__C": [0.1, 1.0, 10.0],
+    }
+
+    def __init__(self, max_features=5000, search=None, param_grid=None, cv=3, n_jobs=None):
+        """
+        Args:
+            max_features: TF-IDF vocabulary size when not searching
+            search: Run a successive-halving search before the final fit (default: CLASSICAL_SEARCH=1)
+            param_grid: Search space (default: PARAM_GRID)
+            cv: Cross-validation folds per candidate
+            n_jobs: Parallel joblib workers for the folds (default: the torch thread budget)
+        """
         self.vectorizer = TfidfVectorizer(stop_words='english', max_features=max_features)
         self.model = LogisticRegression(max_iter=1000)
+        self.search = os.getenv("CLASSICAL_SEARCH", "0") == "1" if search is None else search
+        self.param_grid = param_grid or self.PARAM_GRID
+        self.cv = cv
+        self.n_jobs = n_jobs or torch.get_num_threads()
+        self.search_result = None
+
+    def tune(self, X_train, y_train, cache=True):
+        """
+        Successive-halving search over the vectorizer and classifier parameters
+
+        With `cache`, the pipeline caches each fitted vectorizer and its output
+        (joblib Memory), keyed by vectorizer parameters and fold, so every C value
+        tried on a fold reuses the same TF-IDF matrix instead of re-vectorizing.
+        """
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV
+        from sklearn.pipeline import Pipeline
+
+        cache_dir = tempfile.mkdtemp(prefix="tfidf_cache_") if cache else None
+        try:
+            pipeline = Pipeline(
+                [("tfidf", TfidfVectorizer(stop_words='english')), ("lr", LogisticRegression(max_iter=1000))],
+                memory=cache_dir,
+            )
+            search = HalvingGridSearchCV(pipeline, self.param_grid, cv=self.cv, factor=3, scoring="f1_weighted",
+                                         n_jobs=self.n_jobs, random_state=42)
+            search.fit(X_train, y_train)
+        finally:
+            if cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        print(f"Best params: {search.best_params_} (CV F1={search.best_score_:.4f})")
+        self.vectorizer = search.best_estimator_.named_steps["tfidf"]
+        self.model = search.best_estimator_.named_steps["lr"]
+        self.search_result = search
+        return search
 
     def run(self, X_train, y_train, X_test, y_test):
+        if self.search:
+            # The best pipeline is refit on the whole training split by the search
+            self.tune(X_train, y_train)
+            return self.model.predict(self.vectorizer.transform(X_test))
         X_train_tfidf = self.vectorizer.fit_transform(X_train)
         X_test_tfidf = self.vectorizer.transform(X_test)
         self.model.fit(X_train_tfidf, y_train)
         preds = self.model.predict(X_test_tfidf)
         return preds
 
+class DistilledStudentTrainer:
+    """
+    TF-IDF + LogisticRegression student trained on a teacher's soft labels
+
+    The targets mix the teacher probabilities with the true labels
+    (alpha * teacher + (1 - alpha) * one-hot). LogisticRegression only takes
+    hard labels, so each row is repeated once per class with that class's
+    target probability as sample_weight, which gives the same cross-entropy
+    as fitting the soft targets directly.
+    """
+    def __init__(self, max_features=20000, ngram_range=(1, 2), alpha=0.7, C=1.0, min_weight=1e-3):
+        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=max_features, ngram_range=ngram_range)
+        self.model = LogisticRegression(max_iter=1000, C=C)
+        self.alpha = alpha
+        self.min_weight = min_weight
+
+    def soft_targets(self, teacher_probs, labels):
+        onehot = np.eye(teacher_probs.shape[1])[np.asarray(labels, dtype=int)]
+        return self.alpha * teacher_probs + (1 - self.alpha) * onehot
+
+    def run(self, X_train, teacher_probs, y_train, X_test):
+        targets = self.soft_targets(teacher_probs, y_train)
+        X_train_tfidf = self.vectorizer.fit_transform(X_train)
+        n_rows, n_classes = targets.shape
+        rows = np.repeat(np.arange(n_rows), n_classes)
+        classes = np.tile(np.arange(n_classes), n_rows)
+        weights = targets.ravel()
+        # Near-zero weights add rows without changing the fit
+        keep = weights >= self.min_weight
+        self.model.fit(X_train_tfidf[rows[keep]], classes[keep], sample_weight=weights[keep])
+        return self.model.predict(self.vectorizer.transform(X_test))
+
+class OnlineClassicalTrainer:
+    """
+    Out-of-core classical model: HashingVectorizer + SGDClassifier updated with partial_fit
+
+    The hashing vectorizer is stateless, so every mini-batch is vectorized on
+    its own and the model keeps learning from new rows without a refit on the
+    whole corpus. Its state (model and the highest ingest_seq trained on) is
+    saved between runs, so a daily update only streams the rows ingested since.
+    Both sources (Postgres and Parquet) are read by ingest_seq, not by id (tweet
+    ids are snowflakes that do not follow ingestion order): rows at or below
+    the saved watermark are skipped, and a row changed by an upsert is trained
+    on again. Rows whose id hash falls in the holdout bucket are never trained
+    on and are used for evaluation.
+    """
+    CLASSES = [0, 1, 2]
+
+    def __init__(self, n_features=2**20, ngram_range=(1, 2), alpha=1e-6, holdout_mod=5, max_holdout=50000,
+                 state_path=None):
+        self.vectorizer = HashingVectorizer(stop_words='english', n_features=n_features, ngram_range=ngram_range,
+                                            alternate_sign=False)
+        self.model = SGDClassifier(loss='log_loss', alpha=alpha, random_state=42)
+        self.holdout_mod = holdout_mod
+        self.max_holdout = max_holdout
+        self.state_path = state_path or DEFAULT_ONLINE_STATE
+        self.max_seq = None
+        self.rows_seen = 0
+
+    def load_state(self):
+        """Restore the model saved by the previous run; returns False if there is none"""
+        if not os.path.exists(self.state_path):
+            return False
+        state = joblib.load(self.state_path)
+        if "max_ingest_seq" not in state:
+            # Saved with an id watermark, which cannot tell which rows were ingested since
+            print("Saved online model predates the ingest_seq watermark; training from scratch")
+            return False
+        self.vectorizer, self.model = state["vectorizer"], state["model"]
+        self.max_seq, self.rows_seen = state["max_ingest_seq"], state["rows_seen"]
+        return True
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        joblib.dump({"vectorizer": self.vectorizer, "model": self.model, "max_ingest_seq": self.max_seq,
+                     "rows_seen": self.rows_seen}, tmp_path)
+        os.replace(tmp_path, self.state_path)
+
+    def iter_postgres_batches(self, processor=None):
+        """(ids, ingest_seqs, texts, labels) batches of the rows after max_seq, streamed from Postgres and cleaned"""
+        processor = processor or DataProcessor()
+        seq_col = DataProcessor.WATERMARK_COLUMN
+        if self.max_seq is not None:
+            source = processor.sql_query.rstrip().rstrip(';')
+            processor.sql_query = f'SELECT * FROM ({source}) AS source WHERE "{seq_col}" > {int(self.max_seq)}'
+        processor.COLUMNS = ('id', seq_col) + DataProcessor.COLUMNS
+        for chunk in processor.iter_batches():
+            processor.df = chunk
+            df = processor.clean_and_map()
+            yield df['id'], df[seq_col], df['cleaned_text'].fillna(''), df['sentiment_num']
+
+    def iter_parquet_batches(self, path, batch_size=50000, text_col='cleaned_text', label_col='sentiment_num'):
+        """
+        (ids, ingest_seqs, texts, labels) batches of the rows after max_seq in a Parquet file with numeric labels
+
+        The file needs `id` and `ingest_seq` columns (e.g. an export of the tweets
+        table), so the saved watermark and the holdout bucket mean the same rows
+        as for Postgres.
+        """
+        import pyarrow.parquet as pq
+
+        seq_col = DataProcessor.WATERMARK_COLUMN
+        parquet = pq.ParquetFile(path)
+        missing = [col for col in ('id', seq_col, text_col, label_col) if col not in parquet.schema_arrow.names]
+        if missing:
+            raise ValueError(f"Parquet file {path} is missing columns {missing}")
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=['id', seq_col, text_col, label_col]):
+            df = batch.to_pandas().dropna(subset=['id', seq_col, label_col])
+            if self.max_seq is not None:
+                df = df[df[seq_col] > self.max_seq]
+            yield (df['id'].astype('int64'), df[seq_col].astype('int64'), df[text_col].fillna(''),
+                   df[label_col].astype(int))
+
+    def partial_fit(self, texts, labels):
+        self.model.partial_fit(self.vectorizer.transform(texts), labels, classes=self.CLASSES)
+        self.rows_seen += len(labels)
+
+    def fit_stream(self, batches):
+        """
+        Train on a stream of (ids, ingest_seqs, texts, labels) batches
+
+        Returns:
+            texts, labels: Holdout rows of the stream (at most max_holdout)
+        """
+        holdout_texts, holdout_labels = [], []
+        for ids, seqs, texts, labels in batches:
+            # Hash the ids: tweet ids are snowflakes whose low bits are not uniform
+            keys = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+            held = keys % self.holdout_mod == 0
+            if len(holdout_labels) < self.max_holdout:
+                holdout_texts.extend(texts[held].tolist())
+                holdout_labels.extend(labels[held].tolist())
+            if (~held).any():
+                self.partial_fit(texts[~held], labels[~held])
+            if len(seqs):
+                self.max_seq = max(int(seqs.max()), self.max_seq or 0)
+        return holdout_texts[:self.max_holdout], holdout_labels[:self.max_holdout]
+
+    def predict(self, texts):
+        return self.model.predict(self.vectorizer.transform(texts))
+
 class VaderEvaluator:
     def __init__(self):
         self.analyzer = SentimentIntensityAnalyzer()
@@ -166,67 +683,46 @@ class VaderEvaluator:
         return preds
 
 # ===========================
-# Define MLflow Wrapper Classes
+# Define Logging Function
 # ===========================
+import fcntl
 
-class HFTransformersWrapper(mlflow.pyfunc.PythonModel):
-    def __init__(self, model_class, tokenizer_class, model_path="model_path"):
-        self.model_class = model_class
-        self.tokenizer_class = tokenizer_class
-        self.model_path_key = model_path
-
-    def load_context(self, context):
-        model_path = context.artifacts[self.model_path_key]
-        self.model = self.model_class.from_pretrained(model_path)
-        self.tokenizer = self.tokenizer_class.from_pretrained(model_path)
-
-    def predict(self, context, model_input):
-        texts = model_input["text"].tolist()
-        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=64, return_tensors="pt")
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            preds = torch.argmax(outputs.logits, dim=1).numpy()
-        return preds
-
+def measure_latency(predict, texts, n_requests=200, warmup=10):
+    """
+    Single-request CPU latency of a model
 
-class SklearnTextWrapper(mlflow.pyfunc.PythonModel):
-    def __init__(self, model, vectorizer):
-        self.model = model
-        self.vectorizer = vectorizer
+    Args:
+        predict: Callable taking a one-row DataFrame with a 'text' column
+        texts: Texts to send (cycled if fewer than n_requests)
+        n_requests: Timed requests
+        warmup: Untimed requests sent first
 
-    def predict(self, context, model_input):
-        X = self.vectorizer.transform(model_input["text"])
-        return self.model.predict(X)
+    Returns:
+        {"latency_p50_ms": ..., "latency_p99_ms": ...}
+    """
+    texts = list(texts)
+    requests = [texts[i % len(texts)] for i in range(n_requests)]
+    for text_ in requests[:warmup]:
+        predict(pd.DataFrame({"text": [text_]}))
+    timings = []
+    for text_ in requests:
+        start = time.perf_counter()
+        predict(pd.DataFrame({"text": [text_]}))
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "latency_p50_ms": float(np.percentile(timings, 50)),
+        "latency_p99_ms": float(np.percentile(timings, 99)),
+    }
 
-class VaderSentimentWrapper(mlflow.pyfunc.PythonModel):
-    def __init__(self):
-        self.analyzer = SentimentIntensityAnalyzer()
-
-    def predict(self, context, model_input):
-        results = []
-        for text in model_input["text"]:
-            score = self.analyzer.polarity_scores(text)["compound"]
-            if score > 0.05:
-                results.append(1)
-            elif score < -0.05:
-                results.append(0)
-            else:
-                results.append(2)
-        return results
-
-# ===========================
-# Define Logging Function
-# ===========================
-import json
-
-def log_model_to_mlflow(model_name, model_wrapper, X_test, preds, truths, params=None, save_dir=None):
+def log_model_to_mlflow(model_name, model_wrapper, X_test, preds, truths, params=None, save_dir=None, metrics=None):
     with mlflow.start_run(run_name=model_name) as run:
         # Log model
         mlflow.pyfunc.log_model(
             artifact_path="model",
             python_model=model_wrapper,
             input_example=pd.DataFrame({"text": X_test.tolist()[:2]}),
-            artifacts={"model_path": save_dir} if save_dir else None
+            artifacts={"model_path": save_dir} if save_dir else None,
+            code_paths=WRAPPER_CODE_PATHS
         )
 
         # Log params
@@ -241,65 +737,685 @@ def log_model_to_mlflow(model_name, model_wrapper, X_test, preds, truths, params
         mlflow.log_metric("precision", report["weighted avg"]["precision"])
         mlflow.log_metric("recall", report["weighted avg"]["recall"])
         mlflow.log_metric("f1_score", report["weighted avg"]["f1-score"])
+        for k, v in (metrics or {}).items():
+            mlflow.log_metric(k, v)
 
         # Save run id to MLOPS/latest_runs.json
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        latest_runs_path = os.path.join(base_dir, "latest_runs.json")
+        update_latest_runs(model_name, run.info.run_id)
 
-        if os.path.exists(latest_runs_path):
-            with open(latest_runs_path, "r") as f:
+        print(f"{model_name} model logged successfully. Run ID: {run.info.run_id}")
+
+
+def log_search_to_mlflow(model_name, search, params=None):
+    """
+    Log a successive-halving search as a parent run with one nested run per evaluated candidate
+
+    Returns:
+        Run ID of the parent run
+    """
+    results = search.cv_results_
+    with mlflow.start_run(run_name=f"{model_name}_search") as parent:
+        mlflow.log_params({
+            "search": type(search).__name__,
+            "factor": search.factor,
+            "cv": search.cv,
+            "n_candidates": search.n_candidates_[0],
+            "n_iterations": search.n_iterations_,
+            **(params or {}),
+        })
+        mlflow.log_params({f"best_{k}": v for k, v in search.best_params_.items()})
+        mlflow.log_metric("best_cv_f1", search.best_score_)
+        for i, candidate in enumerate(results["params"]):
+            with mlflow.start_run(run_name=f"{model_name}_candidate_{i}", nested=True):
+                mlflow.log_params({**candidate, "iter": int(results["iter"][i]),
+                                   "n_resources": int(results["n_resources"][i])})
+                mlflow.log_metric("mean_cv_f1", results["mean_test_score"][i])
+                mlflow.log_metric("std_cv_f1", results["std_test_score"][i])
+                mlflow.log_metric("mean_fit_time", results["mean_fit_time"][i])
+        print(f"Logged {len(results['params'])} search candidates under run {parent.info.run_id}")
+        return parent.info.run_id
+
+
+LATEST_RUNS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "latest_runs.json"))
+
+def update_latest_runs(model_name, run_id, path=LATEST_RUNS_PATH):
+    """
+    Record `run_id` as the latest run of `model_name`
+
+    Training processes running in parallel all update the same file, so the
+    read-modify-write happens under an exclusive lock and the new content is
+    written to a temp file and renamed into place.
+    """
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(path):
+            with open(path, "r") as f:
                 latest_runs = json.load(f)
         else:
             latest_runs = {}
 
-        latest_runs[model_name] = run.info.run_id
-        with open(latest_runs_path, "w") as f:
+        latest_runs[model_name] = run_id
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(latest_runs, f, indent=4)
-
-        print(f"{model_name} model logged successfully. Run ID: {run.info.run_id}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
 # ===========================
 
-# === Main
-if __name__ == '__main__':
-    dp = DataProcessor()
-    dp.load_data()
-    dp.clean_and_map()
-    X_train, X_test, y_train, y_test = dp.split()
-
-    tracking_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../mlruns"))
-    mlflow.set_tracking_uri(f"file://{tracking_path}")
-    mlflow.set_experiment("sentiment-analysis")
+# ===========================
+# Define Training Functions
+# ===========================
 
-    # Logistic Regression
+def train_logistic_regression(X_train, X_test, y_train, y_test, dataset_params, snapshot_id=None):
     classical_trainer = ClassicalTrainer()
     class_preds = classical_trainer.run(X_train, y_train, X_test, y_test)
-    log_model_to_mlflow("LogisticRegression_TFIDF", SklearnTextWrapper(classical_trainer.model, classical_trainer.vectorizer), X_test, class_preds, y_test, {"model_type": "LogisticRegression"})
-
-    # BERT
-    bert_trainer = TransformerTrainer('bert-base-uncased', BertTokenizer, BertForSequenceClassification)
-    bert_preds, bert_truth = bert_trainer.run(X_train, y_train, X_test, y_test)
-    bert_trainer.model.save_pretrained("bert_saved")
-    bert_trainer.tokenizer.save_pretrained("bert_saved")
-    log_model_to_mlflow("BERT_Transformer", HFTransformersWrapper(BertForSequenceClassification, BertTokenizer,"model_path"), X_test, bert_preds, bert_truth, {"model_type": "BERT"}, save_dir="bert_saved")
-
-    # RoBERTa
-    roberta_trainer = TransformerTrainer('roberta-base', RobertaTokenizer, RobertaForSequenceClassification)
-    roberta_preds, roberta_truth = roberta_trainer.run(X_train, y_train, X_test, y_test)
-    roberta_trainer.model.save_pretrained("roberta_saved")
-    roberta_trainer.tokenizer.save_pretrained("roberta_saved")
-    log_model_to_mlflow("RoBERTa_Transformer", HFTransformersWrapper(RobertaForSequenceClassification, RobertaTokenizer, "model_path"), X_test, roberta_preds, roberta_truth, {"model_type": "RoBERTa"}, save_dir="roberta_saved")
-
-    # DistilBERT
-    distil_trainer = TransformerTrainer('distilbert-base-uncased', DistilBertTokenizer, DistilBertForSequenceClassification)
-    distil_preds, distil_truth = distil_trainer.run(X_train, y_train, X_test, y_test)
-    distil_trainer.model.save_pretrained("distilbert_saved")
-    distil_trainer.tokenizer.save_pretrained("distilbert_saved")
-    log_model_to_mlflow("DistilBERT_Transformer", HFTransformersWrapper(DistilBertForSequenceClassification, DistilBertTokenizer, "model_path"), X_test, distil_preds, distil_truth, {"model_type": "DistilBERT"}, save_dir="distilbert_saved")
-
-    # VADER
+    params = {"model_type": "LogisticRegression", **dataset_params}
+    if classical_trainer.search_result is not None:
+        params["search_run_id"] = log_search_to_mlflow("LogisticRegression_TFIDF", classical_trainer.search_result,
+                                                       dataset_params)
+        params.update({f"best_{k}": v for k, v in classical_trainer.search_result.best_params_.items()})
+    log_model_to_mlflow("LogisticRegression_TFIDF", SklearnTextWrapper(classical_trainer.model, classical_trainer.vectorizer), X_test, class_preds, y_test, params)
+
+def train_transformer(model_name, pretrained_name, tokenizer_cls, model_cls, model_type, save_dir,
+                      X_train, X_test, y_train, y_test, dataset_params, snapshot_id=None, init_from=None):
+    trainer = TransformerTrainer(pretrained_name, tokenizer_cls, model_cls, init_from=init_from)
+    preds, truth = trainer.run(X_train, y_train, X_test, y_test, snapshot_id=snapshot_id)
+    trainer.model.save_pretrained(save_dir)
+    trainer.tokenizer.save_pretrained(save_dir)
+    log_model_to_mlflow(model_name, HFTransformersWrapper(model_cls, tokenizer_cls, "model_path"), X_test, preds, truth, {"model_type": model_type, **dataset_params, **trainer.cpu_profile.mlflow_params(),
+                         **trainer.training_params()}, save_dir=save_dir)
+
+# Model name -> (pretrained checkpoint, tokenizer class, model class, model_type param, save dir)
+TRANSFORMER_MODELS = {
+    "BERT_Transformer": ('bert-base-uncased', BertTokenizer, BertForSequenceClassification, "BERT", "bert_saved"),
+    "RoBERTa_Transformer": ('roberta-base', RobertaTokenizer, RobertaForSequenceClassification, "RoBERTa",
+                            "roberta_saved"),
+    "DistilBERT_Transformer": ('distilbert-base-uncased', DistilBertTokenizer, DistilBertForSequenceClassification,
+                               "DistilBERT", "distilbert_saved"),
+}
+
+def train_bert(*args, **kwargs):
+    train_transformer("BERT_Transformer", *TRANSFORMER_MODELS["BERT_Transformer"], *args, **kwargs)
+
+def train_roberta(*args, **kwargs):
+    train_transformer("RoBERTa_Transformer", *TRANSFORMER_MODELS["RoBERTa_Transformer"], *args, **kwargs)
+
+def train_distilbert(*args, **kwargs):
+    train_transformer("DistilBERT_Transformer", *TRANSFORMER_MODELS["DistilBERT_Transformer"], *args, **kwargs)
+
+def train_vader(X_train, X_test, y_train, y_test, dataset_params, snapshot_id=None):
     vader_eval = VaderEvaluator()
     vader_preds = vader_eval.run(X_test, y_test)
     vader_model = VaderSentimentWrapper()
-    log_model_to_mlflow("VADER_Sentiment", vader_model, X_test, vader_preds, y_test, {"model_type": "VADER"})
+    log_model_to_mlflow("VADER_Sentiment", vader_model, X_test, vader_preds, y_test, {"model_type": "VADER", **dataset_params})
+
+# Model name -> (training function, relative CPU weight when training in parallel)
+MODEL_TRAINERS = {
+    "LogisticRegression_TFIDF": (train_logistic_regression, 1),
+    "BERT_Transformer": (train_bert, 4),
+    "RoBERTa_Transformer": (train_roberta, 4),
+    "DistilBERT_Transformer": (train_distilbert, 3),
+    "VADER_Sentiment": (train_vader, 1),
+}
+
+def setup_mlflow():
+    tracking_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../mlruns"))
+    mlflow.set_tracking_uri(f"file://{tracking_path}")
+    mlflow.set_experiment("sentiment-analysis")
+
+def cpu_budgets(model_names, total_cores):
+    """
+    Split `total_cores` between the models by their CPU weight
+
+    Light models (weight 1: LR, VADER) get one core each; the remaining cores
+    go to the transformers in proportion to their weight, rounded with the
+    largest-remainder method so the budgets never add up to more than
+    `total_cores`. Every model gets at least one core, so with fewer cores
+    than models the host is oversubscribed.
+    """
+    weights = {name: MODEL_TRAINERS[name][1] for name in model_names}
+    budgets = {name: 1 for name, weight in weights.items() if weight <= 1}
+    heavy = [name for name in model_names if name not in budgets]
+    spare = total_cores - len(budgets)
+    if spare < len(heavy):
+        budgets.update({name: 1 for name in heavy})
+        return budgets
+
+    total_weight = sum(weights[name] for name in heavy)
+    quotas = {name: spare * weights[name] / total_weight for name in heavy}
+    shares = {name: int(quota) for name, quota in quotas.items()}
+    leftover = spare - sum(shares.values())
+    for name in sorted(heavy, key=lambda name: quotas[name] - shares[name], reverse=True)[:leftover]:
+        shares[name] += 1
+    for name in heavy:
+        if shares[name] == 0:
+            donor = max(shares, key=shares.get)
+            shares[donor] -= 1
+            shares[name] = 1
+    budgets.update(shares)
+    return budgets
+
+# ===========================
+# Distillation
+# ===========================
+
+DEFAULT_TEMPERATURE = float(os.getenv("DISTILL_TEMPERATURE", "2.0"))
+
+DEFAULT_TEACHER_CACHE = os.getenv(
+    "TEACHER_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "teacher_cache"))
+)
+
+def read_latest_runs(path=LATEST_RUNS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def load_run_transformer(model_name, run_id):
+    """(pyfunc python model, TransformerTrainer around its fine-tuned weights) of a logged transformer run"""
+    python_model = mlflow.pyfunc.load_model(f"runs:/{run_id}/model").unwrap_python_model()
+    pretrained_name, tokenizer_cls, model_cls = TRANSFORMER_MODELS[model_name][:3]
+    trainer = TransformerTrainer(pretrained_name, tokenizer_cls, model_cls,
+                                 init_from=(python_model.model, python_model.tokenizer))
+    return python_model, trainer
+
+def find_best_transformer_run(X_test, y_test, snapshot_id=None):
+    """
+    (model name, run id, F1) of the transformer in latest_runs.json with the best F1 on a shared test split
+
+    Runs trained on snapshot `snapshot_id` logged their F1 on its test split
+    (`X_test`, `y_test`) and are ranked by it; any other run, e.g. an older
+    Production model a warm start kept, is scored on that split first, so all
+    candidates are compared on the same rows.
+
+    Returns:
+        (model name, run id, F1), or None if there is no transformer run
+    """
+    client = MlflowClient()
+    best = None
+    for model_name, run_id in read_latest_runs().items():
+        if model_name not in TRANSFORMER_MODELS:
+            continue
+        run = client.get_run(run_id)
+        f1 = run.data.metrics.get("f1_score")
+        if f1 is None or snapshot_id is None or run.data.params.get("dataset_snapshot") != snapshot_id:
+            _, scorer = load_run_transformer(model_name, run_id)
+            preds = scorer.predict_proba(X_test, snapshot_id, "test").argmax(axis=1)
+            f1 = f1_score(y_test, preds, average="weighted", zero_division=0)
+            print(f"Scored {model_name} run {run_id} on the test split: F1={f1:.4f}")
+        if best is None or f1 > best[2]:
+            best = (model_name, run_id, f1)
+    return best
+
+def prune_teacher_cache(cache_dir, keep=None):
+    """Delete all but the `keep` most recently used teacher probability files"""
+    keep = keep or int(os.getenv("TEACHER_CACHE_KEEP", "5"))
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".npy")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for old in entries[keep:]:
+        os.remove(old)
+
+def teacher_probabilities(teacher_name, teacher_run_id, X_train, snapshot_id=None,
+                          temperature=DEFAULT_TEMPERATURE, cache_dir=None):
+    """
+    Teacher probabilities for the training split, cached per (teacher run, snapshot, temperature)
+
+    The snapshot fixes the rows and their order, so a later --distill run with
+    the same teacher and data reads the probabilities back instead of labeling
+    the whole corpus again. Without a snapshot ID nothing is cached.
+    """
+    cache_dir = cache_dir or DEFAULT_TEACHER_CACHE
+    path = os.path.join(cache_dir, f"{teacher_run_id}_{snapshot_id}_T{temperature:g}.npy") if snapshot_id else None
+    if path and os.path.exists(path):
+        probs = np.load(path)
+        if len(probs) == len(X_train):
+            os.utime(path)
+            print(f"Loaded cached teacher probabilities {os.path.basename(path)}")
+            return probs
+
+    _, labeler = load_run_transformer(teacher_name, teacher_run_id)
+    probs = labeler.predict_proba(X_train, snapshot_id, "train", temperature=temperature)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, probs)
+        os.replace(tmp_path, path)
+        prune_teacher_cache(cache_dir)
+    return probs
+
+def train_distilled_student(X_train, X_test, y_train, y_test, dataset_params, snapshot_id=None,
+                            temperature=DEFAULT_TEMPERATURE):
+    """
+    Distill the best transformer of the latest runs into a TF-IDF + LR student
+
+    The teacher is the transformer with the best F1 on the snapshot's test
+    split. It labels the training split with temperature-softened
+    probabilities (cached per teacher run and snapshot); the student is logged
+    as Distilled_TFIDF_Student.
+    """
+    teacher = find_best_transformer_run(X_test, y_test, snapshot_id)
+    if teacher is None:
+        print("No transformer run in latest_runs.json to distill from.")
+        return
+    teacher_name, teacher_run_id, teacher_f1 = teacher
+    print(f"Distilling {teacher_name} (run {teacher_run_id}, F1={teacher_f1:.4f})")
+    teacher_probs = teacher_probabilities(teacher_name, teacher_run_id, X_train, snapshot_id, temperature)
+
+    student = DistilledStudentTrainer()
+    preds = student.run(X_train, teacher_probs, y_train, X_test)
+    student_model = SklearnTextWrapper(student.model, student.vectorizer)
+
+    params = {
+        "model_type": "DistilledLogisticRegression",
+        "teacher": teacher_name,
+        "teacher_run_id": teacher_run_id,
+        "teacher_f1": teacher_f1,
+        "temperature": temperature,
+        "alpha": student.alpha,
+        **dataset_params,
+    }
+    log_model_to_mlflow("Distilled_TFIDF_Student", student_model, X_test, preds, y_test, params)
+
+# ===========================
+# Quantization
+# ===========================
+
+TEST_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "test_data.csv"))
+
+def quantize_transformers(X_test, y_test, dataset_params, snapshot_id=None, test_data_path=TEST_DATA_PATH):
+    """
+    Log an int8 dynamically quantized variant (<model>_INT8) of every transformer in latest_runs.json
+
+    Each variant is scored on the snapshot's test split (`X_test`, `y_test`),
+    the split its fp32 base run logged its F1 on, and logged with the F1
+    delta to the base. Accuracy on the fixed test_data.csv set is logged
+    separately for both models (test_data_accuracy, test_data_fp32_accuracy,
+    test_data_accuracy_delta).
+    """
+    test_df = pd.read_csv(test_data_path)
+    if 'text' not in test_df.columns or 'sentiment_num' not in test_df.columns:
+        raise ValueError("test data must have 'text' and 'sentiment_num' columns")
+    fixed_input = pd.DataFrame({"text": test_df['text'].astype(str)})
+    y_fixed = test_df['sentiment_num']
+
+    client = MlflowClient()
+    for model_name, run_id in read_latest_runs().items():
+        if model_name not in TRANSFORMER_MODELS:
+            continue
+        pretrained_name, tokenizer_cls, model_cls, model_type, _ = TRANSFORMER_MODELS[model_name]
+        fp32_model, fp32_scorer = load_run_transformer(model_name, run_id)
+        int8_model = QuantizedHFTransformersWrapper(model_cls, tokenizer_cls, "model_path")
+        int8_model.model, int8_model.tokenizer = quantize_linear_int8(fp32_model.model), fp32_model.tokenizer
+
+        # Same split as the base run's F1; runs trained on another snapshot are scored on it first
+        base_run = client.get_run(run_id)
+        fp32_f1 = base_run.data.metrics.get("f1_score")
+        if fp32_f1 is None or snapshot_id is None or base_run.data.params.get("dataset_snapshot") != snapshot_id:
+            fp32_preds = fp32_scorer.predict_proba(X_test, snapshot_id, "test").argmax(axis=1)
+            fp32_f1 = f1_score(y_test, fp32_preds, average="weighted", zero_division=0)
+        int8_scorer = TransformerTrainer(pretrained_name, tokenizer_cls, model_cls,
+                                         init_from=(int8_model.model, int8_model.tokenizer))
+        preds = int8_scorer.predict_proba(X_test, snapshot_id, "test").argmax(axis=1)
+        f1 = f1_score(y_test, preds, average="weighted", zero_division=0)
+
+        fp32_accuracy = accuracy_score(y_fixed, fp32_model.predict(None, fixed_input))
+        accuracy = accuracy_score(y_fixed, int8_model.predict(None, fixed_input))
+        print(f"{model_name} INT8: F1 {f1:.4f} ({f1 - fp32_f1:+.4f}), "
+              f"{os.path.basename(test_data_path)} accuracy {accuracy:.4f} ({accuracy - fp32_accuracy:+.4f})")
+
+        # The variant ships the fp32 weights and re-quantizes them when loaded
+        save_dir = tempfile.mkdtemp(prefix=f"{model_name}_int8_")
+        try:
+            fp32_model.model.save_pretrained(save_dir)
+            fp32_model.tokenizer.save_pretrained(save_dir)
+            params = {
+                "model_type": f"{model_type}_INT8",
+                "quantization": "dynamic_int8_linear",
+                "base_run_id": run_id,
+                "test_data": os.path.basename(test_data_path),
+                **dataset_params,
+            }
+            metrics = {
+                "fp32_f1_score": fp32_f1,
+                "f1_delta": f1 - fp32_f1,
+                "test_data_accuracy": accuracy,
+                "test_data_fp32_accuracy": fp32_accuracy,
+                "test_data_accuracy_delta": accuracy - fp32_accuracy,
+            }
+            log_model_to_mlflow(f"{model_name}_INT8", QuantizedHFTransformersWrapper(model_cls, tokenizer_cls, "model_path"),
+                                X_test, preds, y_test, params, save_dir=save_dir, metrics=metrics)
+        finally:
+            shutil.rmtree(save_dir, ignore_errors=True)
+
+# ===========================
+# Latency
+# ===========================
+
+# torch threads for the latency pass; every candidate is timed with the same setting
+LATENCY_THREADS = int(os.getenv("LATENCY_THREADS", "1"))
+
+def measure_candidate_latencies(texts, model_names=None, num_threads=LATENCY_THREADS):
+    """
+    Measure the single-request latency of the models in latest_runs.json in one pass
+
+    Runs after training, in this process only, so no model is timed while
+    others train on the same cores. Each model is loaded as it will be served
+    and its latency_p50_ms / latency_p99_ms are logged to its run, together
+    with the thread count as the latency_threads param.
+
+    Args:
+        texts: Texts to send, the same for every model
+        model_names: Only measure these models (default: all in latest_runs.json)
+        num_threads: torch intra-op threads while timing
+    """
+    client = MlflowClient()
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        for model_name, run_id in read_latest_runs().items():
+            if model_names is not None and model_name not in model_names:
+                continue
+            served_model = mlflow.pyfunc.load_model(f"runs:/{run_id}/model")
+            latency = measure_latency(served_model.predict, texts)
+            for k, v in latency.items():
+                client.log_metric(run_id, k, v)
+            recorded = client.get_run(run_id).data.params.get("latency_threads")
+            if recorded is None:
+                client.log_param(run_id, "latency_threads", num_threads)
+            elif recorded != str(num_threads):
+                # Params are immutable; a run re-measured with another setting records it as a tag
+                client.set_tag(run_id, "latency_threads", num_threads)
+            print(f"{model_name}: p50 {latency['latency_p50_ms']:.2f} ms, p99 {latency['latency_p99_ms']:.2f} ms "
+                  f"({num_threads} threads)")
+    finally:
+        torch.set_num_threads(previous_threads)
+
+# ===========================
+# Warm Start
+# ===========================
+
+DEFAULT_REPLAY_RATIO = float(os.getenv("REPLAY_RATIO", "0.5"))
+# Fewer new rows than this (after cleaning) keep the Production version instead of warm-starting
+WARM_START_MIN_ROWS = int(os.getenv("WARM_START_MIN_ROWS", "100"))
+
+def load_production_model(model_name, model_name_prefix="sentiment"):
+    """
+    Production version of `model_name` in the model registry
+
+    Returns:
+        (python model, model version, training run), or None if there is no Production version
+    """
+    client = MlflowClient()
+    registered_name = f"{model_name_prefix}_{model_name}"
+    try:
+        versions = client.get_latest_versions(registered_name, stages=["Production"])
+    except mlflow.exceptions.MlflowException:
+        return None
+    if not versions:
+        return None
+    version = versions[0]
+    python_model = mlflow.pyfunc.load_model(f"models:/{registered_name}/{version.version}").unwrap_python_model()
+    return python_model, version, client.get_run(version.run_id)
+
+def load_cleaned_rows(sql_query):
+    """(texts, labels) of a query after clean_and_map, empty if it returns no usable rows"""
+    dp = DataProcessor(sql_query=sql_query)
+    if dp.load_data().empty:
+        return pd.Series(dtype=object), pd.Series(dtype=int)
+    dp.clean_and_map()
+    return dp.df['cleaned_text'], dp.df['sentiment_num']
+
+def incremental_training_data(base_seq, max_seq, replay_ratio=DEFAULT_REPLAY_RATIO, min_rows=WARM_START_MIN_ROWS):
+    """
+    Cleaned rows ingested in (`base_seq`, `max_seq`] plus a replay sample of older rows
+
+    Rows are ordered by ingest_seq, not by id: tweet ids are snowflakes that do
+    not follow ingestion order, and a row changed by an upsert takes a new
+    ingest_seq, so it is trained on again. The replay sample holds up to
+    `replay_ratio` x the number of usable new rows and is picked by a hash of
+    the id seeded with `base_seq`, so every model warm-started from the same
+    base replays the same rows.
+
+    Returns:
+        (X, y, new_rows, replay_rows); X and y are None when fewer than
+        `min_rows` new rows survive cleaning
+    """
+    base_seq = int(base_seq)
+    if max_seq is None or int(max_seq) <= base_seq:
+        return None, None, 0, 0
+    source = DataProcessor().sql_query.rstrip().rstrip(';')
+    max_seq = int(max_seq)
+    seq = f'"{DataProcessor.WATERMARK_COLUMN}"'
+    X_new, y_new = load_cleaned_rows(
+        f"SELECT * FROM ({source}) AS new_rows WHERE {seq} > {base_seq} AND {seq} <= {max_seq}"
+    )
+    if len(X_new) < max(min_rows, 1):
+        return None, None, len(X_new), 0
+    X_old, y_old = load_cleaned_rows(
+        f"SELECT * FROM ({source}) AS old_rows WHERE {seq} <= {base_seq} "
+        f"ORDER BY hashtextextended(id::text, {base_seq}) LIMIT {int(len(X_new) * replay_ratio)}"
+    )
+    X = pd.concat([X_new, X_old], ignore_index=True)
+    y = pd.concat([y_new, y_old], ignore_index=True)
+    return X, y, len(X_new), len(X_old)
+
+def warm_start_transformer(model_name, snapshot, X_test, y_test, replay_ratio=DEFAULT_REPLAY_RATIO,
+                           min_rows=WARM_START_MIN_ROWS):
+    """
+    Continue fine-tuning the Production version of a transformer on the data ingested since it was trained
+
+    The model is evaluated on the test split of the full dataset snapshot, the
+    same split cold-trained models are scored on, and rows of that split are
+    never trained on. Below `min_rows` usable new rows the Production version
+    is kept as is.
+
+    Returns:
+        False if the model cannot be warm-started (no Production version or no
+        recorded dataset_max_ingest_seq) and must be trained from scratch, else True
+    """
+    production = load_production_model(model_name)
+    if production is None:
+        print(f"[{model_name}] no Production version in the registry; training from scratch")
+        return False
+    python_model, version, run = production
+    # Runs logged before the ingest_seq watermark only recorded dataset_max_id, which says nothing about
+    # which rows were ingested after them
+    base_seq = run.data.params.get("dataset_max_ingest_seq")
+    if base_seq in (None, "None"):
+        print(f"[{model_name}] Production v{version.version} has no dataset_max_ingest_seq; training from scratch")
+        return False
+
+    max_seq = snapshot.fingerprint.get("max_ingest_seq")
+    X_train, y_train, new_rows, replay_rows = incremental_training_data(base_seq, max_seq, replay_ratio, min_rows)
+    if X_train is None:
+        print(f"[{model_name}] {new_rows} usable rows since ingest_seq {base_seq} (minimum {min_rows}); "
+              f"keeping Production v{version.version}")
+        return True
+    held_out = X_train.isin(set(X_test))
+    X_train, y_train = X_train[~held_out], y_train[~held_out]
+    print(f"[{model_name}] warm start on {new_rows} new rows since ingest_seq {base_seq} + {replay_rows} replayed "
+          f"rows ({int(held_out.sum())} dropped as test rows)")
+    params = {
+        **snapshot.mlflow_params(),
+        "warm_start_from": f"{version.name} v{version.version}",
+        "warm_start_base_ingest_seq": base_seq,
+        "warm_start_new_rows": new_rows,
+        "warm_start_replay_rows": replay_rows,
+        "replay_ratio": replay_ratio,
+    }
+    # snapshot_id stays None: the training rows are not the snapshot's train split
+    train_transformer(model_name, *TRANSFORMER_MODELS[model_name], X_train, X_test, y_train, y_test, params,
+                      init_from=(python_model.model, python_model.tokenizer))
+    return True
+
+def load_snapshot(snapshot_id=None):
+    """The dataset snapshot `snapshot_id` (or the current one) and its (X_train, X_test, y_train, y_test)"""
+    snapshot = DatasetSnapshot(DataProcessor())
+    if snapshot_id:
+        return snapshot, snapshot.load_existing(snapshot_id)
+    return snapshot, snapshot.load_or_build()
+
+def train_model(model_name, snapshot_id=None, warm_start=False, replay_ratio=DEFAULT_REPLAY_RATIO):
+    """Train and log one model, warm-starting transformers from the registry when asked"""
+    snapshot, (X_train, X_test, y_train, y_test) = load_snapshot(snapshot_id)
+    if (warm_start and model_name in TRANSFORMER_MODELS
+            and warm_start_transformer(model_name, snapshot, X_test, y_test, replay_ratio)):
+        return
+    MODEL_TRAINERS[model_name][0](X_train, X_test, y_train, y_test, snapshot.mlflow_params(),
+                                  snapshot_id=snapshot.snapshot_id)
+
+def train_online(source="postgres", parquet_path=None, reset=False):
+    """
+    Update the out-of-core SGD model with the rows ingested since its last update and log it
+
+    Args:
+        source: 'postgres' (rows after the saved ingest_seq) or 'parquet'
+        parquet_path: Parquet file to read with source='parquet'
+        reset: Ignore the saved model and train from scratch
+    """
+    trainer = OnlineClassicalTrainer()
+    if not reset and trainer.load_state():
+        print(f"Updating online model ({trainer.rows_seen} rows seen, ingest_seq {trainer.max_seq})")
+    if source == "parquet":
+        batches = trainer.iter_parquet_batches(parquet_path)
+    else:
+        batches = trainer.iter_postgres_batches()
+    rows_before = trainer.rows_seen
+    X_holdout, y_holdout = trainer.fit_stream(batches)
+    if trainer.rows_seen == rows_before:
+        print("No new training rows; online model unchanged.")
+        return
+    trainer.save_state()
+    print(f"Trained on {trainer.rows_seen - rows_before} new rows ({trainer.rows_seen} in total)")
+    if not y_holdout:
+        print("No holdout rows in this update; model saved but not logged.")
+        return
+
+    X_test = pd.Series(X_holdout)
+    preds = trainer.predict(X_test)
+    params = {
+        "model_type": "SGDClassifier_Hashing",
+        "n_features": trainer.vectorizer.n_features,
+        "ngram_range": trainer.vectorizer.ngram_range,
+        "rows_seen": trainer.rows_seen,
+        "dataset_max_ingest_seq": trainer.max_seq,
+    }
+    log_model_to_mlflow("SGD_Hashing_Online", SklearnTextWrapper(trainer.model, trainer.vectorizer), X_test, preds,
+                        y_holdout, params)
+    measure_candidate_latencies(X_test, ["SGD_Hashing_Online"])
+
+def train_worker(model_name, num_threads, snapshot_id, warm_start=False, replay_ratio=DEFAULT_REPLAY_RATIO):
+    """Train one model in its own process with a fixed CPU-thread budget"""
+    set_thread_budget(num_threads)
+    setup_mlflow()
+    print(f"[{model_name}] training with {num_threads} threads (pid {os.getpid()})")
+    train_model(model_name, snapshot_id, warm_start, replay_ratio)
+    return model_name
+
+def train_parallel(model_names, snapshot_id, total_cores=None, warm_start=False, replay_ratio=DEFAULT_REPLAY_RATIO):
+    """
+    Train the models concurrently, one process each
+
+    Each process gets a share of `total_cores` (by MODEL_TRAINERS weight) as
+    its torch thread budget, loads the same dataset snapshot and logs its own
+    MLflow run.
+    """
+    total_cores = total_cores or len(os.sched_getaffinity(0))
+    budgets = cpu_budgets(model_names, total_cores)
+    print(f"Training {len(model_names)} models in parallel on {total_cores} cores: {budgets}")
+    failed = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(model_names), mp_context=context) as pool:
+        futures = {
+            pool.submit(train_worker, name, budgets[name], snapshot_id, warm_start, replay_ratio): name
+            for name in model_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                print(f"[{name}] done")
+            except Exception as e:
+                print(f"[{name}] failed: {e}")
+                failed.append(name)
+    return failed
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and log the sentiment models")
+    parser.add_argument("--parallel", action="store_true", help="Train the models in parallel processes")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_TRAINERS), default=list(MODEL_TRAINERS),
+                        help="Models to train")
+    parser.add_argument("--cpu-budget", type=int, default=None,
+                        help="Cores shared by the parallel workers (default: all available)")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Continue fine-tuning the Production transformers on newly ingested rows")
+    parser.add_argument("--replay-ratio", type=float, default=DEFAULT_REPLAY_RATIO,
+                        help="Older rows replayed per new row when warm-starting")
+    parser.add_argument("--search", action="store_true",
+                        help="Tune the TF-IDF + LR model with a successive-halving search (same as CLASSICAL_SEARCH=1)")
+    parser.add_argument("--val-size", type=float, default=None,
+                        help="Share of the training split held out for early stopping (same as TRAIN_VAL_SIZE)")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="Stop after this many epochs without a validation F1 gain (same as TRAIN_PATIENCE)")
+    parser.add_argument("--distill", action="store_true",
+                        help="After training, distill the best transformer into a TF-IDF + LR student")
+    parser.add_argument("--quantize", action="store_true",
+                        help="After training, log int8 dynamically quantized variants of the transformers")
+    parser.add_argument("--online", action="store_true",
+                        help="Only update the out-of-core SGD model with newly ingested rows")
+    parser.add_argument("--online-source", choices=["postgres", "parquet"], default="postgres")
+    parser.add_argument("--parquet", help="Parquet file for --online-source parquet")
+    parser.add_argument("--reset-online", action="store_true", help="Retrain the SGD model from scratch")
+    args = parser.parse_args()
+
+    if args.search:
+        # Read by ClassicalTrainer, also in the spawned parallel workers
+        os.environ["CLASSICAL_SEARCH"] = "1"
+    # Read by TransformerTrainer, also in the spawned parallel workers
+    if args.val_size is not None:
+        os.environ["TRAIN_VAL_SIZE"] = str(args.val_size)
+    if args.patience is not None:
+        os.environ["TRAIN_PATIENCE"] = str(args.patience)
+
+    if args.online:
+        setup_mlflow()
+        train_online(args.online_source, args.parquet, args.reset_online)
+        return
+
+    # Reuse the cleaned split from the last run when the source data is unchanged; warm-started
+    # transformers are evaluated on its test split too
+    snapshot = DatasetSnapshot(DataProcessor())
+    snapshot.load_or_build()
+    snapshot_id = snapshot.snapshot_id
+
+    setup_mlflow()
+
+    if args.parallel:
+        failed = train_parallel(args.models, snapshot_id, args.cpu_budget, args.warm_start, args.replay_ratio)
+        if failed:
+            print(f"Training failed for: {', '.join(failed)}")
+            sys.exit(1)
+    else:
+        for name in args.models:
+            train_model(name, snapshot_id, args.warm_start, args.replay_ratio)
+
+    snapshot, (X_train, X_test, y_train, y_test) = load_snapshot(snapshot_id)
+    if args.distill:
+        train_distilled_student(X_train, X_test, y_train, y_test, snapshot.mlflow_params(),
+                                snapshot_id=snapshot.snapshot_id)
+
+    if args.quantize:
+        quantize_transformers(X_test, y_test, snapshot.mlflow_params(), snapshot_id=snapshot.snapshot_id)
+
+    # Timed here, after the parallel workers have finished, so all candidates share one thread setting
+    measure_candidate_latencies(X_test)
 
     print("All models trained and logged successfully.")
+
+# === Main
+if __name__ == '__main__':
+    main()
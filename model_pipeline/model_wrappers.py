@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+MLflow pyfunc wrappers for the sentiment models.
+
+Logged models pickle their wrapper by reference to this module, and the
+module itself is logged with the model (see WRAPPER_CODE_PATHS). The
+wrappers must not live in the training script: the parallel trainers run
+it as `__mp_main__`, a module no serving or validation process can import.
+"""
+import os
+
+import mlflow.pyfunc
+import torch
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# Logged with each model so loading it only needs MLflow and the model libraries
+WRAPPER_CODE_PATHS = [os.path.abspath(__file__)]
+
+
+class HFTransformersWrapper(mlflow.pyfunc.PythonModel):
+    def __init__(self, model_class, tokenizer_class, model_path="model_path"):
+        self.model_class = model_class
+        self.tokenizer_class = tokenizer_class
+        self.model_path_key = model_path
+
+    def load_context(self, context):
+        model_path = context.artifacts[self.model_path_key]
+        self.model = self.model_class.from_pretrained(model_path)
+        self.tokenizer = self.tokenizer_class.from_pretrained(model_path)
+
+    def predict(self, context, model_input):
+        texts = model_input["text"].tolist()
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=64, return_tensors="pt")
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            preds = torch.argmax(outputs.logits, dim=1).numpy()
+        return preds
+
+
+def quantize_linear_int8(model):
+    """Copy of `model` with its Linear layers dynamically quantized to int8 (weights int8, activations quantized per batch)"""
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class QuantizedHFTransformersWrapper(HFTransformersWrapper):
+    """
+    HFTransformersWrapper serving int8 dynamically quantized Linear layers
+
+    The fp32 weights are stored as the artifact and quantized again in
+    load_context, so the logged model does not rely on pickled quantized modules.
+    """
+    def load_context(self, context):
+        super().load_context(context)
+        self.model = quantize_linear_int8(self.model)
+
+
+class SklearnTextWrapper(mlflow.pyfunc.PythonModel):
+    def __init__(self, model, vectorizer):
+        self.model = model
+        self.vectorizer = vectorizer
+
+    def predict(self, context, model_input):
+        X = self.vectorizer.transform(model_input["text"])
+        return self.model.predict(X)
+
+class VaderSentimentWrapper(mlflow.pyfunc.PythonModel):
+    def __init__(self):
+        self.analyzer = SentimentIntensityAnalyzer()
+
+    def predict(self, context, model_input):
+        results = []
+        for text in model_input["text"]:
+            score = self.analyzer.polarity_scores(text)["compound"]
+            if score > 0.05:
+                results.append(1)
+            elif score < -0.05:
+                results.append(0)
+            else:
+                results.append(2)
+        return results
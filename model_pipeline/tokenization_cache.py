@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+On-disk tokenization cache for the transformer trainers.
+
+Each tokenizer/max_length pair gets an append-only store of fixed-width,
+right-padded token id rows, read back as NumPy memmaps. Rows are found by a
+hash of the text, so retraining on appended data only tokenizes the new
+texts; the rows used by a dataset snapshot split are saved next to the store
+so an unchanged snapshot skips hashing as well.
+"""
+import fcntl
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import transformers
+from torch.utils.data import Dataset
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "TOKEN_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "token_cache"))
+)
+
+
+def text_hashes(texts):
+    """Stable 64-bit hashes of the texts (same value across runs and processes)"""
+    return pd.util.hash_pandas_object(pd.Series(texts, dtype=object).fillna(""), index=False).to_numpy()
+
+
+class MemmapTokenDataset(Dataset):
+    """Dataset reading unpadded token id sequences from the memmapped store rows"""
+    def __init__(self, input_ids, lengths, rows, labels):
+        self.input_ids = input_ids
+        self.rows = rows
+        self.labels = [int(label) for label in labels]
+        self.lengths = lengths[rows].tolist()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        row = self.rows[idx]
+        # Copy the row out of the read-only memmap (torch cannot wrap non-writable arrays)
+        return self.input_ids[row, :self.lengths[idx]].astype(np.int64), self.labels[idx]
+
+
+class TokenizationCache:
+    def __init__(self, tokenizer, max_length, cache_dir=None):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.key = self.tokenizer_key()
+        self.path = os.path.join(cache_dir or DEFAULT_CACHE_DIR, self.key)
+        os.makedirs(os.path.join(self.path, "splits"), exist_ok=True)
+
+    def tokenizer_key(self):
+        """Cache key: tokenizer class, name/path, vocabulary size, transformers version and max_length"""
+        key = json.dumps({
+            "tokenizer": type(self.tokenizer).__name__,
+            "name": self.tokenizer.name_or_path,
+            "vocab_size": len(self.tokenizer),
+            "transformers": transformers.__version__,
+            "max_length": self.max_length,
+        }, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _row_count(self):
+        # The hash file is written last, so it bounds the rows fully written
+        path = self._file("hashes.bin")
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _open(self):
+        """Memmap views of the stored rows: (input_ids, lengths, hashes)"""
+        rows = self._row_count()
+        if rows == 0:
+            return (np.empty((0, self.max_length), dtype=np.int32), np.empty(0, dtype=np.int16),
+                    np.empty(0, dtype=np.uint64))
+        input_ids = np.memmap(self._file("input_ids.bin"), dtype=np.int32, mode="r",
+                              shape=(rows, self.max_length))
+        lengths = np.memmap(self._file("lengths.bin"), dtype=np.int16, mode="r", shape=(rows,))
+        hashes = np.memmap(self._file("hashes.bin"), dtype=np.uint64, mode="r", shape=(rows,))
+        return input_ids, lengths, hashes
+
+    def _append(self, texts, hashes):
+        """Tokenize `texts` and append them to the store (caller holds the lock)"""
+        # Drop a partially written tail left by an interrupted append
+        rows = self._row_count()
+        for name, width in (("input_ids.bin", 4 * self.max_length), ("lengths.bin", 2)):
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) != rows * width:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * width)
+
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)["input_ids"]
+        input_ids = np.full((len(encoded), self.max_length), self.tokenizer.pad_token_id, dtype=np.int32)
+        lengths = np.empty(len(encoded), dtype=np.int16)
+        for i, ids in enumerate(encoded):
+            input_ids[i, :len(ids)] = ids
+            lengths[i] = len(ids)
+        for name, values in (("input_ids.bin", input_ids), ("lengths.bin", lengths),
+                             ("hashes.bin", np.asarray(hashes, dtype=np.uint64))):
+            with open(self._file(name), "ab") as f:
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def rows_for(self, texts):
+        """Store rows holding `texts`, tokenizing and appending the ones not cached yet"""
+        hashes = text_hashes(texts)
+        rows = pd.Index(self._open()[2]).get_indexer(hashes)
+        missing = rows < 0
+        if missing.any():
+            with open(self._file("lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another process may have appended the same texts while we waited
+                rows = pd.Index(self._open()[2]).get_indexer(hashes)
+                missing = rows < 0
+                new_hashes, first = np.unique(hashes[missing], return_index=True)
+                if len(new_hashes):
+                    new_texts = np.asarray(texts, dtype=object)[missing][first]
+                    print(f"Tokenizing {len(new_texts)} new texts ({len(hashes) - int(missing.sum())} cached)")
+                    self._append(new_texts, new_hashes)
+                    rows = pd.Index(self._open()[2]).get_indexer(hashes)
+        return rows
+
+    def dataset(self, texts, labels, snapshot_id=None, split=None):
+        """
+        MemmapTokenDataset for a split
+
+        Args:
+            texts, labels: Split texts and labels
+            snapshot_id: Dataset snapshot the split comes from; its store rows are
+                saved so the next run on the same snapshot skips hashing
+            split: Split name, required with snapshot_id; it must identify how the
+                split was drawn from the snapshot (e.g. include the seed)
+        """
+        split_path = self._file(os.path.join("splits", f"{snapshot_id}_{split}.npy")) if snapshot_id else None
+        rows = np.load(split_path) if split_path and os.path.exists(split_path) else None
+        # Saved rows for a different number of texts are from another split drawn under the same name
+        if rows is None or len(rows) != len(texts):
+            rows = self.rows_for(list(texts))
+            if split_path:
+                tmp_path = f"{split_path}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, rows)
+                os.replace(tmp_path, split_path)
+        input_ids, lengths, _ = self._open()
+        return MemmapTokenDataset(input_ids, lengths, rows, labels)
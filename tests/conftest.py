@@ -0,0 +1,50 @@
+# tests/conftest.py
+# Fixture dùng chung: một BERT rất nhỏ tạo offline cho model_pipeline, database PostgreSQL cho data
+import os
+import sys
+
+import pytest
+
+WORDS = ["good", "bad", "great", "awful", "ok", "vote", "trump", "biden", "love", "hate", "news", "today"]
+
+
+@pytest.fixture(scope="session")
+def tiny_bert(tmp_path_factory):
+    """Thư mục chứa tokenizer + BertForSequenceClassification (3 nhãn) dùng được với from_pretrained"""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    path = tmp_path_factory.mktemp("tiny_bert")
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n")
+    transformers.BertTokenizer(vocab_file).save_pretrained(path)
+    config = transformers.BertConfig(vocab_size=len(WORDS) + 5, hidden_size=16, num_hidden_layers=1,
+                                     num_attention_heads=2, intermediate_size=32, max_position_embeddings=64,
+                                     num_labels=3)
+    torch.manual_seed(0)
+    transformers.BertForSequenceClassification(config).save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def tiny_corpus():
+    """Câu có độ dài khác nhau (1-12 từ) và nhãn 0/1/2"""
+    texts = [" ".join(WORDS[(i + j) % len(WORDS)] for j in range(1 + (i * 7) % 12)) for i in range(120)]
+    labels = [i % 3 for i in range(120)]
+    return texts, labels
+
+
+@pytest.fixture(scope="session")
+def test_db():
+    """Tên database PostgreSQL dùng cho test (TEST_DB_NAME); bỏ qua nếu không kết nối được"""
+    pytest.importorskip("dotenv")
+    pytest.importorskip("psycopg2")
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+    from ingest import create_database_if_not_exists
+
+    db_name = os.getenv("TEST_DB_NAME", "twdb_test")
+    try:
+        create_database_if_not_exists(db_name)
+    except Exception as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    return db_name
@@ -0,0 +1,113 @@
+# tests/test_backfill.py
+# Backfill theo ledger: sau khi bị ngắt giữa chừng, lần chạy sau chỉ nạp các file còn lại
+# (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+import ingest
+import schema
+from db_engine import get_engine, raw_connection
+
+TABLE = "tweets_backfill"
+
+
+class MergeFailed(Exception):
+    pass
+
+
+def write_files(labeled_dir, n_files=4, rows_per_file=30):
+    """File thứ k chứa id k*20 .. k*20+29: mỗi file trùng 10 id với file trước, với text khác"""
+    labeled_dir.mkdir(exist_ok=True)
+    for k in range(n_files):
+        ids = range(k * 20, k * 20 + rows_per_file)
+        pd.DataFrame({
+            "id": ids,
+            "date": [str(pd.Timestamp("2025-03-01", tz="UTC") + pd.Timedelta(hours=i)) for i in ids],
+            "cleaned_text": [f"file {k} tweet {i}" for i in ids],
+            "Sentiment": "Positive",
+        }).to_csv(labeled_dir / f"labeled_{k}.csv", index=False)
+    return str(labeled_dir)
+
+
+def table_rows(test_db):
+    return pd.read_sql_query(f"SELECT id, cleaned_text FROM {TABLE} ORDER BY id", get_engine(test_db))
+
+
+def ledger(test_db):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"SELECT file_name FROM {schema.LEDGER_TABLE} WHERE table_name = %s ORDER BY 1", (TABLE,))
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT count(*) FROM pg_tables WHERE tablename LIKE %s", (f"{TABLE}_backfill_%",))
+        leftover_staging = cursor.fetchone()[0]
+        conn.rollback()
+    assert leftover_staging == 0
+    return names
+
+
+@pytest.fixture
+def table(test_db):
+    def drop():
+        with raw_connection(test_db) as conn:
+            schema.drop_table(conn, TABLE)
+            with conn.cursor() as cursor:
+                schema._drop_with_rollups(cursor, TABLE)
+            conn.commit()
+
+    drop()
+    yield TABLE
+    drop()
+
+
+def test_backfill_resumes_after_partial_ledger(table, test_db, tmp_path, monkeypatch):
+    labeled_dir = write_files(tmp_path / "labeled")
+
+    # Lần chạy đầu bị lỗi khi merge file thứ 3
+    merge = ingest._merge_staged_file
+
+    def failing_merge(engine, table_name, staging_name, column_names, file_name, *args, **kwargs):
+        if file_name == "labeled_2.csv":
+            raise MergeFailed(file_name)
+        return merge(engine, table_name, staging_name, column_names, file_name, *args, **kwargs)
+
+    monkeypatch.setattr(ingest, "_merge_staged_file", failing_merge)
+    with pytest.raises(MergeFailed):
+        ingest.backfill_labeled_files(test_db, TABLE, labeled_dir, workers=3)
+    assert ledger(test_db) == ["labeled_0.csv", "labeled_1.csv"]
+    assert table_rows(test_db)["id"].tolist() == list(range(0, 50))
+
+    # Lần chạy sau chỉ nạp hai file còn lại
+    monkeypatch.setattr(ingest, "_merge_staged_file", merge)
+    loaded = ingest.backfill_labeled_files(test_db, TABLE, labeled_dir, workers=3)
+    assert loaded == {"labeled_2.csv": 30, "labeled_3.csv": 30}
+    assert ledger(test_db) == [f"labeled_{k}.csv" for k in range(4)]
+    resumed = table_rows(test_db)
+
+    # Giống hệt một lần backfill liền mạch: id trùng giữ giá trị của file mới nhất
+    assert resumed["id"].tolist() == list(range(0, 90))
+    expected = [f"file {min(i // 20, 3)} tweet {i}" for i in range(0, 90)]
+    assert resumed["cleaned_text"].tolist() == expected
+
+    # Chạy lại: không còn file nào chờ nạp
+    assert ingest.backfill_labeled_files(test_db, TABLE, labeled_dir) == {}
+    pd.testing.assert_frame_equal(table_rows(test_db), resumed)
+
+
+def test_changed_file_is_loaded_again(table, test_db, tmp_path):
+    labeled_dir = write_files(tmp_path / "labeled", n_files=2)
+    assert len(ingest.backfill_labeled_files(test_db, TABLE, labeled_dir)) == 2
+
+    # Nội dung đổi (sha256 khác) thì file được nạp lại, các file khác thì không
+    path = os.path.join(labeled_dir, "labeled_0.csv")
+    df = pd.read_csv(path)
+    df.loc[df["id"] == 5, "cleaned_text"] = "edited"
+    df.to_csv(path, index=False)
+    assert ingest.backfill_labeled_files(test_db, TABLE, labeled_dir) == {"labeled_0.csv": 30}
+    rows = table_rows(test_db).set_index("id")["cleaned_text"]
+    assert rows[5] == "edited"
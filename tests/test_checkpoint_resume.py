@@ -0,0 +1,125 @@
+# tests/test_checkpoint_resume.py
+# Train bị ngắt giữa chừng rồi resume từ checkpoint phải cho cùng kết quả với train liền một mạch
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+
+from transformers import BertForSequenceClassification, BertTokenizer
+
+import tokenization_cache
+from cpu_profile import CpuProfile
+from model_training import TransformerTrainer
+
+EPOCHS = 2
+BATCHES_PER_EPOCH = 15  # 120 câu, batch_size 8
+
+
+class Interrupted(Exception):
+    pass
+
+
+def make_trainer(tiny_bert, checkpoint_dir, batches, crash_at=None, **kwargs):
+    """Trainer ghi lại input_ids của mỗi bước train; ném Interrupted ở bước thứ `crash_at`"""
+    trainer = TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, lr=1e-3, batch_size=8,
+                                 use_token_cache=False, cpu_profile=CpuProfile(), checkpoint_dir=str(checkpoint_dir),
+                                 checkpoint_steps=4, **kwargs)
+    forward = trainer.model.forward
+
+    def recording_forward(input_ids, *args, **kw):
+        if trainer.model.training:
+            if crash_at is not None and len(batches) + 1 == crash_at:
+                raise Interrupted
+            batches.append(input_ids.clone())
+        return forward(input_ids, *args, **kw)
+
+    trainer.model.forward = recording_forward
+    return trainer
+
+
+def fit(trainer, tiny_corpus):
+    texts, labels = tiny_corpus
+    X, y = pd.Series(texts), pd.Series(labels)
+    return trainer.run(X, y, X[:24], y[:24], epochs=EPOCHS, snapshot_id="resume-test")
+
+
+@pytest.mark.parametrize("crash_at", [6, BATCHES_PER_EPOCH + 1, BATCHES_PER_EPOCH + 9])
+@pytest.mark.parametrize("early_stopping", [{}, {"val_size": 0.2, "patience": 5}], ids=["plain", "early_stopping"])
+def test_resume_matches_uninterrupted_run(tiny_bert, tiny_corpus, tmp_path, crash_at, early_stopping):
+    reference_batches = []
+    reference = make_trainer(tiny_bert, tmp_path / "reference", reference_batches, **early_stopping)
+    reference_preds, _ = fit(reference, tiny_corpus)
+
+    interrupted_batches = []
+    interrupted = make_trainer(tiny_bert, tmp_path / "resumed", interrupted_batches, crash_at=crash_at,
+                               **early_stopping)
+    with pytest.raises(Interrupted):
+        fit(interrupted, tiny_corpus)
+    assert os.path.exists(os.path.join(interrupted.checkpoint_path, "checkpoint.pt"))
+
+    resumed_batches = []
+    resumed = make_trainer(tiny_bert, tmp_path / "resumed", resumed_batches, **early_stopping)
+    resumed_preds, _ = fit(resumed, tiny_corpus)
+
+    # Các bước sau checkpoint cuối cùng được chạy lại khi resume
+    replayed_from = len(reference_batches) - len(resumed_batches)
+    assert 0 < replayed_from <= len(interrupted_batches)
+    sequence = interrupted_batches[:replayed_from] + resumed_batches
+    assert len(sequence) == len(reference_batches)
+    assert all(torch.equal(a, b) for a, b in zip(sequence, reference_batches))
+
+    expected_state = reference.model.state_dict()
+    for name, tensor in resumed.model.state_dict().items():
+        assert torch.equal(tensor, expected_state[name]), name
+    assert resumed_preds == reference_preds
+    assert resumed.training_params() == reference.training_params()
+    # Train xong thì checkpoint bị xóa
+    assert not os.path.exists(resumed.checkpoint_path)
+
+
+def test_early_stopping_is_opt_in(tiny_bert, monkeypatch):
+    monkeypatch.delenv("TRAIN_VAL_SIZE", raising=False)
+    monkeypatch.delenv("TRAIN_PATIENCE", raising=False)
+    trainer = TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, use_token_cache=False)
+    assert trainer.val_size is None and trainer.patience is None
+
+    monkeypatch.setenv("TRAIN_VAL_SIZE", "0.1")
+    monkeypatch.setenv("TRAIN_PATIENCE", "2")
+    trainer = TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, use_token_cache=False)
+    assert trainer.val_size == 0.1 and trainer.patience == 2
+
+
+@pytest.mark.parametrize("second", [{"val_size": 0.2, "seed": 2}, {"val_size": 0.3, "seed": 1}])
+def test_cached_fit_split_follows_val_size_and_seed(tiny_bert, tiny_corpus, tmp_path, monkeypatch, second):
+    monkeypatch.setattr(tokenization_cache, "DEFAULT_CACHE_DIR", str(tmp_path / "token_cache"))
+    texts, labels = tiny_corpus
+    X, y = pd.Series(texts), pd.Series(labels)
+
+    for params in ({"val_size": 0.2, "seed": 1}, second):
+        trainer = TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, batch_size=8,
+                                     cpu_profile=CpuProfile(), checkpoint_dir=str(tmp_path / "checkpoints"),
+                                     **params)
+        datasets = []
+        create_dataset = trainer.create_dataset
+
+        def recording_create_dataset(split_texts, *args):
+            dataset = create_dataset(split_texts, *args)
+            datasets.append((split_texts, dataset))
+            return dataset
+
+        trainer.create_dataset = recording_create_dataset
+        trainer.run(X, y, X[:24], y[:24], epochs=1, snapshot_id="split-test")
+
+        # Cùng snapshot nhưng val_size/seed khác: split fit/val phải là của lần chạy này, không phải của lần trước
+        for split_texts, dataset in datasets:
+            assert len(dataset) == len(split_texts)
+            for i in (0, len(split_texts) - 1):
+                assert dataset[i][0].tolist() == trainer.tokenizer(split_texts.iloc[i], truncation=True,
+                                                                   max_length=trainer.max_length)["input_ids"]
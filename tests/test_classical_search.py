@@ -0,0 +1,64 @@
+# tests/test_classical_search.py
+# Pipeline(memory=...) trong ClassicalTrainer.tune: mỗi TF-IDF chỉ fit một lần cho mỗi fold
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from model_training import ClassicalTrainer
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "..", "test_data.csv")
+PARAM_GRID = {"tfidf__max_features": [50, None], "lr__C": [0.1, 1.0, 10.0]}
+CV = 2
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    base = pd.read_csv(TEST_DATA)
+    texts = pd.Series([f"{text} w{i % 97}" for i, text in enumerate(base["text"].astype(str).tolist() * 20)])
+    labels = pd.Series(base["sentiment_num"].tolist() * 20)
+    return texts, labels
+
+
+def run_search(training_data, monkeypatch, cache):
+    """Chạy tune (n_jobs=1 để đếm được trong process) và trả về (số lần fit TF-IDF, kết quả search)"""
+    fits = []
+    fit_transform = TfidfVectorizer.fit_transform
+
+    def counting_fit_transform(self, *args, **kwargs):
+        fits.append(self.get_params()["max_features"])
+        return fit_transform(self, *args, **kwargs)
+
+    monkeypatch.setattr(TfidfVectorizer, "fit_transform", counting_fit_transform)
+    trainer = ClassicalTrainer(search=True, param_grid=PARAM_GRID, cv=CV, n_jobs=1)
+    search = trainer.tune(*training_data, cache=cache)
+    monkeypatch.undo()
+    return len(fits), search
+
+
+def test_cache_fits_each_vectorizer_once_per_fold(training_data, monkeypatch):
+    uncached_fits, uncached = run_search(training_data, monkeypatch, cache=False)
+    cached_fits, cached = run_search(training_data, monkeypatch, cache=True)
+
+    results = pd.DataFrame(cached.cv_results_)
+    assert len(results) == len(pd.DataFrame(uncached.cv_results_))
+    # Không cache: mỗi candidate fit lại TF-IDF trên từng fold, cộng 1 lần refit cuối
+    assert uncached_fits == len(results) * CV + 1
+    # Có cache: mỗi (vòng halving, tham số TF-IDF, fold) chỉ fit một lần; mọi C dùng lại ma trận đó
+    distinct_vectorizers = results.groupby("iter")["param_tfidf__max_features"].apply(
+        lambda values: values.astype(str).nunique()).sum()
+    assert cached_fits == distinct_vectorizers * CV + 1
+    assert cached_fits < uncached_fits
+
+    # Cache không thay đổi kết quả search
+    assert cached.best_params_ == uncached.best_params_
+    assert list(results["mean_test_score"]) == list(pd.DataFrame(uncached.cv_results_)["mean_test_score"])
@@ -0,0 +1,144 @@
+# tests/test_copy_binary.py
+# Giải mã buffer binary COPY do ingest.dataframe_to_copy_buffer tạo ra
+import io
+import os
+import struct
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+import schema
+from ingest import PGCOPY_HEADER, dataframe_to_copy_buffer
+
+# Kiểu PostgreSQL (format_type) tương ứng với DDL trong schema.TWEETS_COLUMNS
+DDL_TYPES = {
+    "BIGINT": "bigint",
+    "INTEGER": "integer",
+    "SMALLINT": "smallint",
+    "TEXT": "text",
+    "TIMESTAMPTZ": "timestamp with time zone",
+}
+COLUMN_TYPES = {name: DDL_TYPES[ddl.split()[0]] for name, ddl in schema.TWEETS_COLUMNS}
+FIXED_WIDTH = {"bigint": ">q", "integer": ">i", "smallint": ">h", "timestamp with time zone": ">q"}
+POSTGRES_EPOCH = pd.Timestamp("2000-01-01", tz="UTC")
+
+
+def decode_copy_binary(buffer):
+    """Giải mã buffer thành list các tuple (bytes của từng field, None nếu NULL)"""
+    stream = io.BytesIO(buffer.read())
+    assert stream.read(11) == b"PGCOPY\n\xff\r\n\x00"
+    flags, extension_length = struct.unpack(">ii", stream.read(8))
+    assert flags == 0
+    stream.read(extension_length)
+
+    rows = []
+    while True:
+        (field_count,) = struct.unpack(">h", stream.read(2))
+        if field_count == -1:
+            break
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack(">i", stream.read(4))
+            fields.append(None if length == -1 else stream.read(length))
+        rows.append(tuple(fields))
+    # Trailer (-1) phải là phần cuối cùng của buffer
+    assert stream.read() == b""
+    return rows
+
+
+def decode_field(raw, pg_type):
+    if raw is None:
+        return None
+    if pg_type == "text":
+        return raw.decode("utf-8")
+    fmt = FIXED_WIDTH[pg_type]
+    assert len(raw) == struct.calcsize(fmt)
+    (value,) = struct.unpack(fmt, raw)
+    if pg_type == "timestamp with time zone":
+        return POSTGRES_EPOCH + pd.Timedelta(microseconds=value)
+    return value
+
+
+@pytest.fixture
+def tweets_frame():
+    raw = pd.DataFrame({
+        "id": ["1899745617440587776", "42"],
+        "date": ["2025-03-12 09:30:15.123456+00:00", "1999-12-31 23:00:00.000000+00:00"],
+        "user_id": ["7", None],
+        "user_username": ["alice", None],
+        "user_displayname": ["Ålice \"quoted\", comma\nnewline", ""],
+        "replycount": ["0", "-5"],
+        "retweetcount": ["3", None],
+        "likecount": ["9223372036854775807", "1"],
+        "quotecount": [None, "2"],
+        "viewcount": ["1000", "0"],
+        "searched_keyword": ["trump", "biden"],
+        "cleaned_text": ["tuyệt vời 👍", None],
+        "hashtag_text": [None, "#vote"],
+        "year": ["2025", "1999"],
+        "month_year": ["2025-03", "1999-12"],
+        "sentiment": ["Positive", "2"],
+    })
+    return schema.normalize_frame(raw)
+
+
+def test_binary_copy_round_trip(tweets_frame):
+    buffer = dataframe_to_copy_buffer(tweets_frame, binary=True, column_types=COLUMN_TYPES)
+    rows = decode_copy_binary(buffer)
+
+    assert len(rows) == len(tweets_frame)
+    for raw_row, (_, expected) in zip(rows, tweets_frame.iterrows()):
+        assert len(raw_row) == len(schema.COLUMN_NAMES)
+        for raw, name in zip(raw_row, schema.COLUMN_NAMES):
+            value = decode_field(raw, COLUMN_TYPES[name])
+            if pd.isna(expected[name]):
+                assert raw is None, name
+            else:
+                assert value == expected[name], name
+
+
+def test_binary_copy_encodings(tweets_frame):
+    rows = decode_copy_binary(dataframe_to_copy_buffer(tweets_frame, binary=True, column_types=COLUMN_TYPES))
+    first, second = (dict(zip(schema.COLUMN_NAMES, row)) for row in rows)
+
+    # BIGINT: 8 byte big-endian, kể cả giá trị lớn nhất và số âm
+    assert first["id"] == struct.pack(">q", 1899745617440587776)
+    assert first["likecount"] == struct.pack(">q", 2**63 - 1)
+    assert second["replycount"] == struct.pack(">q", -5)
+    # INTEGER / SMALLINT
+    assert first["year"] == struct.pack(">i", 2025)
+    assert first["sentiment"] == struct.pack(">h", 1)
+    assert second["sentiment"] == struct.pack(">h", 2)
+    # TIMESTAMPTZ: micro giây tính từ 2000-01-01 UTC (trước mốc này thì âm)
+    assert first["date"] == struct.pack(">q", 795087015123456)
+    assert second["date"] == struct.pack(">q", -3600 * 1_000_000)
+    assert decode_field(second["date"], "timestamp with time zone") == pd.Timestamp("1999-12-31 23:00", tz="UTC")
+    # TEXT: UTF-8 không escape; chuỗi rỗng khác NULL
+    assert first["user_displayname"] == "Ålice \"quoted\", comma\nnewline".encode("utf-8")
+    assert first["cleaned_text"] == "tuyệt vời 👍".encode("utf-8")
+    assert second["user_displayname"] == b""
+    # NULL được mã hóa bằng độ dài -1
+    assert second["user_id"] is None
+    assert second["cleaned_text"] is None
+    assert first["quotecount"] is None
+
+
+def test_binary_copy_framing():
+    df = pd.DataFrame({"id": pd.Series([], dtype="Int64")})
+    raw = dataframe_to_copy_buffer(df, binary=True, column_types={"id": "bigint"}).read()
+    assert raw == PGCOPY_HEADER + struct.pack(">h", -1)
+
+    raw = dataframe_to_copy_buffer(pd.DataFrame({"n": [None]}, dtype="Int64"), binary=True,
+                                   column_types={"n": "bigint"}).read()
+    assert raw == PGCOPY_HEADER + struct.pack(">h", 1) + struct.pack(">i", -1) + struct.pack(">h", -1)
+
+
+def test_binary_copy_rejects_unsupported_type():
+    df = pd.DataFrame({"payload": ["{}"]})
+    with pytest.raises(ValueError):
+        dataframe_to_copy_buffer(df, binary=True, column_types={"payload": "jsonb"})
@@ -0,0 +1,41 @@
+# tests/test_cpu_budgets.py
+# Chia core CPU cho các model khi train song song
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+
+from model_training import MODEL_TRAINERS, cpu_budgets
+
+ALL_MODELS = list(MODEL_TRAINERS)
+LIGHT = ["LogisticRegression_TFIDF", "VADER_Sentiment"]
+
+
+@pytest.mark.parametrize("total_cores", range(len(ALL_MODELS), 65))
+def test_budgets_fit_the_host(total_cores):
+    budgets = cpu_budgets(ALL_MODELS, total_cores)
+    assert set(budgets) == set(ALL_MODELS)
+    assert sum(budgets.values()) == total_cores
+    assert all(budgets[name] == 1 for name in LIGHT)
+    assert min(budgets.values()) >= 1
+    # Model nặng hơn không bao giờ nhận ít core hơn model nhẹ hơn
+    assert budgets["BERT_Transformer"] >= budgets["DistilBERT_Transformer"]
+
+
+def test_largest_remainder_split():
+    # 12 - 2 core cho LR/VADER = 10 core chia theo trọng số 4:4:3 -> 3.64, 3.64, 2.73
+    assert cpu_budgets(ALL_MODELS, 12) == {
+        "LogisticRegression_TFIDF": 1, "VADER_Sentiment": 1,
+        "BERT_Transformer": 4, "RoBERTa_Transformer": 3, "DistilBERT_Transformer": 3,
+    }
+
+
+def test_fewer_cores_than_models():
+    assert cpu_budgets(ALL_MODELS, 2) == {name: 1 for name in ALL_MODELS}
+    assert cpu_budgets(["BERT_Transformer"], 8) == {"BERT_Transformer": 8}
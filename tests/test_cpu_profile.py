@@ -0,0 +1,63 @@
+# tests/test_cpu_profile.py
+# CpuProfile / CpuAutotuner trong worker có giới hạn số thread (train_parallel)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+torch = pytest.importorskip("torch")
+
+import cpu_profile
+from cpu_profile import CpuAutotuner, CpuProfile, set_thread_budget, thread_budget
+
+
+@pytest.fixture
+def budget():
+    """Giả lập worker được cấp 2 thread, khôi phục trạng thái sau test"""
+    threads = torch.get_num_threads()
+    set_thread_budget(2)
+    yield 2
+    cpu_profile._thread_budget = None
+    torch.set_num_threads(threads)
+
+
+def test_apply_clamps_to_budget(budget):
+    profile = CpuProfile(intra_op_threads=16)
+    profile.apply()
+    assert torch.get_num_threads() == budget
+    # Param log lên MLflow là số thread thực sự dùng
+    assert profile.mlflow_params()["cpu_intra_op_threads"] == budget
+
+    CpuProfile(intra_op_threads=1).apply()
+    assert torch.get_num_threads() == 1
+
+
+def test_apply_without_budget_is_unchanged():
+    assert thread_budget() is None
+    threads = torch.get_num_threads()
+    try:
+        CpuProfile(intra_op_threads=threads + 2).apply()
+        assert torch.get_num_threads() == threads + 2
+    finally:
+        torch.set_num_threads(threads)
+
+
+def test_tune_stays_within_budget(budget, tiny_bert, tiny_corpus, tmp_path):
+    pytest.importorskip("mlflow")
+    from transformers import BertForSequenceClassification, BertTokenizer
+    from model_training import TransformerTrainer
+
+    texts, labels = tiny_corpus
+    trainer = TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, batch_size=8,
+                                 use_token_cache=False, cpu_profile=CpuProfile())
+    dataset = trainer.create_dataset(pd.Series(texts), labels)
+    candidates = [CpuProfile(intra_op_threads=8), CpuProfile(intra_op_threads=1)]
+    tuner = CpuAutotuner(cache_path=str(tmp_path / "profiles.json"), steps=1)
+
+    best = tuner.tune(trainer, dataset, candidates)
+    assert best.intra_op_threads <= budget
+    assert torch.get_num_threads() <= budget
+    # Cache key không đổi dù việc đo đã thay đổi số thread
+    assert tuner.tune(trainer, dataset).to_dict() == best.to_dict()
@@ -0,0 +1,140 @@
+# tests/test_csv_stream.py
+# CsvCopyStream (không dùng pandas) phải cho cùng kết quả với pd.read_csv + schema.normalize_frame
+import csv
+import glob
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+sys.path.insert(0, DATA_DIR)
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+import schema
+from ingest import CsvCopyStream
+
+LABELED_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "labeled", "*.csv")))
+HEADER = "id,date,user_id,user_username,likeCount,cleaned_text,year,Sentiment\n"
+
+
+def stream_frame(csv_file, batch_rows=1000, block_size=4096):
+    """Đọc CsvCopyStream như COPY ... CSV: field rỗng không có dấu nháy là NULL"""
+    with CsvCopyStream(csv_file, batch_rows=batch_rows) as stream:
+        blocks = []
+        while True:
+            block = stream.read(block_size)
+            if not block:
+                break
+            blocks.append(block)
+        columns, skipped = stream.columns, stream.skipped
+
+    rows = [[value if value != "" else None for value in row]
+            for row in csv.reader(io.StringIO("".join(blocks)))]
+    df = pd.DataFrame(rows, columns=columns, dtype=object)
+    ddl = dict(schema.TWEETS_COLUMNS)
+    for name in columns:
+        if ddl[name].startswith(("BIGINT", "INTEGER")):
+            df[name] = pd.to_numeric(df[name]).astype("Int64")
+        elif ddl[name].startswith("SMALLINT"):
+            df[name] = pd.to_numeric(df[name]).astype("Int16")
+        elif ddl[name].startswith("TIMESTAMPTZ"):
+            df[name] = pd.to_datetime(df[name], utc=True, format="ISO8601")
+    return df, skipped
+
+
+def pandas_frame(csv_file):
+    """Kết quả của đường pandas (ingest_csv), chỉ giữ các cột có trong file"""
+    df = schema.normalize_frame(pd.read_csv(csv_file))
+    present = {name.strip().lower() for name in pd.read_csv(csv_file, nrows=0).columns}
+    return df[[name for name in schema.COLUMN_NAMES if name in present]].reset_index(drop=True)
+
+
+def assert_same_rows(csv_file, **kwargs):
+    streamed, skipped = stream_frame(csv_file, **kwargs)
+    expected = pandas_frame(csv_file)
+    assert list(streamed.columns) == list(expected.columns)
+    assert len(streamed) == len(expected)
+    for name in expected.columns:
+        left = streamed[name].astype(object).where(streamed[name].notna(), None).tolist()
+        right = expected[name].astype(object).where(expected[name].notna(), None).tolist()
+        assert left == right, name
+    return streamed, skipped
+
+
+@pytest.mark.parametrize("csv_file", LABELED_FILES, ids=os.path.basename)
+def test_stream_matches_normalize_frame(csv_file):
+    assert_same_rows(csv_file)
+
+
+@pytest.mark.skipif(not LABELED_FILES, reason="no labeled files")
+def test_stream_is_independent_of_block_size():
+    # Block nhỏ cắt ngang field/dòng; batch nhỏ buộc refill nhiều lần
+    big, _ = stream_frame(LABELED_FILES[0])
+    small, _ = stream_frame(LABELED_FILES[0], batch_rows=3, block_size=7)
+    pd.testing.assert_frame_equal(big, small)
+
+
+def write_csv(tmp_path, body):
+    path = tmp_path / "edge.csv"
+    path.write_text(HEADER + body, encoding="utf-8")
+    return str(path)
+
+
+def test_quoting_and_embedded_newlines(tmp_path):
+    csv_file = write_csv(tmp_path, (
+        '1,2025-03-12 09:30:15+00:00,7,"a, b","8825.0","she said ""hi""\n'
+        'second line, with comma",2025,Positive\n'
+        '2,2025-03-12T10:00:00,8,plain,3,"line1\r\nline2",2025,negative\n'
+    ))
+    streamed, skipped = assert_same_rows(csv_file)
+    assert skipped == 0
+    assert streamed["cleaned_text"].tolist() == ['she said "hi"\nsecond line, with comma', "line1\r\nline2"]
+    assert streamed["user_username"].tolist() == ["a, b", "plain"]
+    assert streamed["likecount"].tolist() == [8825, 3]
+    assert streamed["sentiment"].tolist() == [1, 0]
+
+
+def test_empty_and_null_fields(tmp_path):
+    csv_file = write_csv(tmp_path, (
+        '1,2025-03-12 09:30:15+00:00,,,,,,\n'
+        '2,2025-03-12 09:30:15+00:00,"","","","","",""\n'
+        '3,2025-03-12 09:30:15+00:00,NULL,NULL,NaN,NA,,2\n'
+        '4,2025-03-12 09:30:15+00:00,5,bob\n'
+    ))
+    streamed, skipped = assert_same_rows(csv_file)
+    assert skipped == 0
+    for name in ("user_id", "user_username", "likecount", "cleaned_text", "year"):
+        assert streamed[name].iloc[:3].isna().all(), name
+    # Dòng thiếu cột ở cuối: các cột thiếu là NULL
+    assert streamed.iloc[3][["user_id", "user_username"]].tolist() == [5, "bob"]
+    assert streamed.iloc[3][["likecount", "cleaned_text", "year"]].isna().all()
+    assert streamed["sentiment"].isna().tolist() == [True, True, False, True]
+
+
+def test_bad_dates_and_keys_are_skipped(tmp_path):
+    csv_file = write_csv(tmp_path, (
+        '1,not a date,7,alice,1,ok,2025,Neutral\n'
+        '2,,7,alice,1,ok,2025,Neutral\n'
+        '3,2025-02-30 00:00:00,7,alice,1,ok,2025,Neutral\n'
+        ',2025-03-12 09:30:15+00:00,7,alice,1,ok,2025,Neutral\n'
+        'abc,2025-03-12 09:30:15+00:00,7,alice,1,ok,2025,Neutral\n'
+        '6,2025-03-12 09:30:15+00:00,7,alice,1,ok,2025,Neutral\n'
+    ))
+    streamed, skipped = assert_same_rows(csv_file)
+    assert skipped == 5
+    assert streamed["id"].tolist() == [6]
+
+
+def test_header_validation(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("id,user_id\n1,2\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="missing required columns"):
+        CsvCopyStream(str(path))
+
+    path.write_text("id,date,Date\n1,2025-01-01,2025-01-01\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Duplicate columns"):
+        CsvCopyStream(str(path))
@@ -0,0 +1,79 @@
+# tests/test_dataset_snapshot.py
+# Fingerprint của snapshot phải khớp với dữ liệu đã export, kể cả khi có dòng được ingest song song
+# (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+
+from model_training import DataProcessor  # thêm data/ vào sys.path
+from dataset_snapshot import DatasetSnapshot
+from db_engine import raw_connection
+
+TABLE = "tweets_snapshot"
+
+
+def insert_rows(test_db, first_id, n_rows):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (id, cleaned_text, sentiment) VALUES (%s, %s, %s)",
+            [(i, f"tweet {i}", i % 3) for i in range(first_id, first_id + n_rows)],
+        )
+        conn.commit()
+
+
+@pytest.fixture
+def table(test_db):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} (id BIGINT PRIMARY KEY, cleaned_text TEXT, sentiment SMALLINT)")
+        conn.commit()
+    insert_rows(test_db, 1, 100)
+    yield TABLE
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+
+
+class ConcurrentIngestProcessor(DataProcessor):
+    """Một ingest khác commit thêm dòng ngay trước khi dữ liệu được export"""
+
+    def __init__(self, test_db, **kwargs):
+        super().__init__(**kwargs)
+        self.db_name = test_db
+        self.test_db = test_db
+        self.inserted = 0
+
+    def iter_batches(self, *args, **kwargs):
+        insert_rows(self.test_db, 1000 + self.inserted, 20)
+        self.inserted += 20
+        yield from super().iter_batches(*args, **kwargs)
+
+
+def test_fingerprint_matches_exported_rows(table, test_db, tmp_path):
+    processor = ConcurrentIngestProcessor(test_db, sql_query=f"SELECT * FROM {TABLE}")
+    snapshot = DatasetSnapshot(processor, snapshot_dir=str(tmp_path))
+    X_train, X_test, _, _ = snapshot.load_or_build()
+
+    assert processor.inserted == 20
+    # Dòng ingest song song không nằm trong snapshot lẫn fingerprint
+    assert snapshot.fingerprint["rows"] == len(X_train) + len(X_test) == 100
+    assert snapshot.fingerprint["max_id"] == 100
+    with open(os.path.join(snapshot.path(), "meta.json")) as f:
+        meta = json.load(f)
+    assert meta["fingerprint"] == snapshot.fingerprint
+    assert meta["train_rows"] + meta["test_rows"] == meta["fingerprint"]["rows"]
+
+    # Lần sau fingerprint thấy 120 dòng: snapshot mới, khớp với dữ liệu của nó
+    fresh = DatasetSnapshot(DataProcessor(sql_query=f"SELECT * FROM {TABLE}"), snapshot_dir=str(tmp_path))
+    fresh.processor.db_name = test_db
+    X_train, X_test, _, _ = fresh.load_or_build()
+    assert fresh.snapshot_id != snapshot.snapshot_id
+    assert fresh.fingerprint["rows"] == len(X_train) + len(X_test) == 120
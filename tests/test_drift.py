@@ -0,0 +1,109 @@
+# tests/test_drift.py
+# Drift check: batch cùng phân phối với reference thì pass, batch bị dịch chuyển thì fail
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+
+import drift
+
+LABELS = np.array(["Positive", "Negative", "Neutral"])
+
+
+def tweets(n_rows, seed, like_scale=1.0, extra_words=0, sentiment_p=(0.4, 0.35, 0.25)):
+    rng = np.random.default_rng(seed)
+    words = rng.integers(3, 20, n_rows) + extra_words
+    return pd.DataFrame({
+        "cleaned_text": [" ".join(["word"] * n) for n in words],
+        "likeCount": np.round(rng.lognormal(2, 1, n_rows) * like_scale).astype(np.int64),
+        "viewcount": rng.integers(100, 10_000, n_rows),
+        "Sentiment": rng.choice(LABELS, n_rows, p=sentiment_p),
+    })
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return drift.build_reference(tweets(5000, seed=0))
+
+
+def results_by_check(reference, df):
+    return {r["check"]: r for r in drift.drift_results(reference, drift.batch_counts(reference, df))}
+
+
+def test_unshifted_batch_passes(reference):
+    results = results_by_check(reference, tweets(5000, seed=2))
+    assert set(results) == {"drift_likecount", "drift_sentiment", "drift_text_length", "drift_viewcount"}
+    for check, result in results.items():
+        assert result["success"], (check, result["details"])
+
+
+def test_shifted_batch_fails(reference):
+    shifted = tweets(5000, seed=1, like_scale=4.0, extra_words=8, sentiment_p=(0.7, 0.2, 0.1))
+    results = results_by_check(reference, shifted)
+    for check in ("drift_likecount", "drift_text_length", "drift_sentiment"):
+        assert not results[check]["success"], check
+    assert results["drift_likecount"]["details"]["ks"] > drift.KS_THRESHOLD
+    assert results["drift_text_length"]["details"]["psi"] > drift.PSI_THRESHOLD
+    assert results["drift_sentiment"]["details"]["chi2_pvalue"] < drift.CHI2_PVALUE_THRESHOLD
+    # viewcount không bị dịch chuyển
+    assert results["drift_viewcount"]["success"]
+
+
+def test_statistics_per_feature_type(reference):
+    results = results_by_check(reference, tweets(1000, seed=2))
+    # KS chỉ áp dụng cho feature số; sentiment (phân loại) dùng chi-square
+    assert "ks" not in results["drift_sentiment"]["details"]
+    assert "chi2_pvalue" in results["drift_sentiment"]["details"]
+    for check in ("drift_likecount", "drift_text_length", "drift_viewcount"):
+        assert "ks" in results[check]["details"]
+        assert "chi2" not in results[check]["details"]
+
+
+def test_label_only_shift_between_classes_is_detected(reference):
+    # Hoán đổi tỉ lệ Negative/Neutral: thứ tự nhãn không có nghĩa, chi-square vẫn phát hiện
+    results = results_by_check(reference, tweets(5000, seed=3, sentiment_p=(0.4, 0.25, 0.35)))
+    assert not results["drift_sentiment"]["success"]
+
+
+def test_known_statistic_values():
+    same = np.array([10.0, 20.0, 30.0])
+    assert drift.population_stability_index(same, same * 3) == pytest.approx(0.0)
+    assert drift.ks_statistic(same, same * 3) == pytest.approx(0.0)
+    assert drift.ks_statistic(np.array([1.0, 1.0]), np.array([2.0, 0.0])) == pytest.approx(0.5)
+    psi = drift.population_stability_index(np.array([50.0, 50.0]), np.array([80.0, 20.0]))
+    assert psi == pytest.approx(0.3 * np.log(0.8 / 0.5) - 0.3 * np.log(0.2 / 0.5))
+
+    scipy_stats = pytest.importorskip("scipy.stats")
+    ref, cur = np.array([40.0, 35.0, 25.0]), np.array([70.0, 20.0, 10.0])
+    statistic, pvalue = drift.chi_square(ref, cur)
+    expected = scipy_stats.chi2_contingency(np.vstack([ref, cur]), correction=False)
+    assert statistic == pytest.approx(expected[0])
+    assert pvalue == pytest.approx(expected[1])
+
+
+def test_reference_round_trip_and_chunked_counts(reference, tmp_path):
+    path = str(tmp_path / "reference.npz")
+    drift.save_reference(reference, path)
+    loaded = drift.load_reference(path)
+    assert set(loaded) == set(reference)
+    for feature in reference:
+        np.testing.assert_array_equal(loaded[feature]["edges"], reference[feature]["edges"])
+        np.testing.assert_array_equal(loaded[feature]["counts"], reference[feature]["counts"])
+
+    batch = tweets(1000, seed=4)
+    csv_file = tmp_path / "batch.csv"
+    batch.to_csv(csv_file, index=False)
+    chunked = drift.file_counts(loaded, str(csv_file), chunksize=77)
+    whole = drift.batch_counts(loaded, batch)
+    for feature in whole:
+        np.testing.assert_array_equal(chunked[feature], whole[feature])
+
+
+def test_empty_feature_fails(reference):
+    results = results_by_check(reference, tweets(100, seed=5).drop(columns=["viewcount"]))
+    assert not results["drift_viewcount"]["success"]
+    assert "error" in results["drift_viewcount"]["details"]
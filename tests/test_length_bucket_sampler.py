@@ -0,0 +1,107 @@
+# tests/test_length_bucket_sampler.py
+# LengthBucketSampler và TransformerTrainer.collate (padding động theo batch)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+
+from model_training import LengthBucketSampler, TransformerTrainer
+from cpu_profile import CpuProfile
+
+LENGTHS = [(i * 37) % 23 + 1 for i in range(203)]
+
+
+def flatten(batches):
+    return [i for batch in batches for i in batch]
+
+
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_each_index_once_per_epoch(shuffle):
+    sampler = LengthBucketSampler(LENGTHS, batch_size=8, shuffle=shuffle, bucket_size=4, seed=0)
+    for _ in range(3):
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        assert sorted(flatten(batches)) == list(range(len(LENGTHS)))
+        assert all(len(batch) <= 8 for batch in batches)
+
+
+def test_seeded_epochs_are_reproducible():
+    first = LengthBucketSampler(LENGTHS, batch_size=8, bucket_size=4, seed=7)
+    second = LengthBucketSampler(LENGTHS, batch_size=8, bucket_size=4, seed=7)
+    epochs = [list(first) for _ in range(3)]
+    assert epochs == [list(second) for _ in range(3)]
+    # Mỗi epoch một thứ tự khác nhau
+    assert epochs[0] != epochs[1] != epochs[2]
+    # set_epoch tái tạo đúng thứ tự của một epoch bất kỳ, kể cả khi bỏ qua các batch đầu (resume)
+    third = LengthBucketSampler(LENGTHS, batch_size=8, bucket_size=4, seed=7)
+    third.set_epoch(2)
+    assert list(third) == epochs[2]
+    third.set_epoch(1, start_batch=5)
+    assert list(third) == epochs[1][5:]
+    # Epoch tiếp theo bắt đầu lại từ batch đầu tiên
+    assert list(third) == epochs[2]
+
+
+def test_batches_are_length_bucketed():
+    def padded_tokens(sampler):
+        return sum(len(batch) * max(LENGTHS[i] for i in batch) for batch in sampler)
+
+    sampler = LengthBucketSampler(LENGTHS, batch_size=8, bucket_size=4, seed=0)
+    for batch in list(sampler):
+        lengths = [LENGTHS[i] for i in batch]
+        assert lengths == sorted(lengths)
+    # Pool lớn hơn thì batch đồng đều hơn, ít padding hơn
+    assert padded_tokens(sampler) < padded_tokens(LengthBucketSampler(LENGTHS, 8, bucket_size=1, seed=0))
+
+
+def test_no_shuffle_follows_length_order():
+    sampler = LengthBucketSampler(LENGTHS, batch_size=8, shuffle=False)
+    order = flatten(sampler)
+    assert [LENGTHS[i] for i in order] == sorted(LENGTHS)
+    # Sắp xếp ổn định: cùng độ dài thì giữ thứ tự index
+    assert order == sorted(range(len(LENGTHS)), key=LENGTHS.__getitem__)
+    assert flatten(sampler) == order
+
+
+@pytest.fixture(scope="module")
+def trainer(tiny_bert):
+    from transformers import BertForSequenceClassification, BertTokenizer
+    return TransformerTrainer(tiny_bert, BertTokenizer, BertForSequenceClassification, batch_size=8,
+                              max_length=10, use_token_cache=False, cpu_profile=CpuProfile())
+
+
+def test_collate_matches_tokenizer_padding(trainer, tiny_corpus):
+    texts, labels = tiny_corpus
+    dataset = trainer.create_dataset(pd.Series(texts), labels)
+    loader = trainer.create_loader(dataset, shuffle=False)
+    order = flatten(loader.batch_sampler)
+    seen = 0
+    for input_ids, attention_mask, batch_labels in loader:
+        rows = order[seen:seen + len(batch_labels)]
+        seen += len(batch_labels)
+        expected = trainer.tokenizer([texts[i] for i in rows], truncation=True, max_length=10, padding=True,
+                                     return_tensors="pt")
+        assert torch.equal(input_ids, expected["input_ids"])
+        assert torch.equal(attention_mask, expected["attention_mask"])
+        assert batch_labels.tolist() == [labels[i] for i in rows]
+    assert seen == len(texts)
+
+
+def test_dynamic_padding_keeps_logits(trainer, tiny_corpus):
+    # Padding theo batch cho cùng logits như padding cả tập tới chuỗi dài nhất
+    texts, labels = tiny_corpus
+    loader = trainer.create_loader(trainer.create_dataset(pd.Series(texts), labels), shuffle=False)
+    order = flatten(loader.batch_sampler)
+    full = trainer.tokenizer(texts, truncation=True, max_length=10, padding=True, return_tensors="pt")
+    trainer.model.eval()
+    with torch.no_grad():
+        reference = trainer.model(full["input_ids"], attention_mask=full["attention_mask"]).logits
+        dynamic = torch.cat([trainer.model(ids, attention_mask=mask).logits for ids, mask, _ in loader])
+    assert torch.allclose(reference[order], dynamic, atol=1e-5)
@@ -0,0 +1,79 @@
+# tests/test_load_data.py
+# load_data_to_db với if_exists="fail" không được nạp thêm vào bảng đã có; main() dùng chung load_data_to_db
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+import ingest
+import schema
+from db_engine import raw_connection
+
+TABLE = "tweets_load"
+
+
+def write_csv(tmp_path, n_rows, name="tweets.csv"):
+    path = tmp_path / name
+    pd.DataFrame({
+        "id": range(1, n_rows + 1),
+        "date": pd.date_range("2025-03-01", periods=n_rows, freq="5h", tz="UTC").astype(str),
+        "user_id": 1,
+        "cleaned_text": [f"tweet {i}" for i in range(n_rows)],
+        "Sentiment": "Positive",
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def row_count(test_db):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {TABLE}")
+        count = cursor.fetchone()[0]
+        conn.rollback()
+    return count
+
+
+@pytest.fixture
+def table(test_db):
+    def drop():
+        with raw_connection(test_db) as conn:
+            schema.drop_table(conn, TABLE)
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+
+    drop()
+    yield TABLE
+    drop()
+
+
+@pytest.mark.parametrize("method,managed_schema", [
+    ("copy", True), ("insert", True), ("stream", True), ("copy", False), ("insert", False),
+])
+def test_fail_mode_refuses_existing_table(table, test_db, tmp_path, method, managed_schema):
+    csv_file = write_csv(tmp_path, 10)
+    assert ingest.load_data_to_db(csv_file, test_db, table, if_exists="fail", method=method,
+                                  managed_schema=managed_schema) == 10
+
+    more = write_csv(tmp_path, 20, "more.csv")
+    with pytest.raises(ValueError, match="already exists"):
+        ingest.load_data_to_db(more, test_db, table, if_exists="fail", method=method,
+                               managed_schema=managed_schema)
+    assert row_count(test_db) == 10
+
+
+def test_main_loads_through_load_data_to_db(tmp_path, monkeypatch):
+    csv_file = write_csv(tmp_path, 3)
+    calls = []
+    monkeypatch.setattr(ingest, "test_connection", lambda: True)
+    monkeypatch.setattr(ingest, "load_data_to_db", lambda *args, **kwargs: calls.append((args, kwargs)) or 3)
+    monkeypatch.setattr(sys, "argv", ["ingest.py", "--file", csv_file, "--database", "db", "--table", "t",
+                                      "--mode", "fail", "--loader", "insert", "--copy-format", "binary",
+                                      "--no-rollups"])
+    ingest.main()
+    assert calls == [((csv_file, "db", "t"), {"if_exists": "fail", "method": "insert", "binary": True,
+                                              "managed_schema": True, "refresh_rollups": False})]
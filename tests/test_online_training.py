@@ -0,0 +1,126 @@
+# tests/test_online_training.py
+# OnlineClassicalTrainer chỉ học các dòng có ingest_seq lớn hơn watermark đã lưu, không dựa vào id (snowflake)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+pytest.importorskip("pyarrow")
+
+import joblib
+
+from model_training import OnlineClassicalTrainer  # thêm data/ vào sys.path
+
+TABLE = "tweets_online"
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+
+
+def rows(ids, first_seq, text="tweet"):
+    ids = list(ids)
+    return pd.DataFrame({
+        "id": ids,
+        "ingest_seq": range(first_seq, first_seq + len(ids)),
+        "cleaned_text": [f"{text} {i}" for i in ids],
+        "sentiment_num": [i % 3 for i in ids],
+    })
+
+
+def trained_ids(trainer, batches):
+    """Chạy fit_stream và trả về id các dòng được đưa vào batch (kể cả holdout)"""
+    seen = []
+
+    def recording(batches):
+        for ids, seqs, texts, labels in batches:
+            seen.extend(ids.tolist())
+            yield ids, seqs, texts, labels
+
+    trainer.fit_stream(recording(batches))
+    return seen
+
+
+def test_parquet_rows_after_saved_ingest_seq(tmp_path):
+    state_path = str(tmp_path / "state" / "sgd.joblib")
+    first = rows(range(9000, 9100), first_seq=1)
+    first.to_parquet(tmp_path / "export.parquet")
+    trainer = OnlineClassicalTrainer(n_features=2**10, state_path=state_path)
+    assert sorted(trained_ids(trainer, trainer.iter_parquet_batches(str(tmp_path / "export.parquet")))) == \
+        list(range(9000, 9100))
+    assert trainer.max_seq == 100
+    trainer.save_state()
+
+    # Export mới: id nhỏ hơn id cũ nhưng ingest sau, một dòng cũ được sửa (ingest_seq mới), còn lại không đổi
+    later = pd.concat([first, rows(range(100, 120), first_seq=101), rows([9005], first_seq=121, text="edited")])
+    later = later.drop_duplicates("id", keep="last")
+    later.to_parquet(tmp_path / "export.parquet")
+
+    resumed = OnlineClassicalTrainer(n_features=2**10, state_path=state_path)
+    assert resumed.load_state() and resumed.max_seq == 100
+    seen = trained_ids(resumed, resumed.iter_parquet_batches(str(tmp_path / "export.parquet"), batch_size=7))
+    assert sorted(seen) == list(range(100, 120)) + [9005]
+    assert resumed.max_seq == 121
+
+
+def test_parquet_needs_ingest_seq(tmp_path):
+    rows(range(10), first_seq=1).drop(columns="ingest_seq").to_parquet(tmp_path / "export.parquet")
+    trainer = OnlineClassicalTrainer(n_features=2**10, state_path=str(tmp_path / "sgd.joblib"))
+    with pytest.raises(ValueError, match="ingest_seq"):
+        next(trainer.iter_parquet_batches(str(tmp_path / "export.parquet")))
+
+
+def test_state_with_id_watermark_is_not_resumed(tmp_path):
+    # State cũ chỉ lưu max_id: không biết dòng nào được ingest sau đó nên train lại từ đầu
+    state_path = tmp_path / "sgd.joblib"
+    trainer = OnlineClassicalTrainer(n_features=2**10, state_path=str(state_path))
+    joblib.dump({"vectorizer": trainer.vectorizer, "model": trainer.model, "max_id": 9100, "rows_seen": 80},
+                state_path)
+    assert not trainer.load_state()
+    assert trainer.max_seq is None and trainer.rows_seen == 0
+
+
+def test_postgres_rows_after_saved_ingest_seq(test_db, tmp_path, monkeypatch):
+    import ingest
+    import schema
+    from db_engine import raw_connection
+
+    def drop():
+        with raw_connection(test_db) as conn:
+            schema.drop_table(conn, TABLE)
+            with conn.cursor() as cursor:
+                schema._drop_with_rollups(cursor, TABLE)
+            conn.commit()
+
+    def load(ids, text="tweet"):
+        csv_file = tmp_path / f"batch_{len(list(tmp_path.iterdir()))}.csv"
+        pd.DataFrame({
+            "id": ids,
+            "date": [str(pd.Timestamp("2025-03-01", tz="UTC") + pd.Timedelta(minutes=i % 10000)) for i in ids],
+            "cleaned_text": [f"{text} {i}" for i in ids],
+            "Sentiment": [SENTIMENTS[i % 3] for i in ids],
+        }).to_csv(csv_file, index=False)
+        ingest.load_data_to_db(str(csv_file), test_db, TABLE, if_exists="upsert", method="copy")
+
+    monkeypatch.setenv("DB_NAME", test_db)
+    monkeypatch.setenv("SQL_QUERY", f"SELECT * FROM {TABLE}")
+    drop()
+    try:
+        load(list(range(9000, 9060)))
+        trainer = OnlineClassicalTrainer(n_features=2**10, state_path=str(tmp_path / "sgd.joblib"))
+        assert sorted(trained_ids(trainer, trainer.iter_postgres_batches())) == list(range(9000, 9060))
+        watermark = trainer.max_seq
+
+        # Id nhỏ hơn max id cũ, một dòng sửa text, một dòng gửi lại y nguyên (không đổi ingest_seq)
+        load(list(range(100, 112)) + [9500])
+        load([9010], text="edited")
+        load([9020])
+        seen = trained_ids(trainer, trainer.iter_postgres_batches())
+        assert sorted(seen) == list(range(100, 112)) + [9010, 9500]
+        assert trainer.max_seq > watermark
+        assert trained_ids(trainer, trainer.iter_postgres_batches()) == []
+    finally:
+        drop()
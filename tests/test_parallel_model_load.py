@@ -0,0 +1,65 @@
+# tests/test_parallel_model_load.py
+# Model do worker spawn (--parallel) log phải load được từ một process khác (model_serve, model_validate)
+# (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("mlflow")
+pytest.importorskip("vaderSentiment")
+
+from db_engine import raw_connection
+
+TABLE = "tweets_parallel"
+REPO = os.path.join(os.path.dirname(__file__), "..")
+WORDS = {1: ["love", "great", "good"], 0: ["hate", "awful", "bad"], 2: ["news", "today", "vote"]}
+
+
+@pytest.fixture
+def table(test_db):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} (id BIGINT PRIMARY KEY, cleaned_text TEXT, sentiment SMALLINT)")
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (id, cleaned_text, sentiment) VALUES (%s, %s, %s)",
+            [(i, " ".join(WORDS[i % 3][j % 3] for j in range(i % 5 + 1)), i % 3) for i in range(90)],
+        )
+        conn.commit()
+    yield TABLE
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+
+
+def test_model_logged_by_spawn_worker_loads_in_another_process(table, test_db, tmp_path):
+    # Bản sao của code: mlruns, latest_runs.json và snapshot nằm trong tmp_path
+    for name in ("model_pipeline", "data"):
+        shutil.copytree(os.path.join(REPO, name), tmp_path / name, ignore=shutil.ignore_patterns("__pycache__"))
+    env = {**os.environ, "DB_NAME": test_db, "SQL_QUERY": f"SELECT * FROM {TABLE}",
+           "SNAPSHOT_DIR": str(tmp_path / "snapshots"), "MLFLOW_ALLOW_FILE_STORE": "true",
+           "MLFLOW_DISABLE_AGENT_HINT": "1"}
+    env.pop("CLASSICAL_SEARCH", None)
+
+    # model_training.py chạy như __main__: worker spawn import lại nó dưới tên __mp_main__
+    train = subprocess.run([sys.executable, "model_training.py", "--parallel", "--models", "LogisticRegression_TFIDF",
+                            "--cpu-budget", "1"], cwd=tmp_path / "model_pipeline", env=env,
+                           capture_output=True, text=True)
+    assert train.returncode == 0, train.stdout[-2000:] + train.stderr[-2000:]
+    with open(tmp_path / "latest_runs.json") as f:
+        run_id = json.load(f)["LogisticRegression_TFIDF"]
+
+    # Process mới, không có model_pipeline trong sys.path (như container của model_serve)
+    code = ("import sys, mlflow, pandas as pd; "
+            f"mlflow.set_tracking_uri('file://{tmp_path / 'mlruns'}'); "
+            f"model = mlflow.pyfunc.load_model('runs:/{run_id}/model'); "
+            "print(model.predict(pd.DataFrame({'text': ['love great good', 'hate awful bad']})).tolist())")
+    load = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert load.returncode == 0, load.stderr[-2000:]
+    assert load.stdout.strip().splitlines()[-1] == "[1, 0]"
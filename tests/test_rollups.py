@@ -0,0 +1,130 @@
+# tests/test_rollups.py
+# Refresh rollup theo bucket phải cho cùng kết quả với tính lại từ bảng raw, kể cả khi có dòng đến muộn
+# (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+import ingest
+import rollups
+import schema
+from db_engine import get_engine, raw_connection
+
+TABLE = "tweets_rollup"
+KEYWORDS = ["trump", "biden", None]
+SENTIMENTS = ["Positive", "Negative", "Neutral", None]
+
+
+def tweets(ids, start="2025-03-01", hours=3, keyword_shift=0, likes=1):
+    """Ngày của một dòng chỉ phụ thuộc vào id, nên nạp lại cùng id là cùng khóa (id, date)"""
+    ids = list(ids)
+    return pd.DataFrame({
+        "id": ids,
+        "date": [str(pd.Timestamp(start, tz="UTC") + pd.Timedelta(hours=hours * (i % 1000))) for i in ids],
+        "likecount": [likes * (i % 7) for i in ids],
+        "viewcount": [None if i % 5 == 0 else 10 * i for i in ids],
+        "searched_keyword": [KEYWORDS[(i + keyword_shift) % 3] for i in ids],
+        "cleaned_text": [f"tweet {i}" for i in ids],
+        "Sentiment": [SENTIMENTS[i % 4] for i in ids],
+    })
+
+
+def query(test_db, sql):
+    return pd.read_sql_query(sql, get_engine(test_db))
+
+
+def assert_rollups_match_raw(test_db):
+    """So sánh hai bảng rollup với phép tính lại bằng pandas trên bảng raw"""
+    raw = query(test_db, f"SELECT date, searched_keyword, sentiment, likecount, viewcount FROM {TABLE}")
+    raw["day"] = pd.to_datetime(raw["date"], utc=True).dt.date
+    raw["searched_keyword"] = raw["searched_keyword"].fillna(rollups.NO_KEYWORD)
+    raw["sentiment"] = raw["sentiment"].fillna(rollups.NO_SENTIMENT).astype(int)
+
+    expected = raw.groupby(["day", "searched_keyword", "sentiment"]).size().rename("tweet_count").reset_index()
+    actual = query(test_db, f"SELECT day, searched_keyword, sentiment, tweet_count FROM "
+                            f"{rollups.sentiment_table(TABLE)}")
+    key = ["day", "searched_keyword", "sentiment"]
+    pd.testing.assert_frame_equal(actual.sort_values(key).reset_index(drop=True),
+                                  expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+    expected = raw.groupby(["day", "searched_keyword"]).agg(
+        tweet_count=("sentiment", "size"),
+        likecount_sum=("likecount", lambda s: int(s.fillna(0).sum())),
+        viewcount_sum=("viewcount", lambda s: int(s.fillna(0).sum())),
+    ).reset_index()
+    actual = query(test_db, f"SELECT day, searched_keyword, tweet_count, likecount_sum, viewcount_sum FROM "
+                            f"{rollups.engagement_table(TABLE)}")
+    key = ["day", "searched_keyword"]
+    pd.testing.assert_frame_equal(actual.sort_values(key).reset_index(drop=True),
+                                  expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+    return len(raw)
+
+
+@pytest.fixture
+def table(test_db):
+    def drop():
+        with raw_connection(test_db) as conn:
+            schema.drop_table(conn, TABLE)
+            with conn.cursor() as cursor:
+                schema._drop_with_rollups(cursor, TABLE)
+            conn.commit()
+
+    drop()
+    yield TABLE
+    drop()
+
+
+def load(test_db, tmp_path, df, mode, method):
+    csv_file = tmp_path / f"batch_{len(list(tmp_path.iterdir()))}.csv"
+    df.to_csv(csv_file, index=False)
+    return ingest.load_data_to_db(str(csv_file), test_db, TABLE, if_exists=mode, method=method)
+
+
+@pytest.mark.parametrize("method", ["copy", "insert", "stream"])
+def test_refresh_after_late_rows(table, test_db, tmp_path, method):
+    load(test_db, tmp_path, tweets(range(1, 200)), "upsert", method)
+    assert assert_rollups_match_raw(test_db) == 199
+
+    # Dòng đến muộn: ngày đã có bucket, cùng vài bucket mới ở tháng trước
+    late = pd.concat([tweets(range(1000, 1060), start="2025-03-02", hours=2),
+                      tweets(range(2000, 2010), start="2025-02-27", hours=7)])
+    load(test_db, tmp_path, late, "append", method)
+    assert assert_rollups_match_raw(test_db) == 269
+
+
+@pytest.mark.parametrize("method", ["copy", "stream"])
+def test_refresh_after_upsert_moves_rows_between_buckets(table, test_db, tmp_path, method):
+    load(test_db, tmp_path, tweets(range(1, 200)), "upsert", method)
+
+    # Cùng id/ngày nhưng đổi keyword (dòng chuyển sang bucket khác) và đổi engagement
+    changed = tweets(range(50, 120), keyword_shift=1, likes=3)
+    load(test_db, tmp_path, changed, "upsert", method)
+    assert assert_rollups_match_raw(test_db) == 199
+
+    # Một dòng duy nhất chuyển keyword: bucket cũ không có dòng nào khác trong batch
+    moved = tweets([150]).assign(searched_keyword="moved")
+    load(test_db, tmp_path, moved, "upsert", method)
+    assert assert_rollups_match_raw(test_db) == 199
+
+    # Nạp lại batch trước đó: không đổi gì
+    load(test_db, tmp_path, changed, "upsert", method)
+    assert assert_rollups_match_raw(test_db) == 199
+
+
+def test_refresh_matches_rebuild(table, test_db, tmp_path):
+    load(test_db, tmp_path, tweets(range(1, 150)), "upsert", "copy")
+    load(test_db, tmp_path, tweets(range(100, 180), start="2025-03-05", keyword_shift=2), "upsert", "copy")
+    incremental = query(test_db, f"SELECT * FROM {rollups.engagement_table(TABLE)} ORDER BY 1, 2")
+
+    with raw_connection(test_db) as conn:
+        with conn.cursor() as cursor:
+            rollups.rebuild(cursor, TABLE)
+        conn.commit()
+    pd.testing.assert_frame_equal(query(test_db, f"SELECT * FROM {rollups.engagement_table(TABLE)} ORDER BY 1, 2"),
+                                  incremental)
@@ -0,0 +1,128 @@
+# tests/test_shadow_swap.py
+# Swap bảng shadow trong khi có reader đọc song song (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+psycopg2 = pytest.importorskip("psycopg2")
+
+import schema
+from db_engine import get_engine, raw_connection
+from ingest import copy_dataframe_to_db, create_database_if_not_exists
+
+TEST_DB = os.getenv("TEST_DB_NAME", "twdb_swap_test")
+TABLE = "tweets_swap"
+
+
+def tweets(n_rows, first_id=1):
+    return pd.DataFrame({
+        "id": range(first_id, first_id + n_rows),
+        "date": pd.date_range("2025-03-01", periods=n_rows, freq="7h", tz="UTC"),
+        "user_id": 1,
+        "cleaned_text": [f"tweet {i}" for i in range(n_rows)],
+        "sentiment": "Positive",
+    })
+
+
+def load_table(table_name, n_rows):
+    """Tạo bảng managed `table_name` và nạp n_rows dòng"""
+    with raw_connection(TEST_DB) as conn:
+        df = schema.prepare_table(conn, table_name, tweets(n_rows))
+    copy_dataframe_to_db(df, table_name, get_engine(TEST_DB), if_exists="append")
+
+
+def load_shadow(n_rows):
+    with raw_connection(TEST_DB) as conn:
+        shadow = schema.prepare_shadow(conn, TABLE)
+    load_table(shadow, n_rows)
+
+
+@pytest.fixture
+def live_table():
+    try:
+        create_database_if_not_exists(TEST_DB)
+    except Exception as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    with raw_connection(TEST_DB) as conn:
+        for name in (TABLE, schema.shadow_name(TABLE)):
+            schema.drop_table(conn, name)
+    load_table(TABLE, 100)
+    yield TABLE
+    with raw_connection(TEST_DB) as conn:
+        for name in (TABLE, schema.shadow_name(TABLE)):
+            schema.drop_table(conn, name)
+
+
+def test_swap_with_concurrent_reader(live_table):
+    expected_counts = {100}
+    counts, errors = [], []
+    stop = threading.Event()
+
+    def reader():
+        # Kết nối riêng, autocommit: mỗi query là một transaction như dashboard
+        with raw_connection(TEST_DB, autocommit=True) as conn, conn.cursor() as cursor:
+            while not stop.is_set():
+                try:
+                    cursor.execute(f"SELECT count(*), count(DISTINCT id) FROM {live_table}")
+                    total, distinct = cursor.fetchone()
+                    assert total == distinct
+                    counts.append(total)
+                except Exception as e:
+                    errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for n_rows in (150, 200, 250, 300):
+            load_shadow(n_rows)
+            with raw_connection(TEST_DB) as conn:
+                schema.migrate(conn, schema.shadow_name(live_table))
+                schema.swap_shadow(conn, live_table)
+            expected_counts.add(n_rows)
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not errors, errors[:3]
+    assert counts, "reader never ran"
+    # Reader chỉ thấy bảng cũ hoặc bảng mới đã nạp đủ, không bao giờ thấy bảng rỗng/thiếu dòng
+    assert set(counts) <= expected_counts
+    assert counts[-1] == 300
+    with raw_connection(TEST_DB) as conn, conn.cursor() as cursor:
+        assert not schema.table_exists(cursor, schema.shadow_name(live_table))
+        assert not schema.table_exists(cursor, f"{live_table}_retired")
+        cursor.execute("SELECT count(*) FROM schema_migrations WHERE table_name = %s",
+                       (schema.shadow_name(live_table),))
+        assert cursor.fetchone()[0] == 0
+
+
+def test_swap_times_out_behind_open_reader(live_table):
+    load_shadow(50)
+    with raw_connection(TEST_DB) as reader:
+        with reader.cursor() as cursor:
+            # Transaction đang mở giữ ACCESS SHARE lock trên bảng live
+            cursor.execute(f"SELECT count(*) FROM {live_table}")
+            with raw_connection(TEST_DB) as conn:
+                with pytest.raises(psycopg2.errors.LockNotAvailable):
+                    schema.swap_shadow(conn, live_table, lock_timeout="200ms")
+        reader.rollback()
+
+    # Swap thất bại thì giữ nguyên bảng live và shadow để thử lại
+    with raw_connection(TEST_DB) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {live_table}")
+            assert cursor.fetchone()[0] == 100
+            assert schema.table_exists(cursor, schema.shadow_name(live_table))
+        conn.rollback()
+        schema.swap_shadow(conn, live_table)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {live_table}")
+            assert cursor.fetchone()[0] == 50
+        conn.rollback()
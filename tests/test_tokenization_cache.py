@@ -0,0 +1,186 @@
+# tests/test_tokenization_cache.py
+# TokenizationCache: hit/miss theo text, key theo tokenizer/max_length, nhiều process ghi cùng lúc
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "model_pipeline"))
+pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from tokenization_cache import TokenizationCache
+
+WORDS = ["good", "bad", "great", "awful", "ok", "vote", "trump", "biden", "love", "hate", "news", "today"]
+# 140 text khác nhau (tiny_corpus chỉ có 12), một số dài hơn max_length
+TEXTS = [" ".join([WORDS[i % 12], WORDS[i // 12]] + ["good"] * (i % 9)) for i in range(140)]
+LABELS = [i % 3 for i in range(140)]
+
+
+@pytest.fixture
+def tokenizer(tiny_bert):
+    return transformers.BertTokenizer.from_pretrained(tiny_bert)
+
+
+def expected_ids(tokenizer, text, max_length):
+    return tokenizer(text, truncation=True, max_length=max_length)["input_ids"]
+
+
+def no_append(*args, **kwargs):
+    raise AssertionError("cached texts were tokenized again")
+
+
+def test_rows_match_tokenizer(tokenizer, tmp_path):
+    texts, labels = TEXTS, LABELS
+    cache = TokenizationCache(tokenizer, 8, cache_dir=str(tmp_path))
+    dataset = cache.dataset(texts, labels)
+
+    assert len(dataset) == len(texts)
+    for i in (0, 5, 17, 139):
+        ids, label = dataset[i]
+        assert ids.tolist() == expected_ids(tokenizer, texts[i], 8)
+        assert label == labels[i]
+
+
+def test_hit_and_miss(tokenizer, tmp_path, monkeypatch):
+    texts = TEXTS
+    cache = TokenizationCache(tokenizer, 16, cache_dir=str(tmp_path))
+    rows = cache.rows_for(texts[:80])
+    stored = cache._row_count()
+    assert stored == 80
+
+    # Hit: cùng text (kể cả từ một instance mới) không tokenize lại
+    append = TokenizationCache._append
+    appended = []
+    monkeypatch.setattr(TokenizationCache, "_append", no_append)
+    again = TokenizationCache(tokenizer, 16, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(again.rows_for(texts[:80]), rows)
+
+    # Miss: chỉ các text mới được tokenize và nối vào cuối store
+    monkeypatch.setattr(TokenizationCache, "_append",
+                        lambda self, new_texts, hashes: appended.extend(new_texts) or append(self, new_texts, hashes))
+    extended = again.rows_for(texts)
+    assert sorted(appended) == sorted(texts[80:])
+    assert again._row_count() == stored + len(appended)
+    np.testing.assert_array_equal(extended[:80], rows)
+    input_ids, lengths, _ = again._open()
+    for i in (80, 100, 139):
+        row = extended[i]
+        assert input_ids[row, :lengths[row]].tolist() == expected_ids(tokenizer, texts[i], 16)
+
+
+def test_max_length_change_uses_a_new_store(tokenizer, tmp_path, monkeypatch):
+    texts, labels = TEXTS, LABELS
+    short = TokenizationCache(tokenizer, 4, cache_dir=str(tmp_path))
+    short.dataset(texts, labels)
+    longer = TokenizationCache(tokenizer, 16, cache_dir=str(tmp_path))
+    assert longer.key != short.key and longer.path != short.path
+    assert longer._row_count() == 0
+
+    # Store mới tokenize lại với max_length mới (không bị cắt theo max_length cũ)
+    dataset = longer.dataset(texts, labels)
+    longest = max(range(len(texts)), key=lambda i: len(texts[i]))
+    assert dataset[longest][0].tolist() == expected_ids(tokenizer, texts[longest], 16)
+    assert len(dataset[longest][0]) > 4
+
+    # max_length cũ vẫn hit store cũ
+    monkeypatch.setattr(TokenizationCache, "_append", no_append)
+    TokenizationCache(tokenizer, 4, cache_dir=str(tmp_path)).rows_for(texts)
+
+
+def test_tokenizer_change_uses_a_new_store(tokenizer, tiny_bert, tmp_path):
+    texts = TEXTS
+    cache = TokenizationCache(tokenizer, 8, cache_dir=str(tmp_path))
+    cache.rows_for(texts)
+
+    # Thêm một từ vào vocabulary: id khác nên store cũ không dùng được
+    vocab_file = tmp_path / "vocab.txt"
+    with open(os.path.join(tiny_bert, "vocab.txt")) as f:
+        vocab = f.read().split()
+    vocab_file.write_text("\n".join(vocab[:5] + ["news"] + vocab[5:]) + "\n")
+    other = transformers.BertTokenizer(str(vocab_file))
+    assert other(texts[0])["input_ids"] != tokenizer(texts[0])["input_ids"]
+
+    changed = TokenizationCache(other, 8, cache_dir=str(tmp_path))
+    assert changed.key != cache.key
+    assert changed._row_count() == 0
+    dataset = changed.dataset(texts, [0] * len(texts))
+    assert dataset[0][0].tolist() == expected_ids(other, texts[0], 8)
+
+
+def write_split(cache_dir, tiny_bert, texts, barrier, result_file):
+    """Một process huấn luyện: chờ các process khác rồi cùng tạo split của một snapshot"""
+    cache = TokenizationCache(transformers.BertTokenizer.from_pretrained(tiny_bert), 8, cache_dir=cache_dir)
+    barrier.wait()
+    dataset = cache.dataset(texts, [0] * len(texts), snapshot_id="snap", split="train")
+    with open(result_file, "w") as f:
+        json.dump([dataset[i][0].tolist() for i in range(len(dataset))], f)
+
+
+def test_concurrent_writers(tokenizer, tiny_bert, tmp_path):
+    texts = TEXTS
+    cache_dir = str(tmp_path / "cache")
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(4)
+    # Mỗi process có một phần text riêng và một phần chung với các process khác
+    workloads = [texts[i * 20:i * 20 + 60] for i in range(4)]
+    result_files = [str(tmp_path / f"result_{i}.json") for i in range(4)]
+    processes = [ctx.Process(target=write_split, args=(cache_dir, tiny_bert, workload, barrier, result_file))
+                 for workload, result_file in zip(workloads, result_files)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+    results = []
+    for result_file in result_files:
+        with open(result_file) as f:
+            results.append(json.load(f))
+
+    cache = TokenizationCache(tokenizer, 8, cache_dir=cache_dir)
+    # Không có text nào được lưu hai lần, không còn phần ghi dở
+    _, _, hashes = cache._open()
+    assert len(hashes) == len(np.unique(hashes)) == 120
+    for name, width in (("input_ids.bin", 4 * 8), ("lengths.bin", 2)):
+        assert os.path.getsize(cache._file(name)) == len(hashes) * width
+
+    # File split được ghi qua tmp + os.replace: không còn file tmp, nội dung là của một process hoàn chỉnh
+    splits = os.listdir(os.path.join(cache.path, "splits"))
+    assert splits == ["snap_train.npy"]
+    rows = np.load(os.path.join(cache.path, "splits", "snap_train.npy"))
+    assert len(rows) == 60
+    assert any(rows.tolist() == cache.rows_for(workload).tolist() for workload in workloads)
+
+    # Mỗi process đọc được đúng token id của các text của nó
+    assert results == [[expected_ids(tokenizer, text, 8) for text in workload] for workload in workloads]
+
+
+def test_interrupted_append_is_truncated(tokenizer, tmp_path):
+    texts = TEXTS
+    cache = TokenizationCache(tokenizer, 8, cache_dir=str(tmp_path))
+    cache.rows_for(texts[:30])
+    stored = cache._row_count()
+
+    # Lần ghi bị ngắt: input_ids đã ghi một phần, hashes (ghi cuối) thì chưa
+    with open(cache._file("input_ids.bin"), "ab") as f:
+        f.write(b"\0" * 50)
+    rows = cache.rows_for(texts[:60])
+    assert cache._row_count() == stored + 30
+    input_ids, lengths, _ = cache._open()
+    for i in (30, 45, 59):
+        assert input_ids[rows[i], :lengths[rows[i]]].tolist() == expected_ids(tokenizer, texts[i], 8)
+    assert os.path.getsize(cache._file("input_ids.bin")) == cache._row_count() * 4 * 8
+
+
+def test_saved_split_of_another_size_is_rebuilt(tokenizer, tmp_path):
+    cache = TokenizationCache(tokenizer, 8, cache_dir=str(tmp_path))
+    cache.dataset(TEXTS[:40], LABELS[:40], snapshot_id="snap", split="fit")
+
+    # Cùng tên split nhưng số text khác (split được chia lại): không dùng các row đã lưu
+    dataset = cache.dataset(TEXTS[:60], LABELS[:60], snapshot_id="snap", split="fit")
+    assert len(dataset) == 60
+    assert dataset[59][0].tolist() == expected_ids(tokenizer, TEXTS[59], 8)
+    assert len(np.load(os.path.join(cache.path, "splits", "snap_fit.npy"))) == 60
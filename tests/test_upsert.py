@@ -0,0 +1,96 @@
+# tests/test_upsert.py
+# Upsert theo id: nạp lại cùng file không nhân đôi/ghi lại dòng, dòng đổi giá trị thì được cập nhật
+# (cần PostgreSQL, bỏ qua nếu không kết nối được)
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+pytest.importorskip("dotenv")
+pytest.importorskip("psycopg2")
+
+from db_engine import get_engine, raw_connection
+from ingest import upsert_dataframe_to_db
+
+TABLE = "tweets_upsert"
+
+
+def tweets(n_rows):
+    return pd.DataFrame({
+        "id": range(1, n_rows + 1),
+        "cleaned_text": [f"tweet {i}" for i in range(n_rows)],
+        "likecount": range(n_rows),
+        "sentiment": [i % 3 for i in range(n_rows)],
+    })
+
+
+def fetch(test_db, sql):
+    with raw_connection(test_db) as conn, conn.cursor() as cursor:
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        conn.rollback()
+    return rows
+
+
+def rows_by_id(test_db):
+    """id -> (cleaned_text, likecount, xmin); xmin đổi khi dòng bị ghi lại"""
+    return {row[0]: row[1:] for row in fetch(test_db, f"SELECT id, cleaned_text, likecount, xmin::text FROM {TABLE}")}
+
+
+@pytest.fixture
+def table(test_db):
+    def drop():
+        with raw_connection(test_db) as conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+
+    drop()
+    yield get_engine(test_db)
+    drop()
+
+
+@pytest.mark.parametrize("binary", [False, True], ids=["csv", "binary"])
+def test_reingest_is_idempotent(table, test_db, binary):
+    df = tweets(50)
+    assert upsert_dataframe_to_db(df, TABLE, table, binary=binary) == (50, 0)
+    before = rows_by_id(test_db)
+
+    assert upsert_dataframe_to_db(df, TABLE, table, binary=binary) == (0, 0)
+    # Không nhân đôi và không ghi lại dòng nào
+    assert rows_by_id(test_db) == before
+    assert fetch(test_db, f"SELECT count(*), count(DISTINCT id) FROM {TABLE}") == [(50, 50)]
+
+
+def test_changed_rows_are_updated(table, test_db):
+    upsert_dataframe_to_db(tweets(50), TABLE, table)
+    before = rows_by_id(test_db)
+
+    df = tweets(60)
+    df.loc[df["id"] == 7, "cleaned_text"] = "edited"
+    df.loc[df["id"] == 8, "likecount"] = 1000
+    assert upsert_dataframe_to_db(df, TABLE, table) == (10, 2)
+
+    after = rows_by_id(test_db)
+    assert len(after) == 60
+    assert after[7][0] == "edited" and after[8][1] == 1000
+    # Chỉ hai dòng thay đổi được ghi lại
+    rewritten = {row_id for row_id in before if after[row_id] != before[row_id]}
+    assert rewritten == {7, 8}
+
+
+def test_last_duplicate_in_batch_wins(table, test_db):
+    df = pd.concat([tweets(5), tweets(5).assign(cleaned_text="second copy")], ignore_index=True)
+    assert upsert_dataframe_to_db(df, TABLE, table) == (5, 0)
+    assert {text_ for text_, _, _ in rows_by_id(test_db).values()} == {"second copy"}
+
+
+def test_legacy_duplicates_are_removed_before_adding_the_key(table, test_db):
+    # Bảng do các lần chạy append cũ tạo ra: không có primary key, có dòng trùng
+    df = tweets(10)
+    pd.concat([df, df.iloc[:3]]).to_sql(TABLE, table, index=False)
+    assert upsert_dataframe_to_db(df, TABLE, table) == (0, 0)
+    assert fetch(test_db, f"SELECT count(*), count(DISTINCT id) FROM {TABLE}") == [(10, 10)]
+    assert fetch(test_db, f"SELECT count(*) FROM pg_index WHERE indrelid = '{TABLE}'::regclass "
+                          f"AND indisprimary") == [(1,)]
@@ -0,0 +1,117 @@
+# tests/test_validation_cache.py
+# Cache summary theo nội dung file: hit khi nội dung giống hệt, miss khi file, suite hoặc extra_files đổi
+import functools
+import os
+import shutil
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+
+import validate
+import validation_cache
+from validation_cache import cache_key, load_cached_summary, save_summary
+from validation_engine import SUITE_VERSION
+
+SUMMARY = {"total_checks": 1, "passed_checks": 1, "failed_checks": 0, "success_rate": 1.0, "all_passed": True,
+           "results": [{"check": "column_count", "success": True, "details": {}}]}
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "tweets.csv"
+    pd.DataFrame({
+        "id": [1, 2, 3],
+        "date": ["2025-03-01 10:00:00+00:00"] * 3,
+        "likecount": [1, 2, 3],
+        "cleaned_text": ["a", "b", "c"],
+        "sentiment": ["Positive", "Negative", "Neutral"],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_identical_content_is_a_hit(tmp_path, csv_file):
+    cache_dir = str(tmp_path / "cache")
+    save_summary(cache_key(csv_file), SUMMARY, filepath=csv_file, cache_dir=cache_dir)
+
+    # Cùng nội dung ở đường dẫn khác, mtime khác
+    copy = str(tmp_path / "copy.csv")
+    shutil.copyfile(csv_file, copy)
+    os.utime(copy, (0, 0))
+    assert cache_key(copy) == cache_key(csv_file)
+    assert load_cached_summary(cache_key(copy), cache_dir=cache_dir) == SUMMARY
+
+
+def test_content_change_is_a_miss(tmp_path, csv_file):
+    cache_dir = str(tmp_path / "cache")
+    key = cache_key(csv_file)
+    save_summary(key, SUMMARY, filepath=csv_file, cache_dir=cache_dir)
+
+    with open(csv_file, "a") as f:
+        f.write("4,2025-03-01 10:00:00+00:00,4,d,Positive\n")
+    assert cache_key(csv_file) != key
+    assert load_cached_summary(cache_key(csv_file), cache_dir=cache_dir) is None
+
+
+def test_suite_version_bump_is_a_miss(tmp_path, csv_file):
+    cache_dir = str(tmp_path / "cache")
+    save_summary(cache_key(csv_file), SUMMARY, filepath=csv_file, cache_dir=cache_dir)
+
+    bumped = cache_key(csv_file, suite_version=f"{SUITE_VERSION}.1")
+    assert bumped != cache_key(csv_file)
+    assert load_cached_summary(bumped, cache_dir=cache_dir) is None
+
+
+def test_extra_files_change_is_a_miss(tmp_path, csv_file):
+    cache_dir = str(tmp_path / "cache")
+    reference = tmp_path / "reference.npz"
+    reference.write_bytes(b"reference v1")
+    key = cache_key(csv_file, extra_files=[str(reference)])
+    save_summary(key, SUMMARY, filepath=csv_file, cache_dir=cache_dir)
+
+    # Không có extra_files là một key khác
+    assert cache_key(csv_file) != key
+    assert load_cached_summary(cache_key(csv_file), cache_dir=cache_dir) is None
+    assert load_cached_summary(cache_key(csv_file, extra_files=[str(reference)]), cache_dir=cache_dir) == SUMMARY
+
+    reference.write_bytes(b"reference v2")
+    assert cache_key(csv_file, extra_files=[str(reference)]) != key
+    assert load_cached_summary(cache_key(csv_file, extra_files=[str(reference)]), cache_dir=cache_dir) is None
+
+
+def test_unreadable_entry_is_a_miss(tmp_path, csv_file):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    key = cache_key(csv_file)
+    (cache_dir / f"{key}.json").write_text("{truncated")
+    assert load_cached_summary(key, cache_dir=str(cache_dir)) is None
+
+
+def test_validate_dataset_skips_validation_on_hit(tmp_path, csv_file, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(validate, "load_cached_summary",
+                        functools.partial(validation_cache.load_cached_summary, cache_dir=cache_dir))
+    monkeypatch.setattr(validate, "save_summary", functools.partial(validation_cache.save_summary, cache_dir=cache_dir))
+
+    summary = validate.validate_dataset(filepath=csv_file)
+    assert summary["all_passed"]
+    assert os.listdir(cache_dir) == [f"{cache_key(csv_file)}.json"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("validator ran on a cache hit")
+
+    monkeypatch.setattr(validate, "NativeTwitterValidator", fail)
+    assert validate.validate_dataset(filepath=csv_file) == summary
+
+
+def test_validation_does_not_import_the_database_layer():
+    # Đường validate nhẹ (user-027) không được kéo theo SQLAlchemy/engine setup
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
+    code = ("import sys; import validate; "
+            "print(sorted(m for m in ('db_engine', 'sqlalchemy', 'psycopg2') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=data_dir, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,91 @@
+# tests/test_validation_engine.py
+# ChunkedTwitterValidator phải cho cùng summary với NativeTwitterValidator đọc cả file
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+
+from validation_engine import (ChunkedTwitterValidator, NativeTwitterValidator, _combined_dtype,
+                               default_check_plan)
+
+N_ROWS = 40
+
+
+def write_tweets(tmp_path):
+    """CSV 40 dòng; kiểu của một số cột thay đổi giữa các chunk 7 dòng"""
+    rows = []
+    for i in range(N_ROWS):
+        rows.append({
+            # id lặp lại ở các chunk khác nhau và trong cùng một chunk
+            "id": i % 25 if i != 3 else None,
+            "date": ("not a date" if i == 11 else "" if i == 17
+                     else f"2025-03-{1 + i % 28:02d} 10:00:00+00:00"),
+            # int64 ở chunk đầu, có NULL (float64) ở chunk sau
+            "likecount": "" if i == 30 else i,
+            # bool ở chunk đầu, số ở chunk sau
+            "flag": ("True" if i % 2 else "False") if i < 14 else i,
+            # số ở chunk đầu, chuỗi ở chunk sau
+            "user_id": i if i < 20 else f"user{i}",
+            # float64 ở chunk đầu, int64 ở chunk sau
+            "score": i + 0.5 if i < 7 else i,
+            "cleaned_text": "" if i in (5, 33) else f"tweet {i}",
+            "sentiment": ["Positive", "Negative", "Neutral"][i % 3],
+        })
+    path = tmp_path / "tweets.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def check_plan(columns):
+    checks = default_check_plan(columns)
+    checks += [
+        {"check": f"column_type_{column}", "kind": "column_type", "column": column, "type": "int64"}
+        for column in ("flag", "user_id", "score", "id")
+    ]
+    checks += [
+        {"check": "unique_values_id", "kind": "unique", "column": "id"},
+        {"check": "unique_values_sentiment", "kind": "unique", "column": "sentiment"},
+        {"check": "no_nulls_id", "kind": "no_nulls", "column": "id"},
+        {"check": "no_nulls_missing", "kind": "no_nulls", "column": "missing"},
+        {"check": "column_type_missing", "kind": "column_type", "column": "missing", "type": "int64"},
+        {"check": "date_range", "kind": "date_range"},
+    ]
+    return checks
+
+
+def summaries(csv_file, chunksize):
+    native = NativeTwitterValidator(filepath=csv_file)
+    checks = check_plan(native.df.columns)
+    native.run_all_validations(checks)
+    chunked = ChunkedTwitterValidator(csv_file, chunksize=chunksize)
+    chunked.run_all_validations(checks)
+    return native.get_validation_summary(), chunked.get_validation_summary()
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 13, N_ROWS, 1000])
+def test_chunked_summary_matches_native(tmp_path, chunksize):
+    expected, summary = summaries(write_tweets(tmp_path), chunksize)
+    assert summary == expected
+
+
+def test_parity_fixture_covers_the_edge_cases(tmp_path):
+    expected, _ = summaries(write_tweets(tmp_path), 7)
+    details = {r["check"]: r["details"] for r in expected["results"]}
+    assert details["column_type_likecount"]["observed_value"] == "float64"
+    assert details["column_type_flag"]["observed_value"] == "object"
+    assert details["column_type_user_id"]["observed_value"] == "object"
+    assert details["column_type_score"]["observed_value"] == "float64"
+    assert details["unique_values_id"]["unexpected_count"] == 14
+    assert details["no_nulls_cleaned_text"]["unexpected_count"] == 2
+    assert "invalid dates: 1" in details["date_range"]
+
+
+def test_combined_dtype():
+    assert _combined_dtype({"int64"}) == "int64"
+    assert _combined_dtype({"int64", "float64"}) == "float64"
+    assert _combined_dtype({"bool", "int64"}) == "object"
+    assert _combined_dtype({"bool", "float64"}) == "object"
+    assert _combined_dtype({"object", "int64"}) == "object"